@@ -1,21 +1,45 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, make_response, g
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import os
 import jwt
+import logging
 import datetime
+import base64
+import hashlib
+import json
+import math
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from functools import wraps
-import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+from collections import namedtuple
 from dotenv import load_dotenv
 import urllib.parse
+import logging_setup
+import migrations
+import db_profile
+import query_counter
+import metrics
+import reports
+import chunked_upload
+import blob_store
+from file_serving import serve_file
+from cache import TTLCache
+from result_stats import compute_result_stats
+from sqlalchemy import and_, bindparam, insert, or_, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+# Load environment variables
+load_dotenv()
+
+# Log through a background queue as JSON lines (see logging_setup.py)
+logging_setup.configure()
+logger = logging.getLogger('app')
 
 # Helper functions for handling directories and files
 def ensure_directory_exists(directory):
@@ -23,14 +47,14 @@ def ensure_directory_exists(directory):
     if not os.path.exists(directory):
         try:
             os.makedirs(directory, exist_ok=True)
-            print(f"Created directory: {directory}")
+            logger.info("Created directory: %s", directory)
         except Exception as e:
-            print(f"Error creating directory {directory}: {str(e)}")
+            logger.error("Error creating directory %s: %s", directory, e)
             return False
     
     # Check if directory is writable
     if not os.access(directory, os.W_OK):
-        print(f"Warning: Directory {directory} is not writable")
+        logger.warning("Directory %s is not writable", directory)
         return False
     
     return True
@@ -43,35 +67,62 @@ def verify_file_path(path):
     directory = os.path.dirname(path)
     return ensure_directory_exists(directory)
 
-# Load environment variables
-load_dotenv()
-
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": os.getenv("CORS_ORIGINS", "*").split(",")}})
+logging_setup.init_app(app)
+CORS(app, resources={r"/api/*": {
+    "origins": os.getenv("CORS_ORIGINS", "*").split(","),
+    "expose_headers": ["X-Next-After", "X-Next-After-Id", "ETag", "Accept-Ranges", "Content-Range"]
+}})
 
 # Configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'padashetty_secret_key')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///padashetty.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# SQLite PRAGMAs applied to every connection: 'tuned' (WAL), 'durable' or 'default' (see db_profile.py)
+app.config['DB_PROFILE'] = os.getenv('DB_PROFILE', 'tuned')
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['WHATSAPP_GROUP_LINK'] = os.getenv('WHATSAPP_GROUP_LINK', 'https://chat.whatsapp.com/HkSWuBBqXpMG2DFmqnVORf')
 app.config['FRONTEND_URL'] = os.getenv('FRONTEND_URL', 'http://localhost:5173')
+# Downloads: '' streams through the worker; 'x-accel-redirect' (nginx) or 'x-sendfile' hands off to the proxy
+app.config['FILE_OFFLOAD'] = os.getenv('FILE_OFFLOAD', '')
+app.config['FILE_OFFLOAD_PREFIX'] = os.getenv('FILE_OFFLOAD_PREFIX', '/protected-uploads/')
+app.config['FILE_CACHE_MAX_AGE'] = int(os.getenv('FILE_CACHE_MAX_AGE', '0'))
+# Uploads: largest file accepted, largest chunk per PUT, and how long an idle partial upload is kept
+app.config['MAX_UPLOAD_SIZE'] = int(os.getenv('MAX_UPLOAD_SIZE', str(50 * 1024 * 1024)))
+app.config['UPLOAD_CHUNK_SIZE'] = int(os.getenv('UPLOAD_CHUNK_SIZE', str(5 * 1024 * 1024)))
+app.config['UPLOAD_STALE_SECONDS'] = int(os.getenv('UPLOAD_STALE_SECONDS', str(24 * 3600)))
+# Unreferenced blobs younger than this are left alone, in case an upload of the same content is committing
+app.config['BLOB_GRACE_SECONDS'] = int(os.getenv('BLOB_GRACE_SECONDS', '600'))
+# Cached PDFs no record points at are removed once unused for this long
+app.config['PDF_CACHE_GRACE_SECONDS'] = int(os.getenv('PDF_CACHE_GRACE_SECONDS', str(24 * 3600)))
+# Caps every request body, including the single-request multipart uploads (plus room for form fields)
+app.config['MAX_CONTENT_LENGTH'] = app.config['MAX_UPLOAD_SIZE'] + 1024 * 1024
 
 # Ensure upload directories exist
 upload_dirs = [
     os.path.join(app.config['UPLOAD_FOLDER']),
     os.path.join(app.config['UPLOAD_FOLDER'], 'admission_forms'),
     os.path.join(app.config['UPLOAD_FOLDER'], 'notes'),
-    os.path.join(app.config['UPLOAD_FOLDER'], 'test_results')
+    os.path.join(app.config['UPLOAD_FOLDER'], 'test_results'),
+    os.path.join(app.config['UPLOAD_FOLDER'], chunked_upload.PARTIAL_DIR),
+    blob_store.blob_root(app.config['UPLOAD_FOLDER'])
 ]
 
 for directory in upload_dirs:
     ensure_directory_exists(directory)
-    print(f"Verified directory: {directory}")
+    logger.debug("Verified directory: %s", directory)
 
 # Initialize database
 db = SQLAlchemy(app)
+db_profile.init_app(app, db)
+
+# Count SQL statements per request; SQL_COUNT_HEADER=1 reports them in X-SQL-Count
+app.config['SQL_COUNT_HEADER'] = os.getenv('SQL_COUNT_HEADER', '') not in ('', '0', 'false')
+query_counter.init_app(app)
+metrics.init_app(app)
+# Set to require "Authorization: Bearer <token>" on /metrics
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')
 
 # Models
 class Admin(db.Model):
@@ -89,16 +140,35 @@ class Student(db.Model):
     email = db.Column(db.String(100), nullable=True)
     phone = db.Column(db.String(20), nullable=True)
     school_name = db.Column(db.String(200), nullable=True)
-    class_level = db.Column(db.String(10), nullable=False)  # 7th to 12th
+    class_level = db.Column(db.String(10), nullable=False, index=True)  # 7th to 12th
     admission_date = db.Column(db.Date, nullable=False)
     admission_form_path = db.Column(db.String(255), nullable=True)
 
 class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
-    date = db.Column(db.Date, nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False, index=True)
+    date = db.Column(db.Date, nullable=False, index=True)
     present = db.Column(db.Boolean, default=False)
     student = db.relationship('Student', backref=db.backref('attendances', lazy=True))
+    __table_args__ = (
+        # One attendance row per student per day; also the conflict target for bulk upserts
+        db.Index('uq_attendance_student_date', 'student_id', 'date', unique=True),
+    )
+
+class AttendanceSummary(db.Model):
+    # Monthly present/total counts per student, kept in step with Attendance by mark_attendance
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    class_level = db.Column(db.String(10), nullable=False, index=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+class ClassAttendanceSummary(db.Model):
+    # The same counts rolled up per class, so class-wide reports read one row per month
+    class_level = db.Column(db.String(10), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    present = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
 
 class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -111,19 +181,474 @@ class Test(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     subject = db.Column(db.String(50), nullable=False)
-    class_level = db.Column(db.String(10), nullable=False)  # 7th to 12th
+    class_level = db.Column(db.String(10), nullable=False, index=True)  # 7th to 12th
     date = db.Column(db.Date, nullable=False)
     max_marks = db.Column(db.Integer, nullable=False)
+    results_pdf_path = db.Column(db.String(255), nullable=True)  # Class results PDF, cleared when results change
+    results_version = db.Column(db.Integer, nullable=False, default=0)  # Bumped whenever this test's results change
 
 class TestResult(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    test_id = db.Column(db.Integer, db.ForeignKey('test.id'), nullable=False)
-    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id'), nullable=False, index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False, index=True)
     marks_obtained = db.Column(db.Float, nullable=False)
     test = db.relationship('Test', backref=db.backref('results', lazy=True))
     student = db.relationship('Student', backref=db.backref('test_results', lazy=True))
     pdf_path = db.Column(db.String(255), nullable=True)
     shared_to_whatsapp = db.Column(db.Boolean, default=False)
+    __table_args__ = (
+        # One result per student per test; also the conflict target for bulk upserts
+        db.Index('uq_test_result_test_student', 'test_id', 'student_id', unique=True),
+    )
+
+class TableVersion(db.Model):
+    # Change counter per table, bumped in the same transaction as every write so
+    # list endpoints can answer conditional requests without reading the table
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    # Background work picked up by the worker processes in jobs.py
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    dedupe_key = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    result_url = db.Column(db.String(255), nullable=True)
+    result_path = db.Column(db.String(255), nullable=True)  # File produced by the job, if any
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    worker_pid = db.Column(db.Integer, nullable=True)  # Process that claimed the running job
+    __table_args__ = (
+        # At most one queued or running job per dedupe_key, so duplicate submissions collapse
+        db.Index(
+            'uq_job_active_dedupe_key', 'dedupe_key', unique=True,
+            sqlite_where=text("status IN ('queued', 'running')"),
+            postgresql_where=text("status IN ('queued', 'running')")
+        ),
+    )
+
+class UploadSession(db.Model):
+    # A resumable upload in progress; its bytes live in uploads/partial/<id>.part
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # note or admission_form
+    filename = db.Column(db.String(255), nullable=False)  # Client's original file name
+    size = db.Column(db.Integer, nullable=False)
+    received = db.Column(db.Integer, nullable=False, default=0)
+    title = db.Column(db.String(100), nullable=True)  # Notes only
+    subject = db.Column(db.String(50), nullable=True)  # Notes only
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=True)  # Admission forms only
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow, index=True)
+
+# Bulk write helpers
+BULK_CHUNK_SIZE = 500
+
+def parse_id(value):
+    """Return value as an int id, accepting numeric strings as forms send them, or None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
+
+def upsert_insert():
+    """Return the dialect's ON CONFLICT-capable insert(), or None if it has none"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        return dialect_insert
+    return None
+
+def bulk_upsert(model, rows, key_columns, update_columns, existing_keys=(), increment_columns=()):
+    """Insert rows in bulk, updating update_columns where key_columns already exist.
+
+    increment_columns are added to the existing values instead of replacing them.
+    SQLite and PostgreSQL get a single INSERT ... ON CONFLICT DO UPDATE executed
+    in chunks. Other databases fall back to chunked executemany UPDATE/INSERT,
+    split using existing_keys (tuples of key_columns values).
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    dialect_insert = upsert_insert()
+
+    if dialect_insert is not None:
+        stmt = dialect_insert(table)
+        set_ = {column: stmt.excluded[column] for column in update_columns}
+        set_.update({column: table.c[column] + stmt.excluded[column] for column in increment_columns})
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[column] for column in key_columns],
+            set_=set_
+        )
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            db.session.execute(stmt, rows[start:start + BULK_CHUNK_SIZE])
+        return
+
+    existing_keys = set(existing_keys)
+    updates = []
+    inserts = []
+    for row in rows:
+        key = tuple(row[column] for column in key_columns)
+        if key in existing_keys:
+            params = {f"k_{column}": row[column] for column in key_columns}
+            params.update({f"v_{column}": row[column] for column in tuple(update_columns) + tuple(increment_columns)})
+            updates.append(params)
+        else:
+            inserts.append(row)
+
+    values = {column: bindparam(f"v_{column}") for column in update_columns}
+    values.update({column: table.c[column] + bindparam(f"v_{column}") for column in increment_columns})
+    update_stmt = update(table).where(
+        and_(*[table.c[column] == bindparam(f"k_{column}") for column in key_columns])
+    ).values(values)
+
+    for start in range(0, len(updates), BULK_CHUNK_SIZE):
+        db.session.execute(update_stmt, updates[start:start + BULK_CHUNK_SIZE])
+    for start in range(0, len(inserts), BULK_CHUNK_SIZE):
+        db.session.execute(insert(table), inserts[start:start + BULK_CHUNK_SIZE])
+
+# Attendance summaries
+def apply_attendance_deltas(month, deltas):
+    """Add per-student attendance changes for one month to both summary tables.
+
+    deltas maps student_id -> (class_level, present delta, total delta).
+    """
+    student_rows = []
+    class_deltas = {}
+    for student_id, (class_level, present, total) in deltas.items():
+        if not present and not total:
+            continue
+        student_rows.append({
+            'student_id': student_id, 'month': month, 'class_level': class_level,
+            'present': present, 'total': total
+        })
+        class_present, class_total = class_deltas.get(class_level, (0, 0))
+        class_deltas[class_level] = (class_present + present, class_total + total)
+    
+    if not student_rows:
+        return
+    
+    class_rows = [
+        {'class_level': class_level, 'month': month, 'present': present, 'total': total}
+        for class_level, (present, total) in class_deltas.items()
+    ]
+    
+    # Existing keys are only needed by the fallback path for databases without ON CONFLICT
+    existing_students, existing_classes = (), ()
+    if upsert_insert() is None:
+        existing_students = db.session.query(AttendanceSummary.student_id, AttendanceSummary.month).filter(
+            AttendanceSummary.month == month, AttendanceSummary.student_id.in_(list(deltas))
+        ).all()
+        existing_classes = db.session.query(ClassAttendanceSummary.class_level, ClassAttendanceSummary.month).filter(
+            ClassAttendanceSummary.month == month
+        ).all()
+    
+    bulk_upsert(AttendanceSummary, student_rows, key_columns=('student_id', 'month'), update_columns=(),
+                existing_keys=existing_students, increment_columns=('present', 'total'))
+    bulk_upsert(ClassAttendanceSummary, class_rows, key_columns=('class_level', 'month'), update_columns=(),
+                existing_keys=existing_classes, increment_columns=('present', 'total'))
+
+def remove_student_attendance_summary(student_id):
+    """Take a student's counts out of the class totals and drop their summary rows"""
+    for summary in AttendanceSummary.query.filter_by(student_id=student_id).all():
+        ClassAttendanceSummary.query.filter_by(class_level=summary.class_level, month=summary.month).update({
+            'present': ClassAttendanceSummary.present - summary.present,
+            'total': ClassAttendanceSummary.total - summary.total
+        }, synchronize_session=False)
+    AttendanceSummary.query.filter_by(student_id=student_id).delete()
+
+def attendance_percentage(present, total):
+    return round(present * 100.0 / total, 2) if total else None
+
+def parse_month_range():
+    """Read optional from/to YYYY-MM query parameters. Returns (from, to) or raises ValueError."""
+    bounds = []
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        if value:
+            datetime.datetime.strptime(value, '%Y-%m')
+        bounds.append(value or None)
+    return tuple(bounds)
+
+def filter_month_range(query, column, month_from, month_to):
+    # YYYY-MM strings sort chronologically
+    if month_from:
+        query = query.filter(column >= month_from)
+    if month_to:
+        query = query.filter(column <= month_to)
+    return query
+
+# Test statistics
+# Keyed by (test id, results_version), so an entry can never outlive the results it was built from
+test_stats_cache = TTLCache(
+    maxsize=int(os.getenv('TEST_STATS_CACHE_SIZE', '256')),
+    ttl=float(os.getenv('TEST_STATS_CACHE_TTL', '3600'))
+)
+
+def load_test_stats(tests):
+    """Return {test id: stats} for Test rows, computing every uncached one from a single query.
+
+    stats has the summary from compute_result_stats, the students ordered by rank,
+    and by_student mapping student id to that student's entry.
+    """
+    stats = {}
+    missing = {}
+    for test in tests:
+        cached = test_stats_cache.get((test.id, test.results_version))
+        if cached is None:
+            missing[test.id] = test
+        else:
+            stats[test.id] = cached
+    
+    if not missing:
+        return stats
+    
+    rows = {test_id: [] for test_id in missing}
+    for row in db.session.query(
+        TestResult.test_id, TestResult.student_id, Student.name, Student.admission_number, TestResult.marks_obtained
+    ).join(Student, Student.id == TestResult.student_id).filter(TestResult.test_id.in_(list(missing))):
+        rows[row.test_id].append(row)
+    
+    for test_id, test_rows in rows.items():
+        test = missing[test_id]
+        summary, ranks, percentiles = compute_result_stats([row.marks_obtained for row in test_rows], test.max_marks)
+        students = [{
+            'student_id': row.student_id,
+            'name': row.name,
+            'admission_number': row.admission_number,
+            'marks_obtained': row.marks_obtained,
+            'percentage': round(row.marks_obtained * 100.0 / test.max_marks, 2) if test.max_marks else None,
+            'rank': int(rank),
+            'percentile': round(float(percentile), 2)
+        } for row, rank, percentile in zip(test_rows, ranks, percentiles)]
+        students.sort(key=lambda student: (student['rank'], student['name']))
+        
+        entry = {
+            'summary': summary,
+            'students': students,
+            'by_student': {student['student_id']: student for student in students}
+        }
+        test_stats_cache.set((test.id, test.results_version), entry)
+        stats[test_id] = entry
+    
+    return stats
+
+# Authenticated principals
+# A lightweight, immutable view of the caller handed to route handlers in place of the
+# Admin/Student row. role is 'admin' or 'student'; class_level is only set for students
+# and selected_class only for admins.
+Principal = namedtuple('Principal', ['id', 'role', 'class_level', 'selected_class'])
+
+# Entries are keyed by the 'principal' change version, which select_class and
+# delete_student bump in their transaction. token_required reads it on every
+# request, so a change retires the cached principals in every worker process,
+# not just the one that made it.
+PRINCIPAL_VERSION = 'principal'
+
+principal_cache = TTLCache(
+    maxsize=int(os.getenv('PRINCIPAL_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('PRINCIPAL_CACHE_TTL', '30'))
+)
+
+def load_principal(role, principal_id, version):
+    """Return the cached principal for a token subject, loading it on a miss"""
+    key = (role, principal_id, version)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+    
+    if role == 'admin':
+        row = db.session.query(Admin.id, Admin.selected_class).filter_by(id=principal_id).first()
+        if row:
+            principal = Principal(id=row.id, role='admin', class_level=None, selected_class=row.selected_class)
+    else:
+        row = db.session.query(Student.id, Student.class_level).filter_by(id=principal_id).first()
+        if row:
+            principal = Principal(id=row.id, role='student', class_level=row.class_level, selected_class=None)
+    
+    if principal is not None:
+        principal_cache.set(key, principal)
+    return principal
+
+# Table change versions
+def bump_table_versions(*table_names):
+    """Increment the change counters for table_names in the current transaction"""
+    table = TableVersion.__table__
+    dialect_insert = upsert_insert()
+    
+    for table_name in table_names:
+        if dialect_insert is not None:
+            stmt = dialect_insert(table).values(table_name=table_name, version=1)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.table_name],
+                set_={'version': table.c.version + 1}
+            )
+            db.session.execute(stmt)
+        else:
+            updated = db.session.execute(
+                update(table).where(table.c.table_name == table_name).values(version=table.c.version + 1)
+            ).rowcount
+            if not updated:
+                db.session.execute(insert(table).values(table_name=table_name, version=1))
+
+def get_table_versions(*table_names):
+    """Return {table_name: version} for table_names, 0 for tables never written"""
+    rows = db.session.query(TableVersion.table_name, TableVersion.version).filter(
+        TableVersion.table_name.in_(table_names)
+    ).all()
+    versions = dict.fromkeys(table_names, 0)
+    versions.update(rows)
+    return versions
+
+def conditional_response(*table_names):
+    """Serve 304 Not Modified while none of table_names has changed.
+
+    Goes below token_required. The weak ETag is derived from the tables' change
+    versions, the full request path and the caller, so a matching
+    If-None-Match skips the handler and its queries entirely.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            current_user = kwargs['current_user']
+            # token_required already read them, along with the principal version
+            versions = g.get('table_versions')
+            if versions is None or not set(table_names) <= set(versions):
+                versions = get_table_versions(*table_names)
+            key = '|'.join([
+                ','.join(f"{name}:{versions[name]}" for name in table_names),
+                request.full_path,
+                f"{current_user.role}:{current_user.id}:{current_user.selected_class}"
+            ])
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+            
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        
+        # Read by token_required, which fetches these versions in its own query
+        decorated.version_tables = table_names
+        return decorated
+    
+    return decorator
+
+# Background jobs
+def enqueue_job(kind, target_id):
+    """Queue a job, or return the queued/running job already doing the same work"""
+    dedupe_key = f"{kind}:{target_id}"
+    active = Job.query.filter(Job.dedupe_key == dedupe_key, Job.status.in_(('queued', 'running'))).first()
+    if active:
+        return active
+    
+    job = Job(kind=kind, target_id=target_id, dedupe_key=dedupe_key, status='queued')
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request queued the same work between our check and insert
+        db.session.rollback()
+        job = Job.query.filter(Job.dedupe_key == dedupe_key, Job.status.in_(('queued', 'running'))).first()
+        if job is None:
+            # ...and it already finished, so queue a fresh one
+            return enqueue_job(kind, target_id)
+    return job
+
+def job_to_dict(job):
+    data = {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+    if job.status == 'done':
+        data['result_url'] = job.result_url
+        if job.kind == 'test_results_pdf':
+            data['pdf_url'] = job.result_url
+    if job.status == 'failed':
+        data['error'] = job.error
+    return data
+
+# Rendered PDF cache
+# PDFs are stored under a name derived from a hash of everything that appears in
+# them, so a changed mark or name produces a new file and a hit costs one stat().
+# Bump PDF_TEMPLATE_VERSION whenever the layout changes to retire old renders.
+# Superseded renders are removed by collect_unreferenced_pdfs().
+PDF_TEMPLATE_VERSION = 1
+
+def pdf_cache_dir():
+    return os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], 'test_results', 'cache'))
+
+def pdf_cache_path(kind, payload):
+    """Return the absolute cache path for a PDF of the given kind built from payload"""
+    key_source = json.dumps([kind, PDF_TEMPLATE_VERSION, payload], sort_keys=True, default=str)
+    key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+    return os.path.join(pdf_cache_dir(), key[:2], f"{kind}_{key}.pdf")
+
+def touch_cached_pdf(file_path):
+    """Mark a cached PDF as just used, so the collector leaves it alone. False if it is not cached."""
+    try:
+        os.utime(file_path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def render_cached_pdf(file_path, render):
+    """Write the bytes returned by render() to file_path unless it is already cached.
+
+    The PDF goes to a temporary file that is renamed into place, so a
+    concurrent reader never sees a half-written file. Returns True on a hit.
+    """
+    if touch_cached_pdf(file_path):
+        return True
+    
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    render_start = time.perf_counter()
+    pdf_data = render()
+    # Cache file names are <kind>_<sha256>.pdf
+    metrics.observe_pdf_render(os.path.basename(file_path).rsplit('_', 1)[0], time.perf_counter() - render_start)
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(pdf_data)
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return False
+
+def test_pdf_fields(test):
+    return {
+        'name': test.name,
+        'subject': test.subject,
+        'class_level': test.class_level,
+        'date': test.date.strftime('%Y-%m-%d'),
+        'max_marks': test.max_marks
+    }
 
 # Token required decorator
 def token_required(f):
@@ -138,11 +663,14 @@ def token_required(f):
         
         try:
             data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+            # One query for the principal version and the tables conditional_response needs
+            versions = get_table_versions(PRINCIPAL_VERSION, *getattr(f, 'version_tables', ()))
+            g.table_versions = versions
             if 'admin_id' in data:
-                current_user = Admin.query.get(data['admin_id'])
+                current_user = load_principal('admin', data['admin_id'], versions[PRINCIPAL_VERSION])
                 kwargs['is_admin'] = True
             else:
-                current_user = Student.query.get(data['student_id'])
+                current_user = load_principal('student', data['student_id'], versions[PRINCIPAL_VERSION])
                 kwargs['is_admin'] = False
             
             if not current_user:
@@ -156,6 +684,294 @@ def token_required(f):
     
     return decorated
 
+# Upload helpers
+UPLOAD_KINDS = ('note', 'admission_form')
+
+def store_upload(file):
+    """Save an uploaded file into the blob store and return its path"""
+    return blob_store.store_stream(app.config['UPLOAD_FOLDER'], file.stream, blob_store.file_extension(file.filename))
+
+def note_download_name(note):
+    # Blob names are hashes, so the download name comes from the note itself
+    extension = os.path.splitext(note.file_path)[1]
+    return secure_filename(f"{note.subject}_{note.title}_{note.upload_date.strftime('%Y%m%d')}{extension}")
+
+def upload_references(path):
+    """Number of notes and students whose file is path"""
+    return (
+        db.session.query(Note.id).filter(Note.file_path == path).count()
+        + db.session.query(Student.id).filter(Student.admission_form_path == path).count()
+    )
+
+def release_upload(path):
+    """Delete an uploaded file once nothing references it. Call after committing
+    the change that dropped the reference."""
+    if not path or upload_references(path) or not os.path.exists(path):
+        return
+    
+    if blob_store.is_blob(app.config['UPLOAD_FOLDER'], path):
+        # A blob touched within the grace period may be about to gain a reference;
+        # collect_unreferenced_blobs picks it up later
+        if time.time() - os.path.getmtime(path) < app.config['BLOB_GRACE_SECONDS']:
+            return
+    
+    try:
+        os.remove(path)
+    except Exception as e:
+        logger.error("Error deleting file %s: %s", path, e)
+
+def collect_unreferenced_blobs(grace=None):
+    """Delete blobs (and abandoned incoming copies) that nothing references and
+    that are older than grace seconds. Returns the number of files removed."""
+    if grace is None:
+        grace = app.config['BLOB_GRACE_SECONDS']
+    cutoff = time.time() - grace
+    folder = app.config['UPLOAD_FOLDER']
+    
+    referenced = {os.path.normpath(row[0]) for row in db.session.query(Note.file_path)}
+    referenced.update(
+        os.path.normpath(row[0]) for row in
+        db.session.query(Student.admission_form_path).filter(Student.admission_form_path.isnot(None))
+    )
+    db.session.rollback()
+    
+    incoming = os.path.join(blob_store.blob_root(folder), blob_store.INCOMING_DIR)
+    candidates = list(blob_store.iter_blobs(folder))
+    if os.path.isdir(incoming):
+        candidates.extend(os.path.join(incoming, name) for name in os.listdir(incoming))
+    
+    removed = 0
+    for path in candidates:
+        if os.path.normpath(path) in referenced:
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+def collect_unreferenced_pdfs(grace=None):
+    """Delete cached PDFs (and abandoned temporary renders) that no test or test
+    result points at and that have not been used for grace seconds. Returns the
+    number of files removed."""
+    if grace is None:
+        grace = app.config['PDF_CACHE_GRACE_SECONDS']
+    cutoff = time.time() - grace
+    
+    referenced = {
+        os.path.abspath(row[0]) for row in
+        db.session.query(Test.results_pdf_path).filter(Test.results_pdf_path.isnot(None)).union(
+            db.session.query(TestResult.pdf_path).filter(TestResult.pdf_path.isnot(None))
+        )
+    }
+    db.session.rollback()
+    
+    removed = 0
+    for root, _, files in os.walk(pdf_cache_dir()):
+        for name in files:
+            path = os.path.join(root, name)
+            if path in referenced:
+                continue
+            try:
+                # A cache hit refreshes the mtime, so a file being served or recorded is recent
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+def upload_session_to_dict(upload):
+    return {
+        'upload_id': upload.id,
+        'kind': upload.kind,
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.received,
+        'chunk_size': app.config['UPLOAD_CHUNK_SIZE'],
+        'upload_url': f'/api/admin/uploads/{upload.id}'
+    }
+
+def reap_stale_uploads(max_age=None):
+    """Delete upload sessions idle for longer than max_age seconds, and their
+    partial files. Returns the number of sessions removed."""
+    if max_age is None:
+        max_age = app.config['UPLOAD_STALE_SECONDS']
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=max_age)
+    folder = app.config['UPLOAD_FOLDER']
+    
+    stale_ids = [row[0] for row in db.session.query(UploadSession.id).filter(UploadSession.updated_at < cutoff)]
+    if stale_ids:
+        UploadSession.query.filter(UploadSession.id.in_(stale_ids)).delete(synchronize_session=False)
+        db.session.commit()
+        for upload_id in stale_ids:
+            chunked_upload.remove_partial(chunked_upload.partial_path(folder, upload_id))
+    
+    # Partial files whose session row is gone (e.g. a crash between the two deletes)
+    live_ids = {row[0] for row in db.session.query(UploadSession.id)}
+    db.session.rollback()
+    chunked_upload.remove_orphaned_partials(folder, live_ids, max_age)
+    return len(stale_ids)
+
+# List endpoint helpers
+MAX_PAGE_LIMIT = 500
+
+def format_date(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+# Field name -> (column, formatter) for each list endpoint's ?fields= projection
+STUDENT_FIELDS = {
+    'id': (Student.id, None),
+    'admission_number': (Student.admission_number, None),
+    'name': (Student.name, None),
+    'email': (Student.email, None),
+    'phone': (Student.phone, None),
+    'school_name': (Student.school_name, None),
+    'class_level': (Student.class_level, None),
+    'admission_date': (Student.admission_date, format_date),
+    'has_admission_form': (Student.admission_form_path, bool)
+}
+STUDENT_SORTS = ('id', 'name', 'admission_number', 'class_level', 'admission_date')
+
+TEST_FIELDS = {
+    'id': (Test.id, None),
+    'name': (Test.name, None),
+    'subject': (Test.subject, None),
+    'class_level': (Test.class_level, None),
+    'date': (Test.date, format_date),
+    'max_marks': (Test.max_marks, None)
+}
+TEST_SORTS = ('id', 'name', 'subject', 'class_level', 'date', 'max_marks')
+
+NOTE_FIELDS = {
+    'id': (Note.id, None),
+    'title': (Note.title, None),
+    'subject': (Note.subject, None),
+    'upload_date': (Note.upload_date, format_date)
+}
+NOTE_SORTS = ('id', 'title', 'subject', 'upload_date')
+
+def encode_cursor(sort, value, row_id):
+    """Opaque ?after= cursor holding the sort and the last row's (sort value, id)"""
+    if isinstance(value, datetime.date):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, sort, sort_column):
+    """Return the (sort value, id) of an ?after= cursor, or None if it is malformed or for another sort"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, row_id = json.loads(raw)
+        python_type = sort_column.type.python_type
+        if cursor_sort != sort or type(row_id) is not int:
+            return None
+        if python_type is datetime.date:
+            value = datetime.date.fromisoformat(value)
+        elif type(value) is not python_type:
+            return None
+        return value, row_id
+    except (ValueError, TypeError):
+        return None
+
+def list_response(model, query, fields, sortable):
+    """Serialize a list query, honouring ?fields=, ?sort=, ?after= and ?limit=.
+
+    Only the requested columns are selected. Pages are keyset-based: while
+    more rows remain, the X-Next-After header holds an opaque cursor with the
+    last row's sort value and id, and the next page is the rows after it. The
+    cursor does not depend on that row still existing. Without ?limit= every
+    row is returned, as before.
+
+    ?after_id= (with X-Next-After-Id) is still accepted. Under a sort other than
+    id it needs the row to exist and answers 400 once it has been deleted.
+    """
+    requested = request.args.get('fields')
+    if requested:
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in fields]
+        if unknown:
+            return jsonify({'message': f"Unknown fields: {', '.join(unknown)}"}), 400
+        # id is always returned since it is the pagination cursor
+        if 'id' not in names:
+            names.insert(0, 'id')
+    else:
+        names = list(fields)
+    
+    sort = request.args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort_name = sort.lstrip('-')
+    if sort_name not in sortable:
+        return jsonify({'message': f"Cannot sort by {sort_name}"}), 400
+    
+    # request.args.get(type=int) returns None for values that are not integers
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', type=int)
+    if ('after_id' in request.args and after_id is None) or ('limit' in request.args and limit is None):
+        return jsonify({'message': 'after_id and limit must be integers!'}), 400
+    if limit is not None and not 1 <= limit <= MAX_PAGE_LIMIT:
+        return jsonify({'message': f'limit must be between 1 and {MAX_PAGE_LIMIT}'}), 400
+    
+    sort_column = fields[sort_name][0]
+    if sort_name == 'id':
+        order_by = [model.id.desc() if descending else model.id]
+    else:
+        order_by = [sort_column.desc(), model.id.desc()] if descending else [sort_column, model.id]
+    
+    anchor = None
+    if 'after' in request.args:
+        anchor = decode_cursor(request.args['after'], sort, sort_column)
+        if anchor is None:
+            return jsonify({'message': 'Invalid cursor for this sort'}), 400
+    elif after_id is not None:
+        if sort_name == 'id':
+            anchor = (after_id, after_id)
+        else:
+            value = db.session.query(sort_column).filter(model.id == after_id).scalar()
+            if value is None:
+                return jsonify({'message': 'after_id row no longer exists; page with the X-Next-After cursor'}), 400
+            anchor = (value, after_id)
+    
+    if anchor is not None:
+        # Resume after the cursor's (sort value, id)
+        value, anchor_id = anchor
+        if sort_name == 'id':
+            query = query.filter(model.id < anchor_id if descending else model.id > anchor_id)
+        elif descending:
+            query = query.filter(or_(sort_column < value, and_(sort_column == value, model.id < anchor_id)))
+        else:
+            query = query.filter(or_(sort_column > value, and_(sort_column == value, model.id > anchor_id)))
+    
+    # The sort column is selected even when not requested, since the cursor holds its value
+    columns = [fields[name][0] for name in names]
+    sort_index = names.index(sort_name) if sort_name in names else len(columns)
+    if sort_index == len(columns):
+        columns.append(sort_column)
+    query = query.with_entities(*columns).order_by(*order_by)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    
+    rows = query.all()
+    has_more = limit is not None and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+    
+    formatters = [fields[name][1] for name in names]
+    result = []
+    for row in rows:
+        result.append({
+            name: formatter(value) if formatter else value
+            for name, formatter, value in zip(names, formatters, row)
+        })
+    
+    response = jsonify(result)
+    if has_more:
+        response.headers['X-Next-After'] = encode_cursor(sort, rows[-1][sort_index], result[-1]['id'])
+        response.headers['X-Next-After-Id'] = str(result[-1]['id'])
+    return response
+
 # Routes
 @app.route('/api/admin/login', methods=['POST'])
 def admin_login():
@@ -209,28 +1025,12 @@ def student_login():
 
 @app.route('/api/admin/students', methods=['GET'])
 @token_required
+@conditional_response('student')
 def get_students(current_user, is_admin):
     if not is_admin:
         return jsonify({'message': 'Not authorized!'}), 403
     
-    students = Student.query.all()
-    result = []
-    
-    for student in students:
-        student_data = {
-            'id': student.id,
-            'admission_number': student.admission_number,
-            'name': student.name,
-            'email': student.email,
-            'phone': student.phone,
-            'school_name': student.school_name,
-            'class_level': student.class_level,
-            'admission_date': student.admission_date.strftime('%Y-%m-%d'),
-            'has_admission_form': bool(student.admission_form_path)
-        }
-        result.append(student_data)
-    
-    return jsonify(result)
+    return list_response(Student, Student.query, STUDENT_FIELDS, STUDENT_SORTS)
 
 @app.route('/api/admin/students', methods=['POST'])
 @token_required
@@ -285,12 +1085,10 @@ def add_student(current_user, is_admin):
     if 'admission_form' in request.files:
         file = request.files['admission_form']
         if file and file.filename:
-            filename = secure_filename(f"{admission_number}_{file.filename}")
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'admission_forms', filename)
-            file.save(file_path)
-            new_student.admission_form_path = file_path
+            new_student.admission_form_path = store_upload(file)
     
     db.session.add(new_student)
+    bump_table_versions('student')
     db.session.commit()
     
     return jsonify({
@@ -317,12 +1115,11 @@ def upload_admission_form(current_user, is_admin, student_id):
     if file.filename == '':
         return jsonify({'message': 'No file selected!'}), 400
     
-    filename = secure_filename(f"{student.admission_number}_{file.filename}")
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'admission_forms', filename)
-    file.save(file_path)
-    
-    student.admission_form_path = file_path
+    previous_path = student.admission_form_path
+    student.admission_form_path = store_upload(file)
+    bump_table_versions('student')
     db.session.commit()
+    release_upload(previous_path)
     
     return jsonify({'message': 'Admission form uploaded successfully'})
 
@@ -332,12 +1129,12 @@ def get_admission_form(current_user, is_admin):
     if is_admin:
         return jsonify({'message': 'Not accessible by admin!'}), 403
     
-    student = current_user
-    if not student.admission_form_path:
+    student = db.session.get(Student, current_user.id)
+    if not student or not student.admission_form_path:
         return jsonify({'message': 'No admission form available!'}), 404
     
     try:
-        return send_file(student.admission_form_path, as_attachment=True, download_name=f"{student.admission_number}_admission_form.pdf")
+        return serve_file(student.admission_form_path, f"{student.admission_number}_admission_form.pdf")
     except FileNotFoundError:
         return jsonify({'message': 'File not found on server'}), 404
 
@@ -347,41 +1144,104 @@ def mark_attendance(current_user, is_admin):
     if not is_admin:
         return jsonify({'message': 'Not authorized!'}), 403
     
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     date_str = data.get('date')
     attendance_data = data.get('attendance')
-    
+
     try:
         attendance_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-    except ValueError:
+    except (TypeError, ValueError):
         return jsonify({'message': 'Invalid date format!'}), 400
-    
-    for item in attendance_data:
-        student_id = item.get('student_id')
-        present = item.get('present', False)
-        
-        # Check if attendance record already exists
-        attendance = Attendance.query.filter_by(
-            student_id=student_id,
-            date=attendance_date
-        ).first()
-        
-        if attendance:
-            attendance.present = present
+
+    if not isinstance(attendance_data, list):
+        return jsonify({'message': 'Attendance must be a list!'}), 400
+
+    # Validate the whole payload before touching the database. Each student is
+    # reported once: a later entry for the same student replaces the earlier one,
+    # as it did with per-row updates
+    # Keyed by student_id, or by position for entries without a usable id
+    outcomes = {}
+    rows = {}
+    for index, item in enumerate(attendance_data):
+        raw_id = item.get('student_id') if isinstance(item, dict) else None
+        present = item.get('present', False) if isinstance(item, dict) else None
+
+        student_id = parse_id(raw_id)
+        if student_id is None:
+            outcomes[('invalid', index)] = {'student_id': raw_id, 'status': 'rejected', 'reason': 'Invalid student_id'}
+            continue
+        rows.pop(student_id, None)
+        if present not in (True, False):
+            outcomes[student_id] = {'student_id': student_id, 'status': 'rejected', 'reason': 'Invalid present value'}
+            continue
+
+        outcomes[student_id] = {'student_id': student_id, 'status': None}
+        rows[student_id] = {'student_id': student_id, 'date': attendance_date, 'present': bool(present)}
+    outcomes = list(outcomes.values())
+
+    # Bump the version first: it updates one shared row, so this transaction now holds
+    # its lock (the row lock on PostgreSQL, the write lock on SQLite) until commit.
+    # Concurrent requests therefore read existing rows one after another, and each
+    # sees what the last committed, so no row is counted as inserted twice
+    bump_table_versions('attendance')
+
+    # One query for the students that exist and one for the rows already marked on this date
+    known_ids = {}
+    if rows:
+        known_ids = dict(
+            db.session.query(Student.id, Student.class_level).filter(Student.id.in_(list(rows))).all()
+        )
+    existing_ids = dict(
+        db.session.query(Attendance.student_id, Attendance.present).filter(Attendance.date == attendance_date).all()
+    )
+
+    for outcome in outcomes:
+        if outcome['status'] is not None:
+            continue
+        student_id = outcome['student_id']
+        if student_id not in known_ids:
+            outcome['status'] = 'rejected'
+            outcome['reason'] = 'Student not found'
+            rows.pop(student_id, None)
+        elif student_id in existing_ids:
+            outcome['status'] = 'updated'
         else:
-            attendance = Attendance(
-                student_id=student_id,
-                date=attendance_date,
-                present=present
-            )
-            db.session.add(attendance)
+            outcome['status'] = 'inserted'
+
+    bulk_upsert(
+        Attendance,
+        list(rows.values()),
+        key_columns=('student_id', 'date'),
+        update_columns=('present',),
+        existing_keys=[(student_id, attendance_date) for student_id in existing_ids]
+    )
     
+    # Keep the monthly summaries in step: a new row adds to total, a changed one only moves present
+    deltas = {}
+    for student_id, row in rows.items():
+        previous = existing_ids.get(student_id)
+        if previous is None:
+            deltas[student_id] = (known_ids[student_id], int(row['present']), 1)
+        else:
+            deltas[student_id] = (known_ids[student_id], int(row['present']) - int(bool(previous)), 0)
+    apply_attendance_deltas(attendance_date.strftime('%Y-%m'), deltas)
     db.session.commit()
-    
-    return jsonify({'message': 'Attendance marked successfully'})
+
+    counts = {'inserted': 0, 'updated': 0, 'rejected': 0}
+    for outcome in outcomes:
+        counts[outcome['status']] += 1
+
+    return jsonify({
+        'message': 'Attendance marked successfully',
+        'inserted': counts['inserted'],
+        'updated': counts['updated'],
+        'rejected': counts['rejected'],
+        'results': outcomes
+    })
 
 @app.route('/api/student/attendance', methods=['GET'])
 @token_required
+@conditional_response('attendance')
 def get_student_attendance(current_user, is_admin):
     if is_admin:
         return jsonify({'message': 'Not accessible by admin!'}), 403
@@ -398,6 +1258,133 @@ def get_student_attendance(current_user, is_admin):
     
     return jsonify(result)
 
+@app.route('/api/student/attendance/summary', methods=['GET'])
+@token_required
+@conditional_response('attendance')
+def get_student_attendance_summary(current_user, is_admin):
+    if is_admin:
+        return jsonify({'message': 'Not accessible by admin!'}), 403
+    
+    months = AttendanceSummary.query.filter_by(student_id=current_user.id).order_by(AttendanceSummary.month).all()
+    present = sum(summary.present for summary in months)
+    total = sum(summary.total for summary in months)
+    
+    return jsonify({
+        'present': present,
+        'total': total,
+        'percentage': attendance_percentage(present, total),
+        'months': [{
+            'month': summary.month,
+            'present': summary.present,
+            'total': summary.total,
+            'percentage': attendance_percentage(summary.present, summary.total)
+        } for summary in months]
+    })
+
+def student_attendance_totals(class_level, month_from, month_to):
+    """Query of (student id, name, admission number, class, present, total) summed over the month range"""
+    present = db.func.sum(AttendanceSummary.present)
+    total = db.func.sum(AttendanceSummary.total)
+    query = db.session.query(
+        Student.id, Student.name, Student.admission_number, Student.class_level, present, total
+    ).join(AttendanceSummary, AttendanceSummary.student_id == Student.id)
+    if class_level:
+        query = query.filter(AttendanceSummary.class_level == class_level)
+    query = filter_month_range(query, AttendanceSummary.month, month_from, month_to)
+    return query.group_by(Student.id, Student.name, Student.admission_number, Student.class_level), present, total
+
+def student_attendance_to_dict(row):
+    student_id, name, admission_number, class_level, present, total = row
+    return {
+        'student_id': student_id,
+        'name': name,
+        'admission_number': admission_number,
+        'class_level': class_level,
+        'present': present,
+        'total': total,
+        'percentage': attendance_percentage(present, total)
+    }
+
+@app.route('/api/admin/attendance/summary', methods=['GET'])
+@token_required
+@conditional_response('attendance', 'student')
+def get_attendance_summary(current_user, is_admin):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    try:
+        month_from, month_to = parse_month_range()
+    except ValueError:
+        return jsonify({'message': 'from and to must be YYYY-MM!'}), 400
+    
+    class_level = request.args.get('class_level') or current_user.selected_class
+    query, _, _ = student_attendance_totals(class_level, month_from, month_to)
+    return jsonify([student_attendance_to_dict(row) for row in query.order_by(Student.name).all()])
+
+@app.route('/api/admin/attendance/class-averages', methods=['GET'])
+@token_required
+@conditional_response('attendance')
+def get_class_attendance_averages(current_user, is_admin):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    try:
+        month_from, month_to = parse_month_range()
+    except ValueError:
+        return jsonify({'message': 'from and to must be YYYY-MM!'}), 400
+    
+    query = filter_month_range(ClassAttendanceSummary.query, ClassAttendanceSummary.month, month_from, month_to)
+    class_level = request.args.get('class_level')
+    if class_level:
+        query = query.filter(ClassAttendanceSummary.class_level == class_level)
+    
+    classes = {}
+    for summary in query.order_by(ClassAttendanceSummary.class_level, ClassAttendanceSummary.month).all():
+        entry = classes.setdefault(summary.class_level, {
+            'class_level': summary.class_level, 'present': 0, 'total': 0, 'months': []
+        })
+        entry['present'] += summary.present
+        entry['total'] += summary.total
+        entry['months'].append({
+            'month': summary.month,
+            'present': summary.present,
+            'total': summary.total,
+            'percentage': attendance_percentage(summary.present, summary.total)
+        })
+    
+    for entry in classes.values():
+        entry['percentage'] = attendance_percentage(entry['present'], entry['total'])
+    
+    return jsonify(list(classes.values()))
+
+@app.route('/api/admin/attendance/below-threshold', methods=['GET'])
+@token_required
+@conditional_response('attendance', 'student')
+def get_students_below_attendance_threshold(current_user, is_admin):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    try:
+        threshold = float(request.args.get('threshold', '75'))
+    except ValueError:
+        threshold = None
+    if threshold is None or not 0 <= threshold <= 100:
+        return jsonify({'message': 'threshold must be a percentage between 0 and 100!'}), 400
+    
+    try:
+        month_from, month_to = parse_month_range()
+    except ValueError:
+        return jsonify({'message': 'from and to must be YYYY-MM!'}), 400
+    
+    query, present, total = student_attendance_totals(request.args.get('class_level'), month_from, month_to)
+    # present / total < threshold%, compared without dividing so months with no records cannot fail
+    query = query.having(present * 100 < total * threshold).order_by((present * 1.0 / total), Student.name)
+    
+    return jsonify({
+        'threshold': threshold,
+        'students': [student_attendance_to_dict(row) for row in query.all()]
+    })
+
 @app.route('/api/admin/notes', methods=['POST'])
 @token_required
 def upload_note(current_user, is_admin):
@@ -417,9 +1404,7 @@ def upload_note(current_user, is_admin):
     if not title or not subject:
         return jsonify({'message': 'Title and subject are required!'}), 400
     
-    filename = secure_filename(f"{subject}_{title}_{datetime.datetime.now().strftime('%Y%m%d')}_{file.filename}")
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'notes', filename)
-    file.save(file_path)
+    file_path = store_upload(file)
     
     new_note = Note(
         title=title,
@@ -429,12 +1414,173 @@ def upload_note(current_user, is_admin):
     )
     
     db.session.add(new_note)
+    bump_table_versions('note')
     db.session.commit()
     
     return jsonify({'message': 'Note uploaded successfully'})
 
+# Resumable uploads: POST to start, PUT chunks at ?offset=, POST .../complete with the SHA-256.
+# GET on the upload returns the offset to resume from after a dropped connection.
+@app.route('/api/admin/uploads', methods=['POST'])
+@token_required
+def start_upload(current_user, is_admin):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    filename = data.get('filename')
+    size = data.get('size')
+    
+    if kind not in UPLOAD_KINDS:
+        return jsonify({'message': f"kind must be one of: {', '.join(UPLOAD_KINDS)}"}), 400
+    if not filename or not secure_filename(filename):
+        return jsonify({'message': 'A file name is required!'}), 400
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return jsonify({'message': 'size must be a positive number of bytes!'}), 400
+    if size > app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'message': f"File is larger than the {app.config['MAX_UPLOAD_SIZE']} byte limit!"}), 413
+    
+    upload = UploadSession(id=uuid.uuid4().hex, kind=kind, filename=filename, size=size)
+    if kind == 'note':
+        upload.title = data.get('title')
+        upload.subject = data.get('subject')
+        if not upload.title or not upload.subject:
+            return jsonify({'message': 'Title and subject are required!'}), 400
+    else:
+        upload.student_id = data.get('student_id')
+        if not isinstance(upload.student_id, int) or not db.session.get(Student, upload.student_id):
+            return jsonify({'message': 'Student not found!'}), 404
+    
+    chunked_upload.create_partial(chunked_upload.partial_path(app.config['UPLOAD_FOLDER'], upload.id))
+    db.session.add(upload)
+    db.session.commit()
+    
+    return jsonify(upload_session_to_dict(upload)), 201
+
+@app.route('/api/admin/uploads/<upload_id>', methods=['GET'])
+@token_required
+def get_upload(current_user, is_admin, upload_id):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    upload = db.session.get(UploadSession, upload_id)
+    if not upload:
+        return jsonify({'message': 'Upload not found!'}), 404
+    
+    return jsonify(upload_session_to_dict(upload))
+
+@app.route('/api/admin/uploads/<upload_id>', methods=['PUT'])
+@token_required
+def upload_chunk(current_user, is_admin, upload_id):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    upload = db.session.get(UploadSession, upload_id)
+    if not upload:
+        return jsonify({'message': 'Upload not found!'}), 404
+    
+    offset = request.args.get('offset', type=int)
+    length = request.content_length
+    if offset is None or offset < 0:
+        return jsonify({'message': 'offset is required!'}), 400
+    if length is None:
+        return jsonify({'message': 'Content-Length is required!'}), 411
+    if length > app.config['UPLOAD_CHUNK_SIZE']:
+        return jsonify({'message': f"Chunks may be at most {app.config['UPLOAD_CHUNK_SIZE']} bytes!"}), 413
+    if offset + length > upload.size:
+        return jsonify({'message': 'Chunk runs past the declared file size!', 'offset': upload.received}), 400
+    # Chunks may be resent, but never leave a gap
+    if offset > upload.received:
+        return jsonify({'message': 'Offset is past the data received so far!', 'offset': upload.received}), 409
+    
+    path = chunked_upload.partial_path(app.config['UPLOAD_FOLDER'], upload.id)
+    written = chunked_upload.write_chunk(path, offset, request.stream, length)
+    
+    # Conditional update so two workers racing on the same upload cannot both advance it
+    updated = UploadSession.query.filter_by(id=upload.id, received=upload.received).update({
+        'received': offset + written,
+        'updated_at': datetime.datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    db.session.refresh(upload)
+    
+    if not updated:
+        return jsonify({'message': 'Upload changed concurrently, resume from offset', 'offset': upload.received}), 409
+    if written < length:
+        return jsonify({'message': 'Chunk was cut short, resume from offset', 'offset': upload.received}), 400
+    
+    return jsonify(upload_session_to_dict(upload))
+
+@app.route('/api/admin/uploads/<upload_id>/complete', methods=['POST'])
+@token_required
+def complete_upload(current_user, is_admin, upload_id):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    upload = db.session.get(UploadSession, upload_id)
+    if not upload:
+        return jsonify({'message': 'Upload not found!'}), 404
+    
+    if upload.received != upload.size:
+        return jsonify({'message': 'Upload is incomplete!', 'offset': upload.received}), 409
+    
+    checksum = ((request.get_json(silent=True) or {}).get('sha256') or '').lower()
+    if not checksum:
+        return jsonify({'message': 'sha256 checksum is required!'}), 400
+    
+    path = chunked_upload.partial_path(app.config['UPLOAD_FOLDER'], upload.id)
+    digest = blob_store.hash_file(path)
+    if digest != checksum:
+        return jsonify({'message': 'Checksum does not match the uploaded data!', 'offset': upload.received}), 400
+    
+    previous_path = None
+    if upload.kind == 'note':
+        file_path = blob_store.store_file(app.config['UPLOAD_FOLDER'], path, digest, blob_store.file_extension(upload.filename))
+        db.session.add(Note(
+            title=upload.title,
+            subject=upload.subject,
+            file_path=file_path,
+            upload_date=datetime.datetime.now().date()
+        ))
+        bump_table_versions('note')
+        message = 'Note uploaded successfully'
+    else:
+        student = db.session.get(Student, upload.student_id)
+        if not student:
+            return jsonify({'message': 'Student not found!'}), 404
+        previous_path = student.admission_form_path
+        student.admission_form_path = blob_store.store_file(
+            app.config['UPLOAD_FOLDER'], path, digest, blob_store.file_extension(upload.filename)
+        )
+        bump_table_versions('student')
+        message = 'Admission form uploaded successfully'
+    
+    db.session.delete(upload)
+    db.session.commit()
+    release_upload(previous_path)
+    
+    return jsonify({'message': message}), 201
+
+@app.route('/api/admin/uploads/<upload_id>', methods=['DELETE'])
+@token_required
+def cancel_upload(current_user, is_admin, upload_id):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    upload = db.session.get(UploadSession, upload_id)
+    if not upload:
+        return jsonify({'message': 'Upload not found!'}), 404
+    
+    db.session.delete(upload)
+    db.session.commit()
+    chunked_upload.remove_partial(chunked_upload.partial_path(app.config['UPLOAD_FOLDER'], upload_id))
+    
+    return jsonify({'message': 'Upload cancelled'})
+
 @app.route('/api/notes', methods=['GET'])
 @token_required
+@conditional_response('note')
 def get_notes(current_user, is_admin):
     subject = request.args.get('subject')
     
@@ -442,18 +1588,106 @@ def get_notes(current_user, is_admin):
     if subject:
         query = query.filter_by(subject=subject)
     
-    notes = query.all()
-    result = []
+    return list_response(Note, query, NOTE_FIELDS, NOTE_SORTS)
+
+class ZipStream:
+    """Write-only file object that buffers what zipfile writes so it can be yielded.
+
+    It cannot seek, so zipfile writes each entry's sizes in a trailing data
+    descriptor and the archive can be streamed as it is built.
+    """
     
-    for note in notes:
-        result.append({
-            'id': note.id,
-            'title': note.title,
-            'subject': note.subject,
-            'upload_date': note.upload_date.strftime('%Y-%m-%d')
-        })
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
     
-    return jsonify(result)
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._offset
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+ARCHIVE_CHUNK_SIZE = 256 * 1024
+
+@app.route('/api/notes/archive', methods=['GET'])
+def download_notes_archive():
+    # Accept the token as a query parameter (for plain download links) or a header
+    token = request.args.get('token')
+    if not token and 'Authorization' in request.headers:
+        token = request.headers['Authorization'].split(" ")[-1]
+    
+    if not token:
+        return jsonify({'message': 'Token is missing!'}), 401
+    
+    try:
+        jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+    except Exception:
+        return jsonify({'message': 'Invalid token!'}), 401
+    
+    subject = request.args.get('subject')
+    query = db.session.query(Note.id, Note.title, Note.subject, Note.file_path, Note.upload_date)
+    if subject:
+        query = query.filter(Note.subject == subject)
+    
+    # The archive only changes when a note is added or removed
+    newest, count = query.with_entities(db.func.max(Note.upload_date), db.func.count(Note.id)).one()
+    version = get_table_versions('note')['note']
+    etag = hashlib.sha1(f"{subject}|{newest}|{count}|{version}".encode('utf-8')).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    
+    notes = query.order_by(Note.id).all()
+    if not notes:
+        return jsonify({'message': 'No notes found!'}), 404
+    
+    def generate():
+        stream = ZipStream()
+        names = set()
+        with zipfile.ZipFile(stream, 'w') as archive:
+            for note in notes:
+                if not os.path.exists(note.file_path):
+                    continue
+                
+                arcname = note_download_name(note)
+                if arcname in names:
+                    arcname = f"{note.id}_{arcname}"
+                names.add(arcname)
+                
+                info = zipfile.ZipInfo(arcname, date_time=note.upload_date.timetuple()[:6])
+                info.file_size = os.path.getsize(note.file_path)
+                # PDFs are already compressed; deflating them again only burns CPU
+                if arcname.lower().endswith('.pdf'):
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                
+                with open(note.file_path, 'rb') as source, archive.open(info, 'w') as target:
+                    while True:
+                        chunk = source.read(ARCHIVE_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        yield stream.drain()
+        yield stream.drain()
+    
+    filename = secure_filename(f"{subject or 'all'}_notes.zip")
+    response = app.response_class(generate(), mimetype='application/zip', direct_passthrough=True)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(etag, weak=True)
+    return response
 
 @app.route('/api/notes/<int:note_id>/download', methods=['GET'])
 def download_note(note_id):
@@ -472,8 +1706,7 @@ def download_note(note_id):
             return jsonify({'message': 'Note not found!'}), 404
         
         try:
-            filename = os.path.basename(note.file_path)
-            return send_file(note.file_path, as_attachment=True, download_name=filename)
+            return serve_file(note.file_path, note_download_name(note))
         except FileNotFoundError:
             return jsonify({'message': 'File not found on server'}), 404
     except:
@@ -506,6 +1739,7 @@ def add_test(current_user, is_admin):
     )
     
     db.session.add(new_test)
+    bump_table_versions('test')
     db.session.commit()
     
     return jsonify({
@@ -523,74 +1757,211 @@ def add_test_results(current_user, is_admin, test_id):
     if not test:
         return jsonify({'message': 'Test not found!'}), 404
     
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     results = data.get('results')
-    
-    for result in results:
-        student_id = result.get('student_id')
-        marks_obtained = result.get('marks_obtained')
-        
-        # Check if result already exists
-        test_result = TestResult.query.filter_by(
-            test_id=test_id,
-            student_id=student_id
-        ).first()
-        
-        if test_result:
-            test_result.marks_obtained = marks_obtained
-        else:
-            test_result = TestResult(
-                test_id=test_id,
-                student_id=student_id,
-                marks_obtained=marks_obtained
-            )
-            db.session.add(test_result)
-    
+
+    if not isinstance(results, list):
+        return jsonify({'message': 'Results must be a list!'}), 400
+
+    # One query for the class roster and one for the results already recorded
+    roster_ids = {
+        student_id for (student_id,) in
+        db.session.query(Student.id).filter_by(class_level=test.class_level).all()
+    }
+    existing_ids = {
+        student_id for (student_id,) in
+        db.session.query(TestResult.student_id).filter_by(test_id=test_id).all()
+    }
+
+    # Validate every row in memory before writing anything. Each student is reported
+    # once: a later entry for the same student replaces the earlier one, as it did
+    # with per-row updates. Keyed by student_id, or by position without a usable id
+    outcomes = {}
+    rows = {}
+    for index, result in enumerate(results):
+        raw_id = result.get('student_id') if isinstance(result, dict) else None
+        student_id = parse_id(raw_id)
+        marks_obtained = result.get('marks_obtained') if isinstance(result, dict) else None
+        if isinstance(marks_obtained, str):
+            # Forms send marks as text; numeric strings were always accepted
+            try:
+                marks_obtained = float(marks_obtained)
+            except ValueError:
+                pass
+
+        if student_id is None:
+            outcomes[('invalid', index)] = {'student_id': raw_id, 'status': 'rejected', 'reason': 'Invalid student_id'}
+            continue
+        rows.pop(student_id, None)
+
+        reason = None
+        if student_id not in roster_ids:
+            reason = f'Student is not in class {test.class_level}'
+        elif (not isinstance(marks_obtained, (int, float)) or isinstance(marks_obtained, bool)
+                or not math.isfinite(marks_obtained)):
+            # Flask's JSON parser accepts NaN and Infinity, which slip through the range check
+            reason = 'Invalid marks_obtained'
+        elif marks_obtained < 0 or marks_obtained > test.max_marks:
+            reason = f'marks_obtained must be between 0 and {test.max_marks}'
+
+        if reason:
+            outcomes[student_id] = {'student_id': student_id, 'status': 'rejected', 'reason': reason}
+            continue
+
+        outcomes[student_id] = {
+            'student_id': student_id,
+            'status': 'updated' if student_id in existing_ids else 'inserted'
+        }
+        rows[student_id] = {
+            'test_id': test_id,
+            'student_id': student_id,
+            'marks_obtained': float(marks_obtained)
+        }
+
+    bulk_upsert(
+        TestResult,
+        list(rows.values()),
+        key_columns=('test_id', 'student_id'),
+        update_columns=('marks_obtained',),
+        existing_keys=[(test_id, student_id) for student_id in existing_ids]
+    )
+    if rows:
+        # The class results PDF and statistics no longer match; per-student PDFs are keyed by marks
+        test.results_pdf_path = None
+        test.results_version = Test.results_version + 1
+    bump_table_versions('test_result')
     db.session.commit()
-    
-    return jsonify({'message': 'Test results added successfully'})
+
+    outcomes = list(outcomes.values())
+    counts = {'inserted': 0, 'updated': 0, 'rejected': 0}
+    for outcome in outcomes:
+        counts[outcome['status']] += 1
+
+    return jsonify({
+        'message': 'Test results added successfully',
+        'inserted': counts['inserted'],
+        'updated': counts['updated'],
+        'rejected': counts['rejected'],
+        'results': outcomes
+    })
 
 @app.route('/api/student/tests', methods=['GET'])
 @token_required
+@conditional_response('test', 'test_result')
 def get_student_tests(current_user, is_admin):
     if is_admin:
         return jsonify({'message': 'Not accessible by admin!'}), 403
     
     student = current_user
-    results = TestResult.query.filter_by(student_id=student.id).all()
+    # Load each result's test in the same query rather than one lazy load per row
+    results = TestResult.query.options(joinedload(TestResult.test)).filter_by(student_id=student.id).all()
+    stats = load_test_stats({result.test.id: result.test for result in results}.values())
     result_data = []
     
     for result in results:
+        standing = stats[result.test_id]['by_student'].get(student.id, {})
         result_data.append({
             'test_name': result.test.name,
             'subject': result.test.subject,
             'date': result.test.date.strftime('%Y-%m-%d'),
             'max_marks': result.test.max_marks,
-            'marks_obtained': result.marks_obtained
+            'marks_obtained': result.marks_obtained,
+            'rank': standing.get('rank'),
+            'percentile': standing.get('percentile'),
+            'total_students': stats[result.test_id]['summary']['count']
         })
     
     return jsonify(result_data)
 
-@app.route('/api/admin/tests', methods=['GET'])
+@app.route('/api/admin/tests/<int:test_id>/stats', methods=['GET'])
 @token_required
-def get_tests(current_user, is_admin):
+@conditional_response('test', 'test_result', 'student')
+def get_test_stats(current_user, is_admin, test_id):
     if not is_admin:
         return jsonify({'message': 'Not authorized!'}), 403
     
-    tests = Test.query.all()
-    result = []
+    test = db.session.get(Test, test_id)
+    if not test:
+        return jsonify({'message': 'Test not found!'}), 404
     
-    for test in tests:
-        result.append({
-            'id': test.id,
-            'name': test.name,
+    stats = load_test_stats([test])[test.id]
+    return jsonify({
+        'test_id': test.id,
+        'name': test.name,
+        'subject': test.subject,
+        'class_level': test.class_level,
+        'date': test.date.strftime('%Y-%m-%d'),
+        'max_marks': test.max_marks,
+        **stats['summary'],
+        'students': stats['students']
+    })
+
+DASHBOARD_RECENT_RESULTS = 5
+DASHBOARD_NEWEST_NOTES = 5
+
+@app.route('/api/student/dashboard', methods=['GET'])
+@token_required
+@conditional_response('attendance', 'test', 'test_result', 'note')
+def get_student_dashboard(current_user, is_admin):
+    """Everything the student app shows on launch, in one response"""
+    if is_admin:
+        return jsonify({'message': 'Not accessible by admin!'}), 403
+    
+    # Attendance from the monthly summary rather than the raw rows
+    present, total = db.session.query(
+        db.func.coalesce(db.func.sum(AttendanceSummary.present), 0),
+        db.func.coalesce(db.func.sum(AttendanceSummary.total), 0)
+    ).filter(AttendanceSummary.student_id == current_user.id).one()
+    
+    results = TestResult.query.options(joinedload(TestResult.test)).join(Test).filter(
+        TestResult.student_id == current_user.id
+    ).order_by(Test.date.desc(), Test.id.desc()).limit(DASHBOARD_RECENT_RESULTS).all()
+    stats = load_test_stats([result.test for result in results])
+    
+    recent_results = []
+    for result in results:
+        test = result.test
+        standing = stats[test.id]['by_student'].get(current_user.id, {})
+        recent_results.append({
+            'test_id': test.id,
+            'test_name': test.name,
             'subject': test.subject,
-            'class_level': test.class_level,
             'date': test.date.strftime('%Y-%m-%d'),
-            'max_marks': test.max_marks
+            'max_marks': test.max_marks,
+            'marks_obtained': result.marks_obtained,
+            'percentage': round(result.marks_obtained * 100.0 / test.max_marks, 2) if test.max_marks else None,
+            'rank': standing.get('rank'),
+            'percentile': standing.get('percentile')
         })
     
-    return jsonify(result)
+    # Notes are not tied to a class, so every student sees the newest ones overall
+    notes = db.session.query(Note.id, Note.title, Note.subject, Note.upload_date).order_by(
+        Note.upload_date.desc(), Note.id.desc()
+    ).limit(DASHBOARD_NEWEST_NOTES).all()
+    
+    return jsonify({
+        'attendance': {
+            'present': present,
+            'total': total,
+            'percentage': attendance_percentage(present, total)
+        },
+        'recent_results': recent_results,
+        'newest_notes': [{
+            'id': note.id,
+            'title': note.title,
+            'subject': note.subject,
+            'upload_date': format_date(note.upload_date)
+        } for note in notes]
+    })
+
+@app.route('/api/admin/tests', methods=['GET'])
+@token_required
+@conditional_response('test')
+def get_tests(current_user, is_admin):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    return list_response(Test, Test.query, TEST_FIELDS, TEST_SORTS)
 
 @app.route('/api/student/test-results/<int:test_result_id>/pdf', methods=['GET'])
 @token_required
@@ -599,73 +1970,41 @@ def get_test_result_pdf(current_user, is_admin, test_result_id):
         return jsonify({'message': 'Not accessible by admin!'}), 403
     
     try:
-        test_result = TestResult.query.get(test_result_id)
+        test_result = db.session.get(
+            TestResult, test_result_id,
+            options=[joinedload(TestResult.test), joinedload(TestResult.student)]
+        )
         if not test_result:
             return jsonify({'message': 'Test result not found!'}), 404
         
-        if not test_result.pdf_path or not os.path.exists(test_result.pdf_path):
-            # Generate PDF
-            test_results_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'test_results')
-            os.makedirs(test_results_dir, exist_ok=True)
-            
-            # Create a PDF with a unique timestamp
-            timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-            filename = f"{test_result.test.name}_{test_result.student.name}_{timestamp}.pdf"
-            file_path = os.path.join(test_results_dir, filename)
-            
-            # Generate PDF using reportlab
-            doc = SimpleDocTemplate(file_path, pagesize=letter)
-            styles = getSampleStyleSheet()
-            
-            # Create content
-            content = []
-            
-            # Add title
-            title = Paragraph(f"Test Result: {test_result.test.name}", styles['Title'])
-            content.append(title)
-            
-            # Add details
-            content.append(Paragraph(f"<b>Student:</b> {test_result.student.name}", styles['Normal']))
-            content.append(Paragraph(f"<b>Subject:</b> {test_result.test.subject}", styles['Normal']))
-            content.append(Paragraph(f"<b>Class:</b> {test_result.test.class_level}", styles['Normal']))
-            content.append(Paragraph(f"<b>Date:</b> {test_result.test.date.strftime('%Y-%m-%d')}", styles['Normal']))
-            content.append(Spacer(1, 0.25*inch))
-            content.append(Paragraph(f"<b>Maximum Marks:</b> {test_result.test.max_marks}", styles['Normal']))
-            content.append(Paragraph(f"<b>Marks Obtained:</b> {test_result.marks_obtained}", styles['Normal']))
-            
-            percentage = (test_result.marks_obtained / test_result.test.max_marks) * 100
-            content.append(Paragraph(f"<b>Percentage:</b> {percentage:.2f}%", styles['Normal']))
-            
-            # Build PDF
-            try:
-                doc.build(content)
-                print(f"Student PDF generated successfully at: {file_path}")
-            except Exception as e:
-                print(f"Error building student PDF: {str(e)}")
-                return jsonify({'message': f'Error building PDF: {str(e)}'}), 500
-                
-            # Make path absolute if it's not already
-            if not os.path.isabs(file_path):
-                file_path = os.path.abspath(file_path)
-                
+        test = test_result.test
+        student = test_result.student
+        pdf_input = {
+            'test': test_pdf_fields(test),
+            'student_name': student.name,
+            'marks_obtained': test_result.marks_obtained
+        }
+        file_path = pdf_cache_path('student_result', pdf_input)
+        
+        # Build PDF unless an identical one is already cached
+        try:
+            if not render_cached_pdf(file_path, lambda: reports.render_student_result(pdf_input)):
+                logger.info("Student PDF generated at %s", file_path)
+        except Exception as e:
+            logger.exception("Error building student PDF")
+            return jsonify({'message': f'Error building PDF: {str(e)}'}), 500
+        
+        if test_result.pdf_path != file_path:
             test_result.pdf_path = file_path
             db.session.commit()
         
         try:
-            filename = os.path.basename(test_result.pdf_path)
-            return send_file(
-                test_result.pdf_path, 
-                as_attachment=True, 
-                download_name=filename,
-                mimetype='application/pdf'
-            )
+            filename = secure_filename(f"{test.name}_{student.name}.pdf")
+            return serve_file(file_path, filename, mimetype='application/pdf')
         except FileNotFoundError:
             return jsonify({'message': 'PDF file not found on server'}), 404
     except Exception as e:
-        # Log the error
-        print(f"Student PDF Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Student PDF error")
         return jsonify({'message': f'Error generating or downloading PDF: {str(e)}'}), 500
 
 @app.route('/api/admin/select-class', methods=['POST'])
@@ -681,8 +2020,8 @@ def select_class(current_user, is_admin):
         return jsonify({'message': 'Class level is required!'}), 400
     
     # Update admin's selected class
-    admin = Admin.query.get(current_user.id)
-    admin.selected_class = class_level
+    Admin.query.filter_by(id=current_user.id).update({'selected_class': class_level})
+    bump_table_versions(PRINCIPAL_VERSION)
     db.session.commit()
     
     return jsonify({'message': f'Class {class_level} selected successfully!'})
@@ -693,64 +2032,182 @@ def get_current_class(current_user, is_admin):
     if not is_admin:
         return jsonify({'message': 'Not authorized!'}), 403
     
-    admin = Admin.query.get(current_user.id)
-    
     return jsonify({
-        'selected_class': admin.selected_class
+        'selected_class': current_user.selected_class
     })
 
+@app.route('/api/admin/principal-cache', methods=['GET'])
+@token_required
+def get_principal_cache_stats(current_user, is_admin):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+
+    # Counters are per worker process
+    return jsonify(principal_cache.stats())
+
 @app.route('/api/admin/class-students', methods=['GET'])
 @token_required
+@conditional_response('student')
 def get_class_students(current_user, is_admin):
     if not is_admin:
         return jsonify({'message': 'Not authorized!'}), 403
     
-    admin = Admin.query.get(current_user.id)
-    if not admin.selected_class:
+    if not current_user.selected_class:
         return jsonify({'message': 'No class selected!'}), 400
     
-    students = Student.query.filter_by(class_level=admin.selected_class).all()
-    result = []
-    
-    for student in students:
-        result.append({
-            'id': student.id,
-            'admission_number': student.admission_number,
-            'name': student.name,
-            'email': student.email,
-            'phone': student.phone,
-            'school_name': student.school_name,
-            'class_level': student.class_level,
-            'admission_date': student.admission_date.strftime('%Y-%m-%d'),
-            'has_admission_form': bool(student.admission_form_path)
-        })
-    
-    return jsonify(result)
+    query = Student.query.filter_by(class_level=current_user.selected_class)
+    return list_response(Student, query, STUDENT_FIELDS, STUDENT_SORTS)
 
 @app.route('/api/admin/class-tests', methods=['GET'])
 @token_required
+@conditional_response('test')
 def get_class_tests(current_user, is_admin):
     if not is_admin:
         return jsonify({'message': 'Not authorized!'}), 403
     
-    admin = Admin.query.get(current_user.id)
-    if not admin.selected_class:
+    if not current_user.selected_class:
         return jsonify({'message': 'No class selected!'}), 400
     
-    tests = Test.query.filter_by(class_level=admin.selected_class).all()
-    result = []
+    query = Test.query.filter_by(class_level=current_user.selected_class)
+    return list_response(Test, query, TEST_FIELDS, TEST_SORTS)
+
+class ResultsChanged(Exception):
+    """The test's results changed while its PDF was rendering; the job worker queues it again"""
+
+def build_test_results_pdf(test_id):
+    """Render the class results PDF for a test and record it on the test.
+
+    Runs inside the job worker (see jobs.py). Returns the PDF path. Raises
+    ResultsChanged, without recording the path, if add_test_results committed
+    new results while the PDF was rendering.
+    """
+    test = db.session.get(Test, test_id)
+    if not test:
+        raise ValueError(f'Test {test_id} not found')
+    # Read before the rows, so rows newer than this version can only cause a needless retry
+    seen_version = test.results_version
+    
+    # Collect the table rows first, in one join; they are part of the cache key
+    rows = [
+        [name, admission_number, phone or 'N/A', marks_obtained]
+        for name, admission_number, phone, marks_obtained in db.session.query(
+            Student.name, Student.admission_number, Student.phone, TestResult.marks_obtained
+        ).join(Student, Student.id == TestResult.student_id).filter(
+            TestResult.test_id == test_id
+        ).order_by(TestResult.id)
+    ]
+    if not rows:
+        raise ValueError(f'No results found for test {test_id}')
+    
+    test_fields = test_pdf_fields(test)
+    whatsapp_link = app.config['WHATSAPP_GROUP_LINK']
+    file_path = pdf_cache_path('class_results', {
+        'test': test_fields,
+        'rows': rows,
+        'whatsapp_link': whatsapp_link
+    })
     
-    for test in tests:
-        result.append({
-            'id': test.id,
-            'name': test.name,
-            'subject': test.subject,
-            'class_level': test.class_level,
-            'date': test.date.strftime('%Y-%m-%d'),
-            'max_marks': test.max_marks
-        })
+    # Don't hold a read snapshot open through the render; under WAL the update
+    # below could not be made from it once another writer has committed
+    db.session.commit()
     
-    return jsonify(result)
+    # Build PDF unless an identical one is already cached
+    if not render_cached_pdf(file_path, lambda: reports.render_test_report(test_fields, rows, whatsapp_link)):
+        logger.info("Class results PDF generated at %s", file_path)
+    
+    # Only record the path if the results are still the ones rendered
+    recorded = Test.query.filter_by(id=test_id, results_version=seen_version).update(
+        {'results_pdf_path': file_path}, synchronize_session=False
+    )
+    db.session.commit()
+    if not recorded:
+        raise ResultsChanged(f'Results for test {test_id} changed while its PDF was rendering')
+    
+    return file_path
+
+def render_student_result_file(item):
+    """Render one cached student result PDF; runs in a report card pool process"""
+    file_path, pdf_input = item
+    render_cached_pdf(file_path, lambda: reports.render_student_result(pdf_input))
+    return file_path
+
+def build_report_cards(test_id, on_progress=None):
+    """Render every student's result PDF for a test and bundle them into one ZIP.
+
+    Renders are spread over a process pool (REPORT_CARD_PROCESSES, default one
+    per CPU) and reuse the PDF cache, so unchanged report cards are not redrawn.
+    on_progress(done, total) is called as PDFs complete. Returns the ZIP path.
+    """
+    test = db.session.get(Test, test_id)
+    if not test:
+        raise ValueError(f'Test {test_id} not found')
+    
+    rows = db.session.query(
+        TestResult.id, TestResult.marks_obtained, Student.name, Student.admission_number
+    ).join(Student, Student.id == TestResult.student_id).filter(
+        TestResult.test_id == test_id
+    ).order_by(Student.admission_number).all()
+    if not rows:
+        raise ValueError(f'No results found for test {test_id}')
+    
+    test_fields = test_pdf_fields(test)
+    items = []
+    for row in rows:
+        pdf_input = {'test': test_fields, 'student_name': row.name, 'marks_obtained': row.marks_obtained}
+        items.append((pdf_cache_path('student_result', pdf_input), pdf_input))
+    
+    total = len(items)
+    pending = [item for item in items if not touch_cached_pdf(item[0])]
+    done = total - len(pending)
+    if on_progress:
+        on_progress(done, total)
+    
+    if pending:
+        processes = int(os.getenv('REPORT_CARD_PROCESSES', '0')) or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(processes, len(pending))) as pool:
+            futures = [pool.submit(render_student_result_file, item) for item in pending]
+            last_report = time.monotonic()
+            for future in as_completed(futures):
+                future.result()
+                done += 1
+                # Throttle progress writes to about one per second
+                if on_progress and (time.monotonic() - last_report >= 1 or done == total):
+                    on_progress(done, total)
+                    last_report = time.monotonic()
+    
+    # Point each result at its current PDF in one executemany
+    db.session.execute(
+        update(TestResult.__table__).where(TestResult.__table__.c.id == bindparam('result_id')).values(
+            pdf_path=bindparam('path')
+        ),
+        [{'result_id': row.id, 'path': item[0]} for row, item in zip(rows, items)]
+    )
+    db.session.commit()
+    
+    # The ZIP is named after its contents, so an unchanged set of report cards is reused
+    zip_key = hashlib.sha256('|'.join(item[0] for item in items).encode('utf-8')).hexdigest()[:16]
+    zip_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'test_results', 'report_cards')
+    zip_path = os.path.abspath(os.path.join(zip_dir, f"{test_id}_{zip_key}.zip"))
+    if not os.path.exists(zip_path):
+        os.makedirs(zip_dir, exist_ok=True)
+        temp_path = f"{zip_path}.{os.getpid()}.tmp"
+        try:
+            # PDFs are already compressed, so store them as-is
+            with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+                for row, (file_path, _) in zip(rows, items):
+                    archive.write(file_path, secure_filename(f"{row.admission_number}_{row.name}.pdf"))
+            os.replace(temp_path, zip_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        # Drop older bundles for this test
+        for name in os.listdir(zip_dir):
+            if name.startswith(f"{test_id}_") and name.endswith('.zip') and name != os.path.basename(zip_path):
+                os.remove(os.path.join(zip_dir, name))
+    
+    logger.info("Report cards for test %s bundled at %s", test_id, zip_path)
+    return zip_path
 
 @app.route('/api/admin/generate-test-results-pdf/<int:test_id>', methods=['POST'])
 @token_required
@@ -758,125 +2215,75 @@ def generate_test_results_pdf(current_user, is_admin, test_id):
     if not is_admin:
         return jsonify({'message': 'Not authorized!'}), 403
     
-    try:
-        test = Test.query.get(test_id)
-        if not test:
-            return jsonify({'message': 'Test not found!'}), 404
-        
-        # Get all results for this test
-        results = TestResult.query.filter_by(test_id=test_id).all()
-        if not results:
-            return jsonify({'message': 'No results found for this test!'}), 404
-        
-        # Ensure the directory exists
-        test_results_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'test_results')
-        os.makedirs(test_results_dir, exist_ok=True)
-        
-        # Create a unique filename
-        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-        filename = f"{test.class_level}_{test.subject}_{test.name}_{timestamp}_results.pdf"
-        file_path = os.path.join(test_results_dir, filename)
-        
-        # Create PDF directly to file instead of using memory buffer
-        doc = SimpleDocTemplate(file_path, pagesize=letter)
-        styles = getSampleStyleSheet()
-        
-        # Check if Title style already exists before adding
-        title_style = None
-        for style_name in styles.byName:
-            if style_name == 'Title':
-                title_style = styles['Title']
-                break
-                
-        if not title_style:
-            # Only add if not already defined
-            styles.add(ParagraphStyle(name='Title', 
-                                    fontName='Helvetica-Bold',
-                                    fontSize=16, 
-                                    alignment=1,
-                                    spaceAfter=20))
-        
-        # Create content
-        content = []
-        
-        # Add title
-        title = Paragraph(f"Padashetty Coaching Class - {test.name} Results", styles['Title'])
-        content.append(title)
-        
-        # Add test details
-        content.append(Paragraph(f"<b>Subject:</b> {test.subject}", styles['Normal']))
-        content.append(Paragraph(f"<b>Class:</b> {test.class_level}", styles['Normal']))
-        content.append(Paragraph(f"<b>Date:</b> {test.date.strftime('%Y-%m-%d')}", styles['Normal']))
-        content.append(Paragraph(f"<b>Maximum Marks:</b> {test.max_marks}", styles['Normal']))
-        content.append(Spacer(1, 0.25*inch))
-        
-        # Create table data
-        data = [['Student Name', 'Admission Number', 'Phone', 'Marks Obtained', 'Percentage']]
-        
-        for result in results:
-            student = Student.query.get(result.student_id)
-            if student:
-                percentage = (result.marks_obtained / test.max_marks) * 100
-                data.append([
-                    student.name,
-                    student.admission_number,
-                    student.phone or 'N/A',
-                    str(result.marks_obtained),
-                    f"{percentage:.2f}%"
-                ])
-        
-        # Create table
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        content.append(table)
-        
-        # Add WhatsApp sharing info
-        content.append(Spacer(1, 0.5*inch))
-        content.append(Paragraph("<b>Join our WhatsApp group for more updates:</b>", styles['Normal']))
-        content.append(Paragraph(app.config['WHATSAPP_GROUP_LINK'], styles['Normal']))
-        
-        # Build PDF directly to file
-        try:
-            doc.build(content)
-            print(f"PDF generated successfully at: {file_path}")
-        except Exception as e:
-            print(f"Error building PDF: {str(e)}")
-            return jsonify({'message': f'Error building PDF: {str(e)}'}), 500
-        
-        # Make path absolute if it's not already
-        if not os.path.isabs(file_path):
-            file_path = os.path.abspath(file_path)
-        
-        # Verify the file exists
-        if not os.path.exists(file_path):
-            return jsonify({'message': 'Failed to create PDF file'}), 500
-            
-        # Update all test results with the PDF path
-        for result in results:
-            result.pdf_path = file_path
-        
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Test results PDF generated successfully!',
-            'pdf_url': f'/api/admin/test-results-pdf/{test_id}'
-        })
+    test = db.session.get(Test, test_id)
+    if not test:
+        return jsonify({'message': 'Test not found!'}), 404
     
-    except Exception as e:
-        # Log the error
-        print(f"PDF Generation Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'message': f'Error generating PDF: {str(e)}'}), 500
+    if not db.session.query(TestResult.id).filter_by(test_id=test_id).first():
+        return jsonify({'message': 'No results found for this test!'}), 404
+    
+    # Rendering happens in the job worker; repeated clicks collapse into one job
+    job = enqueue_job('test_results_pdf', test_id)
+    
+    return jsonify({
+        'message': 'Test results PDF generation queued',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/admin/jobs/{job.id}',
+        'pdf_url': f'/api/admin/test-results-pdf/{test_id}'
+    }), 202
+
+@app.route('/api/admin/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_job_status(current_user, is_admin, job_id):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({'message': 'Job not found!'}), 404
+    
+    return jsonify(job_to_dict(job))
+
+@app.route('/api/admin/tests/<int:test_id>/report-cards', methods=['POST'])
+@token_required
+def generate_report_cards(current_user, is_admin, test_id):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    test = db.session.get(Test, test_id)
+    if not test:
+        return jsonify({'message': 'Test not found!'}), 404
+    
+    if not db.session.query(TestResult.id).filter_by(test_id=test_id).first():
+        return jsonify({'message': 'No results found for this test!'}), 404
+    
+    job = enqueue_job('report_cards', test_id)
+    
+    return jsonify({
+        'message': 'Report card generation queued',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/admin/jobs/{job.id}'
+    }), 202
+
+@app.route('/api/admin/jobs/<int:job_id>/download', methods=['GET'])
+@token_required
+def download_job_result(current_user, is_admin, job_id):
+    if not is_admin:
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({'message': 'Job not found!'}), 404
+    
+    if job.status != 'done' or not job.result_path:
+        return jsonify({'message': 'Job has no file to download yet!'}), 409
+    
+    if not os.path.exists(job.result_path):
+        return jsonify({'message': 'File not found on server'}), 404
+    
+    return serve_file(job.result_path, f"report_cards_test_{job.target_id}.zip", mimetype='application/zip')
 
 @app.route('/api/admin/test-results-pdf/<int:test_id>', methods=['GET'])
 def download_test_results_pdf(test_id):
@@ -885,36 +2292,26 @@ def download_test_results_pdf(test_id):
         if not test:
             return jsonify({'message': 'Test not found!'}), 404
         
-        # Get first result to get the PDF path
-        result = TestResult.query.filter_by(test_id=test_id).first()
-        if not result or not result.pdf_path:
+        # The path is cleared whenever the results change, so it is never stale
+        if not test.results_pdf_path:
             return jsonify({'message': 'PDF not found!'}), 404
         
         # Check if file exists
-        if not os.path.exists(result.pdf_path):
+        if not os.path.exists(test.results_pdf_path):
             return jsonify({'message': 'PDF file not found on server!'}), 404
         
         # Get the filename for download
-        filename = os.path.basename(result.pdf_path)
+        filename = secure_filename(f"{test.class_level}_{test.subject}_{test.name}_results.pdf")
         
         # Use a direct file path
         try:
-            print(f"Sending file: {result.pdf_path}")
-            response = send_file(
-                path_or_file=result.pdf_path,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=filename
-            )
-            return response
+            logger.debug("Sending file: %s", test.results_pdf_path)
+            return serve_file(test.results_pdf_path, filename, mimetype='application/pdf')
         except Exception as e:
-            print(f"Error sending file: {str(e)}")
+            logger.exception("Error sending file %s", test.results_pdf_path)
             return jsonify({'message': f'Error sending PDF: {str(e)}'}), 500
     except Exception as e:
-        # Log the error
-        print(f"PDF Download Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("PDF download error")
         return jsonify({'message': f'Error downloading PDF: {str(e)}'}), 500
 
 @app.route('/api/admin/share-results-whatsapp/<int:test_id>', methods=['GET'])
@@ -928,16 +2325,11 @@ def share_results_whatsapp(current_user, is_admin, test_id):
         if not test:
             return jsonify({'message': 'Test not found!'}), 404
         
-        # Get first result to get the PDF path
-        result = TestResult.query.filter_by(test_id=test_id).first()
-        if not result or not result.pdf_path or not os.path.exists(result.pdf_path):
+        if not test.results_pdf_path or not os.path.exists(test.results_pdf_path):
             return jsonify({'message': 'Generate PDF first!'}), 400
         
         # Mark as shared to WhatsApp
-        results = TestResult.query.filter_by(test_id=test_id).all()
-        for result in results:
-            result.shared_to_whatsapp = True
-        
+        TestResult.query.filter_by(test_id=test_id).update({'shared_to_whatsapp': True}, synchronize_session=False)
         db.session.commit()
         
         # Prepare a direct WhatsApp sharing link with URL encoding
@@ -946,17 +2338,14 @@ def share_results_whatsapp(current_user, is_admin, test_id):
         whatsapp_share_link = f"https://wa.me/?text={encoded_text}"
         
         # Return WhatsApp group link and share link
-        print(f"WhatsApp share link: {whatsapp_share_link}")
+        logger.debug("WhatsApp share link: %s", whatsapp_share_link)
         return jsonify({
             'whatsapp_link': app.config['WHATSAPP_GROUP_LINK'],
             'whatsapp_share_link': whatsapp_share_link,
             'message': f'Test results for {test.name} are ready to share!'
         })
     except Exception as e:
-        # Log the error
-        print(f"WhatsApp Sharing Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("WhatsApp sharing error")
         return jsonify({'message': f'Error preparing WhatsApp sharing: {str(e)}'}), 500
 
 @app.route('/api/admin/students/<int:student_id>', methods=['DELETE'])
@@ -969,20 +2358,24 @@ def delete_student(current_user, is_admin, student_id):
     if not student:
         return jsonify({'message': 'Student not found!'}), 404
     
+    # Class results PDFs and statistics that include this student are now out of date
+    Test.query.filter(
+        Test.id.in_(db.session.query(TestResult.test_id).filter_by(student_id=student_id))
+    ).update({'results_pdf_path': None, 'results_version': Test.results_version + 1}, synchronize_session=False)
+    
     # Delete associated records
     TestResult.query.filter_by(student_id=student_id).delete()
     Attendance.query.filter_by(student_id=student_id).delete()
+    remove_student_attendance_summary(student_id)
+    # Unfinished admission form uploads; the reaper removes their partial files
+    UploadSession.query.filter_by(student_id=student_id).delete()
     
-    # Delete admission form file if it exists
-    if student.admission_form_path and os.path.exists(student.admission_form_path):
-        try:
-            os.remove(student.admission_form_path)
-        except Exception as e:
-            print(f"Error deleting file {student.admission_form_path}: {str(e)}")
-    
-    # Delete the student record
+    # Delete the student record, then the admission form if no one else shares it
+    admission_form_path = student.admission_form_path
     db.session.delete(student)
+    bump_table_versions('student', 'attendance', 'test_result', PRINCIPAL_VERSION)
     db.session.commit()
+    release_upload(admission_form_path)
     
     return jsonify({'message': 'Student deleted successfully!'}), 200
 
@@ -996,38 +2389,46 @@ def delete_note(current_user, is_admin, note_id):
     if not note:
         return jsonify({'message': 'Note not found!'}), 404
     
-    # Delete the note file from the server
-    if note.file_path and os.path.exists(note.file_path):
-        try:
-            os.remove(note.file_path)
-        except Exception as e:
-            print(f"Error deleting file {note.file_path}: {str(e)}")
-    
-    # Delete the note record
+    # Delete the note record, then its file if no other note or student shares it
+    file_path = note.file_path
     db.session.delete(note)
+    bump_table_versions('note')
     db.session.commit()
+    release_upload(file_path)
     
     return jsonify({'message': 'Note deleted successfully!'}), 200
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'message': 'Not authorized!'}), 403
+    
+    body, content_type = metrics.generate()
+    return app.response_class(body, mimetype=content_type)
+
 # Initialize database with admin user
 def create_tables_and_admin():
     with app.app_context():
         # Create tables if they don't exist
         db.create_all()
         
+        # Bring existing databases up to the current schema version
+        migrations.upgrade(db.engine)
+        
         # Check if admin exists
         admin = Admin.query.filter_by(username='pcc').first()
         if not admin:
             admin = Admin(username='pcc', password='pcc@8618', selected_class='')
             db.session.add(admin)
             db.session.commit()
-            print("Admin user created successfully!")
+            logger.info("Admin user created successfully!")
         else:
             # Update admin if it exists but doesn't have selected_class
             if not hasattr(admin, 'selected_class') or admin.selected_class is None:
                 admin.selected_class = ''
                 db.session.commit()
-                print("Updated admin user with selected_class field")
+                logger.info("Updated admin user with selected_class field")
 
 if __name__ == '__main__':
     create_tables_and_admin()
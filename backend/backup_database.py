@@ -1,59 +1,395 @@
 """
 Database Backup Script
 
-This script creates a backup of the SQLite database and uploaded files.
-Run it periodically to ensure your data is safely backed up.
+Takes an online backup of the SQLite database and an incremental snapshot
+of the uploaded files into backups/backup_<timestamp>/, and restores from one.
+
+The database is copied with SQLite's backup API while web workers keep
+reading and writing. In WAL mode (the tuned DB_PROFILE) the copy is one step
+from a read snapshot, which never blocks writers. With a rollback journal it
+goes a few hundred pages at a time, pausing so writers can take the lock in
+between; every commit from another connection restarts a stepped copy, so
+after a few restarts it is redone in one step, holding writers off (up
+to their busy timeout) until it finishes. The copy is checked with
+PRAGMA quick_check before it is compressed with zstd, when the zstandard
+package is installed, or gzip.
+
+Uploads are snapshotted by upload_snapshots: files unchanged since the
+previous backup are hard-linked to its copy and only new or changed files are
+copied, so a backup of an unchanged uploads folder takes next to no disk.
+Each snapshot's manifest.json lists every file's size, mtime and SHA-256;
+the diff command compares two of them.
+
+Snapshots older than the newest one of each of the last --keep-daily days
+and --keep-weekly ISO weeks are deleted after every backup.
+
+The database file is the one the app's engine uses (with Flask-SQLAlchemy,
+a relative sqlite:/// path lives in the instance folder).
+
+Usage:
+    python backup_database.py [backup] [--keep-daily N] [--keep-weekly N]
+    python backup_database.py restore backups/backup_20250330_120000 [--force]
+    python backup_database.py diff backups/backup_20250329_120000 backups/backup_20250330_120000
 """
 
 import os
+import sys
+import gzip
+import time
 import shutil
-import datetime
 import sqlite3
-from app import app
-
-def backup_database():
-    # Create backups directory if it doesn't exist
-    backups_dir = 'backups'
-    if not os.path.exists(backups_dir):
-        os.makedirs(backups_dir)
-    
-    # Create a timestamped backup folder
-    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_folder = os.path.join(backups_dir, f"backup_{timestamp}")
-    os.makedirs(backup_folder)
-    
-    # Get database path
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'padashetty.db')
-    
+import logging
+import argparse
+import datetime
+from app import app, db
+import logging_setup
+import upload_snapshots
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger('backup_database')
+
+BACKUPS_DIR = os.getenv('BACKUP_DIR', 'backups')
+SNAPSHOT_PREFIX = 'backup_'
+TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+KEEP_DAILY = int(os.getenv('BACKUP_KEEP_DAILY', '7'))
+KEEP_WEEKLY = int(os.getenv('BACKUP_KEEP_WEEKLY', '4'))
+# Pages copied per backup step (4 KB each by default), and the pause between steps
+STEP_PAGES = int(os.getenv('BACKUP_STEP_PAGES', '256'))
+STEP_SLEEP = float(os.getenv('BACKUP_STEP_SLEEP', '0.01'))
+# Restarts caused by concurrent writes before a stepped copy is finished in one step
+MAX_RESTARTS = int(os.getenv('BACKUP_MAX_RESTARTS', '3'))
+
+COMPRESSED_SUFFIXES = ('.zst', '.gz')
+
+# How far restored change counters are moved past the live ones. Writes that land
+# between reading the live counters and the restore bump them further meanwhile
+RESTORE_VERSION_GAP = 1000
+
+def database_path():
+    """Path of the SQLite file behind the app's engine, or None for other databases"""
+    with app.app_context():
+        url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return os.path.abspath(url.database)
+
+class CopyRestarted(Exception):
+    """A stepped copy was restarted by concurrent writes MAX_RESTARTS times"""
+
+def copy_database(source_path, destination_path):
+    """Online copy of source_path using the backup API"""
+    source = sqlite3.connect(source_path, timeout=30)
+    destination = sqlite3.connect(destination_path)
+    try:
+        if source.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'wal':
+            # Reads from a snapshot while writers carry on appending to the WAL
+            source.backup(destination)
+            return
+
+        last_remaining = None
+        restarts = 0
+
+        def pause(status, remaining, total):
+            nonlocal last_remaining, restarts
+            # A step that succeeded without reducing remaining was a restart caused by
+            # a write from another connection: the copy began again from the first page
+            if status == sqlite3.SQLITE_OK and last_remaining is not None and remaining >= last_remaining:
+                restarts += 1
+                if restarts >= MAX_RESTARTS:
+                    raise CopyRestarted()
+            last_remaining = remaining
+            # Let other connections in between steps
+            time.sleep(STEP_SLEEP)
+
+        try:
+            source.backup(destination, pages=STEP_PAGES, progress=pause)
+        except CopyRestarted:
+            logger.info("Backup restarted %s times by concurrent writes; copying in one step", restarts)
+            source.backup(destination)
+    finally:
+        destination.close()
+        source.close()
+
+def quick_check(path):
+    """Return True when PRAGMA quick_check finds no problems in the file"""
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("PRAGMA quick_check").fetchall()
+    finally:
+        conn.close()
+    if rows == [('ok',)]:
+        return True
+    for (problem,) in rows[:10]:
+        logger.error("quick_check: %s", problem)
+    return False
+
+def open_compressed(path, mode, suffix=None):
+    """Open a .zst or .gz file for streaming; suffix overrides the one in path (for temp files)"""
+    suffix = suffix or os.path.splitext(path)[1]
+    if suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError("The zstandard package is needed to read .zst snapshots")
+        if mode == 'rb':
+            return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return zstandard.ZstdCompressor(level=10).stream_writer(open(path, 'wb'), closefd=True)
+    return gzip.open(path, mode, compresslevel=6)
+
+def compress(path, destination_path):
+    """Compress path into destination_path, whose suffix picks the format, via a temp file"""
+    temp_path = f"{destination_path}.tmp"
+    suffix = os.path.splitext(destination_path)[1]
+    with open(path, 'rb') as source, open_compressed(temp_path, 'wb', suffix) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    os.replace(temp_path, destination_path)
+
+def snapshot_timestamp(name):
+    if not name.startswith(SNAPSHOT_PREFIX):
+        return None
+    try:
+        return datetime.datetime.strptime(name[len(SNAPSHOT_PREFIX):], TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+def list_snapshots(backups_dir):
+    """[(timestamp, path)] for every snapshot folder, newest first"""
+    if not os.path.isdir(backups_dir):
+        return []
+    snapshots = []
+    for name in os.listdir(backups_dir):
+        taken = snapshot_timestamp(name)
+        if taken is not None and os.path.isdir(os.path.join(backups_dir, name)):
+            snapshots.append((taken, os.path.join(backups_dir, name)))
+    return sorted(snapshots, reverse=True)
+
+def snapshots_to_keep(snapshots, keep_daily, keep_weekly):
+    """The newest snapshot of each of the last keep_daily days and keep_weekly ISO weeks"""
+    keep = set()
+    days = set()
+    weeks = set()
+    for taken, path in snapshots:
+        day = taken.date()
+        if day not in days and len(days) < keep_daily:
+            days.add(day)
+            keep.add(path)
+        week = taken.isocalendar()[:2]
+        if week not in weeks and len(weeks) < keep_weekly:
+            weeks.add(week)
+            keep.add(path)
+    return keep
+
+def prune_snapshots(backups_dir, keep_daily, keep_weekly):
+    snapshots = list_snapshots(backups_dir)
+    keep = snapshots_to_keep(snapshots, keep_daily, keep_weekly)
+    removed = 0
+    for _, path in snapshots:
+        if path not in keep:
+            shutil.rmtree(path)
+            logger.info("Removed old backup %s", path)
+            removed += 1
+    return removed
+
+def backup_database(backups_dir=BACKUPS_DIR, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+    db_path = database_path()
+    if db_path is None:
+        logger.error("Only SQLite databases can be backed up by this script; use the database's own tools")
+        return False
+
     # Check if database exists
     if not os.path.exists(db_path):
-        print(f"Database file not found at {db_path}")
+        logger.error("Database file not found at %s", db_path)
         return False
-    
+
+    # Unchanged uploads are linked to the newest snapshot that has a manifest
+    previous_folder = next((path for _, path in list_snapshots(backups_dir)
+                            if upload_snapshots.load_manifest(path) is not None), None)
+
+    # Create a timestamped backup folder
+    timestamp = datetime.datetime.now().strftime(TIMESTAMP_FORMAT)
+    backup_folder = os.path.join(backups_dir, f"{SNAPSHOT_PREFIX}{timestamp}")
+    os.makedirs(backup_folder)
+
+    db_name = os.path.basename(db_path)
+    copy_path = os.path.join(backup_folder, f"{db_name}.tmp")
     try:
-        # Verify database integrity
-        conn = sqlite3.connect(db_path)
-        conn.execute("PRAGMA integrity_check")
-        conn.close()
-        
-        # Copy database file
-        db_backup_path = os.path.join(backup_folder, 'padashetty.db')
-        shutil.copy2(db_path, db_backup_path)
-        print(f"Database backed up to {db_backup_path}")
-        
+        started = time.perf_counter()
+        copy_database(db_path, copy_path)
+        if not quick_check(copy_path):
+            logger.error("Backup copy of %s failed quick_check; nothing was kept", db_path)
+            shutil.rmtree(backup_folder)
+            return False
+
+        suffix = '.zst' if zstandard is not None else '.gz'
+        db_backup_path = os.path.join(backup_folder, db_name + suffix)
+        compress(copy_path, db_backup_path)
+        os.remove(copy_path)
+        logger.info("Database backed up to %s (%s bytes) in %.1fs",
+                    db_backup_path, os.path.getsize(db_backup_path), time.perf_counter() - started)
+
         # Backup uploaded files
         uploads_dir = app.config['UPLOAD_FOLDER']
         if os.path.exists(uploads_dir):
-            uploads_backup_dir = os.path.join(backup_folder, 'uploads')
-            shutil.copytree(uploads_dir, uploads_backup_dir)
-            print(f"Uploads backed up to {uploads_backup_dir}")
-        
-        print(f"Backup completed successfully at {backup_folder}")
+            started = time.perf_counter()
+            stats = upload_snapshots.create_snapshot(uploads_dir, backup_folder, previous_folder)
+            logger.info("Uploads backed up to %s: %s files, %s linked, %s copied (%s bytes) in %.1fs",
+                        os.path.join(backup_folder, upload_snapshots.FILES_DIR), stats['files'],
+                        stats['linked'], stats['copied'], stats['bytes_copied'], time.perf_counter() - started)
+
+        logger.info("Backup completed successfully at %s", backup_folder)
+    except Exception as e:
+        logger.exception("Error during backup: %s", e)
+        shutil.rmtree(backup_folder, ignore_errors=True)
+        return False
+
+    prune_snapshots(backups_dir, keep_daily, keep_weekly)
+    return True
+
+def snapshot_folder(path):
+    return path if os.path.isdir(path) else os.path.dirname(path)
+
+def find_database_snapshot(path):
+    """Accept a snapshot folder or a compressed database file inside one"""
+    if os.path.isfile(path):
+        return path
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(COMPRESSED_SUFFIXES):
+                return os.path.join(path, name)
+    return None
+
+def table_names(conn):
+    return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def advance_versions(live_path, restore_path):
+    """Move the change counters in restore_path past the live database's.
+
+    ETags and test_stats_cache are keyed by table_version and
+    test.results_version. Restoring them as they were would let later writes
+    reuse numbers that clients and caches already hold for different data.
+    """
+    live = sqlite3.connect(live_path, timeout=30)
+    try:
+        live_tables = table_names(live)
+        live_versions = {}
+        if 'table_version' in live_tables:
+            live_versions = dict(live.execute("SELECT table_name, version FROM table_version"))
+        results_max = 0
+        if 'test' in live_tables:
+            results_max = live.execute("SELECT COALESCE(MAX(results_version), 0) FROM test").fetchone()[0]
+    finally:
+        live.close()
+
+    restored = sqlite3.connect(restore_path)
+    try:
+        restored_tables = table_names(restored)
+        if 'table_version' in restored_tables:
+            restored_versions = dict(restored.execute("SELECT table_name, version FROM table_version"))
+            for name in set(live_versions) | set(restored_versions):
+                version = max(live_versions.get(name, 0), restored_versions.get(name, 0)) + RESTORE_VERSION_GAP
+                restored.execute(
+                    "INSERT INTO table_version (table_name, version) VALUES (?, ?) "
+                    "ON CONFLICT (table_name) DO UPDATE SET version = excluded.version",
+                    (name, version)
+                )
+        if 'test' in restored_tables:
+            # Past every live value, not just the same test's, so no (id, version) pair repeats
+            restored.execute("UPDATE test SET results_version = results_version + ?",
+                             (results_max + RESTORE_VERSION_GAP,))
+        restored.commit()
+    finally:
+        restored.close()
+
+def restore_database(path, force=False):
+    db_path = database_path()
+    if db_path is None:
+        logger.error("Only SQLite databases can be restored by this script")
+        return False
+
+    snapshot = find_database_snapshot(path)
+    if snapshot is None:
+        logger.error("No database snapshot found at %s", path)
+        return False
+
+    if not force:
+        confirm = input(f"WARNING: This will replace {db_path} with {snapshot}! Continue? (y/n): ")
+        if confirm.lower() != 'y':
+            logger.info("Restore cancelled.")
+            return False
+
+    # Decompress next to the live database, check it, then copy it in through the
+    # backup API so connections already open see the restored data, not a swapped file
+    restore_path = f"{db_path}.restore"
+    try:
+        with open_compressed(snapshot, 'rb') as source, open(restore_path, 'wb') as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        if not quick_check(restore_path):
+            logger.error("Snapshot %s failed quick_check; the database was not changed", snapshot)
+            return False
+        # Done on the copy, so the restored data and its new versions appear together
+        advance_versions(db_path, restore_path)
+
+        source = sqlite3.connect(restore_path)
+        destination = sqlite3.connect(db_path, timeout=30)
+        try:
+            source.backup(destination)
+        finally:
+            destination.close()
+            source.close()
+        logger.info("Restored %s from %s", db_path, snapshot)
+    except Exception as e:
+        logger.exception("Error during restore: %s", e)
+        return False
+    finally:
+        if os.path.exists(restore_path):
+            os.remove(restore_path)
+
+    folder = snapshot_folder(path)
+    if upload_snapshots.load_manifest(folder) is None:
+        logger.warning("%s has no uploads manifest; uploads were not restored", folder)
         return True
-    
+    try:
+        stats = upload_snapshots.restore_snapshot(folder, app.config['UPLOAD_FOLDER'])
     except Exception as e:
-        print(f"Error during backup: {str(e)}")
+        logger.exception("Error restoring uploads: %s", e)
+        return False
+    logger.info("Restored uploads from %s: %s files, %s restored, %s already matched",
+                folder, stats['files'], stats['restored'], stats['unchanged'])
+    return True
+
+def diff_snapshots(old_path, new_path):
+    manifests = [upload_snapshots.load_manifest(snapshot_folder(path)) for path in (old_path, new_path)]
+    if None in manifests:
+        logger.error("Both snapshots need an uploads manifest to compare")
         return False
+    added, removed, changed = upload_snapshots.diff_manifests(*manifests)
+    for label, paths in (('+', added), ('-', removed), ('M', changed)):
+        for relative_path in paths:
+            print(f"{label} {relative_path}")
+    logger.info("%s added, %s removed, %s changed", len(added), len(removed), len(changed))
+    return True
 
 if __name__ == "__main__":
-    backup_database() 
\ No newline at end of file
+    logging_setup.configure('text')
+    parser = argparse.ArgumentParser(description='Back up, restore or compare backups of the database and uploads')
+    parser.add_argument('command', nargs='?', choices=['backup', 'restore', 'diff'], default='backup')
+    parser.add_argument('snapshots', nargs='*', help='Snapshot folder to restore, or the two to compare')
+    parser.add_argument('--dir', default=BACKUPS_DIR, help='Folder holding the snapshots')
+    parser.add_argument('--keep-daily', type=int, default=KEEP_DAILY)
+    parser.add_argument('--keep-weekly', type=int, default=KEEP_WEEKLY)
+    parser.add_argument('--force', action='store_true', help='Restore without asking for confirmation')
+    args = parser.parse_args()
+
+    if args.command == 'restore':
+        if len(args.snapshots) != 1:
+            parser.error('restore needs the snapshot to restore from')
+        ok = restore_database(args.snapshots[0], args.force)
+    elif args.command == 'diff':
+        if len(args.snapshots) != 2:
+            parser.error('diff needs the two snapshots to compare')
+        ok = diff_snapshots(*args.snapshots)
+    else:
+        ok = backup_database(args.dir, args.keep_daily, args.keep_weekly)
+    sys.exit(0 if ok else 1)
\ No newline at end of file
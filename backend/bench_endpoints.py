@@ -0,0 +1,453 @@
+"""
+Endpoint benchmark with regression thresholds.
+
+Seeds a throwaway SQLite database at each scale (students spread over
+7th-12th, with tests, results, attendance and notes), drives every route in
+app.py through the Flask test client, and records per endpoint:
+
+    ms        median wall time over --repeat requests (caches warm after the first)
+    best_ms   fastest of those requests
+    sql       SQL statements issued by the last request
+    peak_kb   tracemalloc peak for one extra request, measured separately so
+              tracing does not inflate the timings
+
+The first run (or --save) writes the results to the baseline file. Later runs
+compare against it and exit with status 1 when an endpoint issues more
+statements than the baseline, or is slower or uses more memory by more than
+--threshold times (ignoring differences under --min-ms / --min-kb, which are
+noise). The SQL count is exact, so it is checked strictly. Timing is compared
+on best_ms: the fastest request is the one least disturbed by the rest of the
+machine, whereas a single slow outlier among five repeats moves the median.
+A route missing from the suite also fails the run, so new routes get
+benchmarked.
+
+Job-backed routes use a small test with a handful of results, so report card
+and class PDF jobs run in seconds at every scale.
+
+Usage:
+    python bench_endpoints.py [--scales 100,10000,100000] [--repeat 5]
+                              [--baseline bench_baseline.json] [--save]
+                              [--threshold 1.5] [--output results.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import datetime
+import tempfile
+import tracemalloc
+from io import BytesIO
+
+# The database must be chosen before app is imported; keep the access log quiet
+BENCH_DIR = tempfile.mkdtemp(prefix='pcc_bench_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(BENCH_DIR, 'bench.db')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import app as backend
+from app import app, db
+import jobs
+import chunked_upload
+import migrations
+from query_counter import QueryCounter
+
+app.config['UPLOAD_FOLDER'] = os.path.join(BENCH_DIR, 'uploads')
+
+CLASSES = ['7th', '8th', '9th', '10th', '11th', '12th']
+SUBJECTS = ['Maths', 'Science', 'English', 'Social Studies']
+ATTENDANCE_START = datetime.date(2026, 1, 19)
+ATTENDANCE_DAYS = 10  # Weekdays, spanning a month boundary
+NOTES = 5
+INSERT_BATCH = 50000
+SMALL_TEST_STUDENTS = 5
+PDF_BYTES = b'%PDF-1.4\n' + b'0' * 4096 + b'\n%%EOF\n'
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+def insert_rows(table, rows):
+    """Insert dictionaries in executemany batches, bypassing the ORM"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == INSERT_BATCH:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+def school_days(start, count):
+    day = start
+    while count:
+        if day.weekday() < 5:
+            yield day
+            count -= 1
+        day += datetime.timedelta(days=1)
+
+def seed(students):
+    """Fill a fresh database with `students` students and their tests, results, attendance and notes"""
+    with app.app_context():
+        db.drop_all()
+    backend.principal_cache.clear()
+    backend.test_stats_cache.clear()
+    shutil.rmtree(app.config['UPLOAD_FOLDER'], ignore_errors=True)
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], chunked_upload.PARTIAL_DIR))
+    backend.create_tables_and_admin()
+
+    admission_date = ATTENDANCE_START - datetime.timedelta(days=30)
+    with app.app_context():
+        # Student n is in CLASSES[n % 6]; admission numbers count up within each class
+        insert_rows(backend.Student.__table__, (
+            {
+                'id': n,
+                'admission_number': f"PCC{CLASSES[n % len(CLASSES)]}{n // len(CLASSES) + 1:05d}",
+                'username': f"student_{n}",
+                'password': f"student_{n}123",
+                'name': f"Student {n}",
+                'phone': f"9{n:09d}",
+                'class_level': CLASSES[n % len(CLASSES)],
+                'admission_date': admission_date,
+            } for n in range(1, students + 1)
+        ))
+
+        tests = []
+        for class_level in CLASSES:
+            for subject in SUBJECTS:
+                tests.append({
+                    'id': len(tests) + 1, 'name': f"{subject} Unit Test", 'subject': subject,
+                    'class_level': class_level, 'date': ATTENDANCE_START, 'max_marks': 50
+                })
+        # A test with only a few results, for the job-backed routes
+        small_test_id = len(tests) + 1
+        tests.append({
+            'id': small_test_id, 'name': 'Bench Test', 'subject': 'Maths',
+            'class_level': '10th', 'date': ATTENDANCE_START, 'max_marks': 50
+        })
+        insert_rows(backend.Test.__table__, tests)
+
+        class_index = {class_level: index for index, class_level in enumerate(CLASSES)}
+        insert_rows(backend.TestResult.__table__, (
+            {'test_id': test['id'], 'student_id': n, 'marks_obtained': float((n * 7 + test['id'] * 13) % 51)}
+            for test in tests[:-1]
+            for n in range(class_index[test['class_level']] or len(CLASSES), students + 1, len(CLASSES))
+        ))
+        small_test_students = [n for n in range(class_index['10th'], students + 1, len(CLASSES))][:SMALL_TEST_STUDENTS]
+        insert_rows(backend.TestResult.__table__, (
+            {'test_id': small_test_id, 'student_id': n, 'marks_obtained': float(n % 51)}
+            for n in small_test_students
+        ))
+
+        insert_rows(backend.Attendance.__table__, (
+            {'student_id': n, 'date': day, 'present': (n + day.day) % 5 != 0}
+            for day in school_days(ATTENDANCE_START, ATTENDANCE_DAYS)
+            for n in range(1, students + 1)
+        ))
+        migrations.rebuild_attendance_summaries(db.session.connection())
+
+        notes_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'notes')
+        os.makedirs(notes_dir, exist_ok=True)
+        note_rows = []
+        for n in range(1, NOTES + 1):
+            path = os.path.join(notes_dir, f"note_{n}.pdf")
+            with open(path, 'wb') as f:
+                f.write(PDF_BYTES + str(n).encode())
+            note_rows.append({
+                'id': n, 'title': f"Note {n}", 'subject': SUBJECTS[n % len(SUBJECTS)],
+                'file_path': path, 'upload_date': ATTENDANCE_START
+            })
+        insert_rows(backend.Note.__table__, note_rows)
+        db.session.commit()
+
+    return {
+        'students': students,
+        'class_students': [n for n in range(class_index['10th'], students + 1, len(CLASSES))],
+        'class_test_id': next(test['id'] for test in tests if test['class_level'] == '10th'),
+        'small_test_id': small_test_id,
+        'small_test_students': small_test_students,
+    }
+
+def login(client, path, username, password):
+    token = client.post(path, json={'username': username, 'password': password}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+class Context:
+    """Seeded ids, tokens and helpers shared by the endpoint definitions"""
+
+    def __init__(self, client, data):
+        self.client = client
+        self.data = data
+        self.admin = login(client, '/api/admin/login', 'pcc', 'pcc@8618')
+        first_student = data['small_test_students'][0]
+        self.student_id = first_student
+        self.student = login(client, '/api/student/login', f"student_{first_student}", f"student_{first_student}123")
+        self.student_token = self.student['Authorization'].split()[-1]
+        client.post('/api/admin/select-class', json={'class_level': '10th'}, headers=self.admin)
+
+        with app.app_context():
+            self.student_result_id = db.session.query(backend.TestResult.id).filter_by(
+                test_id=data['class_test_id'], student_id=first_student
+            ).scalar()
+
+        # Finished jobs for the download routes
+        client.post(f"/api/admin/tests/{data['small_test_id']}/report-cards", headers=self.admin)
+        client.post(f"/api/admin/generate-test-results-pdf/{data['small_test_id']}", headers=self.admin)
+        with app.app_context():
+            jobs.drain_queue()
+            self.report_job_id = db.session.query(backend.Job.id).filter_by(kind='report_cards').scalar()
+
+        self.upload_id = self.start_upload()
+
+    def start_upload(self):
+        response = self.client.post('/api/admin/uploads', json={
+            'kind': 'note', 'filename': 'bench.pdf', 'size': len(PDF_BYTES), 'title': 'Bench', 'subject': 'Maths'
+        }, headers=self.admin)
+        return response.get_json()['upload_id']
+
+    def send_chunk(self, upload_id):
+        return self.client.put(f"/api/admin/uploads/{upload_id}?offset=0", data=PDF_BYTES, headers=self.admin)
+
+    def received_upload(self):
+        upload_id = self.start_upload()
+        self.send_chunk(upload_id)
+        return upload_id
+
+    def new_student(self):
+        with app.app_context():
+            student = backend.Student(
+                admission_number=f"PCCBench{time.perf_counter_ns()}", username=f"bench_{time.perf_counter_ns()}",
+                password='bench', name='Bench Student', class_level='10th', admission_date=ATTENDANCE_START
+            )
+            db.session.add(student)
+            db.session.commit()
+            return student.id
+
+    def new_note(self):
+        with app.app_context():
+            note = backend.Note(title='Bench', subject='Maths', file_path=db.session.get(backend.Note, 1).file_path,
+                                upload_date=ATTENDANCE_START)
+            db.session.add(note)
+            db.session.commit()
+            return note.id
+
+def endpoints(ctx):
+    """(name, prepare, send) per route. prepare(i) runs untimed; its result is passed to send"""
+    client, admin, student, data = ctx.client, ctx.admin, ctx.student, ctx.data
+    test_id, small_test_id = data['class_test_id'], data['small_test_id']
+    class_results = [{'student_id': n, 'marks_obtained': 30} for n in data['class_students']]
+    class_attendance = [{'student_id': n, 'present': True} for n in data['class_students']]
+    mark_day = datetime.date(2026, 3, 2)
+
+    def form_file(name):
+        return (BytesIO(PDF_BYTES), name)
+
+    return [
+        ('POST /api/admin/login', None,
+         lambda i: client.post('/api/admin/login', json={'username': 'pcc', 'password': 'pcc@8618'})),
+        ('POST /api/student/login', None,
+         lambda i: client.post('/api/student/login', json={
+             'username': f"student_{ctx.student_id}", 'password': f"student_{ctx.student_id}123"})),
+        ('GET /api/admin/students', None, lambda i: client.get('/api/admin/students', headers=admin)),
+        ('POST /api/admin/students', None,
+         lambda i: client.post('/api/admin/students', data={'name': f"Bench Student {time.perf_counter_ns()}",
+                                                            'class_level': '10th'}, headers=admin)),
+        ('POST /api/admin/students/<int:student_id>/admission-form', None,
+         lambda i: client.post(f"/api/admin/students/{ctx.student_id}/admission-form",
+                               data={'admission_form': form_file('form.pdf')}, headers=admin)),
+        ('GET /api/student/admission-form', None, lambda i: client.get('/api/student/admission-form', headers=student)),
+        ('POST /api/admin/attendance', None,
+         lambda i: client.post('/api/admin/attendance', json={
+             'date': (mark_day + datetime.timedelta(days=i)).isoformat(), 'attendance': class_attendance
+         }, headers=admin)),
+        ('GET /api/student/attendance', None, lambda i: client.get('/api/student/attendance', headers=student)),
+        ('GET /api/student/attendance/summary', None,
+         lambda i: client.get('/api/student/attendance/summary', headers=student)),
+        ('GET /api/admin/attendance/summary', None,
+         lambda i: client.get('/api/admin/attendance/summary', headers=admin)),
+        ('GET /api/admin/attendance/class-averages', None,
+         lambda i: client.get('/api/admin/attendance/class-averages', headers=admin)),
+        ('GET /api/admin/attendance/below-threshold', None,
+         lambda i: client.get('/api/admin/attendance/below-threshold?threshold=85', headers=admin)),
+        ('POST /api/admin/notes', None,
+         lambda i: client.post('/api/admin/notes', data={'title': 'Bench', 'subject': 'Maths',
+                                                         'note_file': form_file('note.pdf')}, headers=admin)),
+        ('POST /api/admin/uploads', None, lambda i: client.post('/api/admin/uploads', json={
+            'kind': 'note', 'filename': 'bench.pdf', 'size': len(PDF_BYTES), 'title': 'Bench', 'subject': 'Maths'
+        }, headers=admin)),
+        ('GET /api/admin/uploads/<upload_id>', None,
+         lambda i: client.get(f"/api/admin/uploads/{ctx.upload_id}", headers=admin)),
+        ('PUT /api/admin/uploads/<upload_id>', lambda i: ctx.start_upload(), ctx.send_chunk),
+        ('POST /api/admin/uploads/<upload_id>/complete', lambda i: ctx.received_upload(),
+         lambda upload_id: client.post(f"/api/admin/uploads/{upload_id}/complete",
+                                       json={'sha256': hashlib.sha256(PDF_BYTES).hexdigest()}, headers=admin)),
+        ('DELETE /api/admin/uploads/<upload_id>', lambda i: ctx.start_upload(),
+         lambda upload_id: client.delete(f"/api/admin/uploads/{upload_id}", headers=admin)),
+        ('GET /api/notes', None, lambda i: client.get('/api/notes', headers=student)),
+        ('GET /api/notes/archive', None, lambda i: client.get('/api/notes/archive', headers=student)),
+        # Download links carry the token in the query string
+        ('GET /api/notes/<int:note_id>/download', None,
+         lambda i: client.get(f"/api/notes/1/download?token={ctx.student_token}")),
+        ('POST /api/admin/tests', None, lambda i: client.post('/api/admin/tests', json={
+            'name': 'Bench Test', 'subject': 'Maths', 'class_level': '10th',
+            'date': ATTENDANCE_START.isoformat(), 'max_marks': 50
+        }, headers=admin)),
+        ('POST /api/admin/tests/<int:test_id>/results', None,
+         lambda i: client.post(f"/api/admin/tests/{test_id}/results", json={'results': class_results}, headers=admin)),
+        ('GET /api/student/tests', None, lambda i: client.get('/api/student/tests', headers=student)),
+        ('GET /api/admin/tests/<int:test_id>/stats', None,
+         lambda i: client.get(f"/api/admin/tests/{test_id}/stats", headers=admin)),
+        ('GET /api/student/dashboard', None, lambda i: client.get('/api/student/dashboard', headers=student)),
+        ('GET /api/admin/tests', None, lambda i: client.get('/api/admin/tests', headers=admin)),
+        ('GET /api/student/test-results/<int:test_result_id>/pdf', None,
+         lambda i: client.get(f"/api/student/test-results/{ctx.student_result_id}/pdf", headers=student)),
+        ('POST /api/admin/select-class', None,
+         lambda i: client.post('/api/admin/select-class', json={'class_level': '10th'}, headers=admin)),
+        ('GET /api/admin/current-class', None, lambda i: client.get('/api/admin/current-class', headers=admin)),
+        ('GET /api/admin/principal-cache', None, lambda i: client.get('/api/admin/principal-cache', headers=admin)),
+        ('GET /api/admin/class-students', None, lambda i: client.get('/api/admin/class-students', headers=admin)),
+        ('GET /api/admin/class-tests', None, lambda i: client.get('/api/admin/class-tests', headers=admin)),
+        ('POST /api/admin/generate-test-results-pdf/<int:test_id>', None,
+         lambda i: client.post(f"/api/admin/generate-test-results-pdf/{small_test_id}", headers=admin)),
+        ('GET /api/admin/jobs/<int:job_id>', None,
+         lambda i: client.get(f"/api/admin/jobs/{ctx.report_job_id}", headers=admin)),
+        ('POST /api/admin/tests/<int:test_id>/report-cards', None,
+         lambda i: client.post(f"/api/admin/tests/{small_test_id}/report-cards", headers=admin)),
+        ('GET /api/admin/jobs/<int:job_id>/download', None,
+         lambda i: client.get(f"/api/admin/jobs/{ctx.report_job_id}/download", headers=admin)),
+        ('GET /api/admin/test-results-pdf/<int:test_id>', None,
+         lambda i: client.get(f"/api/admin/test-results-pdf/{small_test_id}")),
+        ('GET /api/admin/share-results-whatsapp/<int:test_id>', None,
+         lambda i: client.get(f"/api/admin/share-results-whatsapp/{small_test_id}", headers=admin)),
+        ('DELETE /api/admin/students/<int:student_id>', lambda i: ctx.new_student(),
+         lambda student_id: client.delete(f"/api/admin/students/{student_id}", headers=admin)),
+        ('DELETE /api/admin/notes/<int:note_id>', lambda i: ctx.new_note(),
+         lambda note_id: client.delete(f"/api/admin/notes/{note_id}", headers=admin)),
+        ('GET /metrics', None, lambda i: client.get('/metrics')),
+    ]
+
+def app_routes():
+    """'METHOD /rule' for every route in app.py"""
+    routes = set()
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            routes.add(f"{method} {rule.rule}")
+    return routes
+
+def request_once(send, argument):
+    response = send(argument)
+    # Read the body inside the measurement so streamed responses are fully generated
+    response.get_data()
+    response.close()
+    return response
+
+def measure(name, prepare, send, repeat):
+    timings = []
+    for i in range(repeat + 1):
+        argument = prepare(i) if prepare else i
+        if i == repeat:
+            # One extra request under tracemalloc, kept out of the timings
+            tracemalloc.start()
+            response = request_once(send, argument)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            with QueryCounter() as counter:
+                start = time.perf_counter()
+                response = request_once(send, argument)
+                timings.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+    timings.sort()
+    return {
+        'ms': round(timings[len(timings) // 2] * 1000, 3),
+        'best_ms': round(timings[0] * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+        'sql': counter.count,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+def run_scale(students, repeat):
+    started = time.perf_counter()
+    data = seed(students)
+    print(f"Seeded {students} students in {time.perf_counter() - started:.1f}s")
+
+    ctx = Context(app.test_client(), data)
+    definitions = endpoints(ctx)
+    missing = app_routes() - {name for name, _, _ in definitions}
+    if missing:
+        raise RuntimeError(f"Routes without a benchmark: {', '.join(sorted(missing))}")
+
+    results = {}
+    for name, prepare, send in definitions:
+        results[name] = measure(name, prepare, send, repeat)
+        result = results[name]
+        print(f"  {name:62s} {result['ms']:9.2f} ms {result['sql']:4d} sql {result['peak_kb']:10.1f} KB")
+    return results
+
+def compare(baseline, current, threshold, min_ms, min_kb):
+    """Return a message for every endpoint that regressed against the baseline"""
+    regressions = []
+    for scale, endpoints_now in current.items():
+        for name, now in endpoints_now.items():
+            before = baseline.get(scale, {}).get(name)
+            if before is None:
+                continue
+            label = f"[{scale} students] {name}"
+            if now['sql'] > before['sql']:
+                regressions.append(f"{label}: {before['sql']} -> {now['sql']} SQL statements")
+            # Baselines saved before best_ms was recorded only have the median
+            before_ms = before.get('best_ms', before['ms'])
+            if now['best_ms'] > before_ms * threshold and now['best_ms'] - before_ms > min_ms:
+                regressions.append(f"{label}: {before_ms:.2f} -> {now['best_ms']:.2f} ms")
+            if now['peak_kb'] > before['peak_kb'] * threshold and now['peak_kb'] - before['peak_kb'] > min_kb:
+                regressions.append(f"{label}: {before['peak_kb']:.1f} -> {now['peak_kb']:.1f} KB peak memory")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every route against a seeded database')
+    parser.add_argument('--scales', default=os.getenv('BENCH_SCALES', '100,10000,100000'),
+                        help='Comma-separated student counts')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed requests per endpoint')
+    parser.add_argument('--baseline', default=os.getenv('BENCH_BASELINE', DEFAULT_BASELINE))
+    parser.add_argument('--save', action='store_true', help='Overwrite the baseline with this run')
+    parser.add_argument('--threshold', type=float, default=float(os.getenv('BENCH_THRESHOLD', '1.5')),
+                        help='Fail when time or memory exceeds the baseline by this factor')
+    parser.add_argument('--min-ms', type=float, default=float(os.getenv('BENCH_MIN_MS', '25')),
+                        help='Ignore slowdowns smaller than this')
+    parser.add_argument('--min-kb', type=float, default=256.0, help='Ignore memory growth smaller than this')
+    parser.add_argument('--output', help='Also write this run to the given JSON file')
+    args = parser.parse_args()
+
+    current = {}
+    try:
+        for scale in [int(value) for value in args.scales.split(',') if value.strip()]:
+            current[str(scale)] = run_scale(scale, args.repeat)
+    finally:
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if args.save or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, current, args.threshold, args.min_ms, args.min_kb)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        return 1
+    print(f"No regressions against {args.baseline} (threshold {args.threshold}x)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+PDF rendering micro-benchmark.
+
+Compares the per-render cost of the original route code (fresh stylesheet,
+Title style lookup and table style on every call, written to disk) with the
+reports module (styles built once, rendered into memory).
+
+Usage:
+    python bench_reports.py [renders] [class_size]
+"""
+
+import os
+import sys
+import time
+import tempfile
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+import reports
+
+TEST = {'name': 'Unit Test 1', 'subject': 'Mathematics', 'class_level': '10th', 'date': '2025-03-30', 'max_marks': 50}
+WHATSAPP_LINK = 'https://chat.whatsapp.com/example'
+
+def legacy_student_result(path, result):
+    """The per-request student PDF code as it was before the reports module"""
+    test = result['test']
+    doc = SimpleDocTemplate(path, pagesize=letter)
+    styles = getSampleStyleSheet()
+    content = [
+        Paragraph(f"Test Result: {test['name']}", styles['Title']),
+        Paragraph(f"<b>Student:</b> {result['student_name']}", styles['Normal']),
+        Paragraph(f"<b>Subject:</b> {test['subject']}", styles['Normal']),
+        Paragraph(f"<b>Class:</b> {test['class_level']}", styles['Normal']),
+        Paragraph(f"<b>Date:</b> {test['date']}", styles['Normal']),
+        Spacer(1, 0.25*inch),
+        Paragraph(f"<b>Maximum Marks:</b> {test['max_marks']}", styles['Normal']),
+        Paragraph(f"<b>Marks Obtained:</b> {result['marks_obtained']}", styles['Normal']),
+    ]
+    percentage = (result['marks_obtained'] / test['max_marks']) * 100
+    content.append(Paragraph(f"<b>Percentage:</b> {percentage:.2f}%", styles['Normal']))
+    doc.build(content)
+    with open(path, 'rb') as f:
+        return f.read()
+
+def legacy_test_report(path, test, rows):
+    """The per-request class results PDF code as it was before the reports module"""
+    doc = SimpleDocTemplate(path, pagesize=letter)
+    styles = getSampleStyleSheet()
+    title_style = None
+    for style_name in styles.byName:
+        if style_name == 'Title':
+            title_style = styles['Title']
+            break
+    if not title_style:
+        styles.add(ParagraphStyle(name='Title', fontName='Helvetica-Bold', fontSize=16, alignment=1, spaceAfter=20))
+
+    content = [
+        Paragraph(f"Padashetty Coaching Class - {test['name']} Results", styles['Title']),
+        Paragraph(f"<b>Subject:</b> {test['subject']}", styles['Normal']),
+        Paragraph(f"<b>Class:</b> {test['class_level']}", styles['Normal']),
+        Paragraph(f"<b>Date:</b> {test['date']}", styles['Normal']),
+        Paragraph(f"<b>Maximum Marks:</b> {test['max_marks']}", styles['Normal']),
+        Spacer(1, 0.25*inch)
+    ]
+    data = [['Student Name', 'Admission Number', 'Phone', 'Marks Obtained', 'Percentage']]
+    for name, admission_number, phone, marks_obtained in rows:
+        percentage = (marks_obtained / test['max_marks']) * 100
+        data.append([name, admission_number, phone, str(marks_obtained), f"{percentage:.2f}%"])
+    table = Table(data)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    content.append(table)
+    content.append(Spacer(1, 0.5*inch))
+    content.append(Paragraph("<b>Join our WhatsApp group for more updates:</b>", styles['Normal']))
+    content.append(Paragraph(WHATSAPP_LINK, styles['Normal']))
+    doc.build(content)
+    with open(path, 'rb') as f:
+        return f.read()
+
+def time_per_call(func, renders):
+    func()  # Warm up font and module caches
+    start = time.perf_counter()
+    for _ in range(renders):
+        func()
+    return (time.perf_counter() - start) / renders * 1000
+
+def main():
+    renders = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    class_size = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    result = {'test': TEST, 'student_name': 'Sample Student', 'marks_obtained': 42.0}
+    rows = [(f"Student {n}", f"PCC10th{n:05d}", '9999999999', float(n % 51)) for n in range(1, class_size + 1)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'bench.pdf')
+        cases = [
+            ('student result', lambda: legacy_student_result(path, result), lambda: reports.render_student_result(result)),
+            (f'class report ({class_size} rows)', lambda: legacy_test_report(path, TEST, rows),
+             lambda: reports.render_test_report(TEST, rows, WHATSAPP_LINK)),
+        ]
+
+        print(f"{'case':28s} {'before ms':>10s} {'after ms':>10s} {'speedup':>8s}")
+        for name, before, after in cases:
+            before_ms = time_per_call(before, renders)
+            after_ms = time_per_call(after, renders)
+            print(f"{name:28s} {before_ms:10.2f} {after_ms:10.2f} {before_ms / after_ms:7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Content-Addressed Blob Store
+
+Uploaded notes and admission forms are stored once per distinct content,
+under uploads/blobs/<first 2 hex>/<sha256><ext>. The SHA-256 is computed
+while the upload is copied to disk, so every file is read exactly once.
+
+The store itself keeps no counts: a blob's references are the Note.file_path
+and Student.admission_form_path values pointing at it (see app.release_upload
+and app.collect_unreferenced_blobs), and a blob is only deleted once none are
+left.
+"""
+
+import os
+import hashlib
+import tempfile
+
+BLOB_DIR = 'blobs'
+INCOMING_DIR = 'incoming'
+
+# Bytes copied per read while hashing
+STREAM_BUFFER_SIZE = 64 * 1024
+
+def blob_root(upload_folder):
+    return os.path.join(upload_folder, BLOB_DIR)
+
+def file_extension(filename):
+    """Lower-case extension of a client file name, kept on the blob so its type is still known"""
+    return os.path.splitext(filename or '')[1].lower()
+
+def blob_path(upload_folder, digest, extension=''):
+    return os.path.join(blob_root(upload_folder), digest[:2], f"{digest}{extension}")
+
+def is_blob(upload_folder, path):
+    root = os.path.abspath(blob_root(upload_folder))
+    return bool(path) and os.path.commonpath([root, os.path.abspath(path)]) == root
+
+def _place(temp_path, destination):
+    if os.path.exists(destination):
+        # Already stored: drop the copy and refresh the blob's mtime, which
+        # protects it from a concurrent collection while the new reference commits
+        os.remove(temp_path)
+        os.utime(destination)
+    else:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(temp_path, destination)
+    return destination
+
+def store_stream(upload_folder, stream, extension=''):
+    """Copy a readable stream into the store and return the blob path"""
+    incoming = os.path.join(blob_root(upload_folder), INCOMING_DIR)
+    os.makedirs(incoming, exist_ok=True)
+
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=incoming)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for block in iter(lambda: stream.read(STREAM_BUFFER_SIZE), b''):
+                digest.update(block)
+                f.write(block)
+        return _place(temp_path, blob_path(upload_folder, digest.hexdigest(), extension))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def store_file(upload_folder, path, digest, extension=''):
+    """Move a file whose SHA-256 is already known into the store and return the blob path.
+
+    path must be on the same filesystem as the upload folder.
+    """
+    return _place(path, blob_path(upload_folder, digest, extension))
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(STREAM_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def iter_blobs(upload_folder):
+    """Yield the path of every stored blob"""
+    root = blob_root(upload_folder)
+    if not os.path.isdir(root):
+        return
+    for shard in sorted(os.listdir(root)):
+        shard_dir = os.path.join(root, shard)
+        if shard == INCOMING_DIR or not os.path.isdir(shard_dir):
+            continue
+        for name in sorted(os.listdir(shard_dir)):
+            yield os.path.join(shard_dir, name)
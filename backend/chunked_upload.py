@@ -0,0 +1,78 @@
+"""
+Chunked Upload Storage
+
+File handling for resumable uploads. Each upload session owns one partial
+file under uploads/partial; chunks are streamed into it at their offset in
+fixed-size reads, so a worker never holds more than one buffer of the body in
+memory however large the file is. A finished upload is checksummed and moved
+into the blob store (blob_store.store_file) with os.replace, which is atomic
+on the same filesystem.
+
+The session rows themselves (UploadSession in app.py) record how many bytes
+have been received, so any worker can accept the next chunk.
+"""
+
+import os
+import time
+
+PARTIAL_DIR = 'partial'
+PARTIAL_SUFFIX = '.part'
+
+# Bytes read from the request per loop iteration
+STREAM_BUFFER_SIZE = 64 * 1024
+
+def partial_path(upload_folder, upload_id):
+    return os.path.join(upload_folder, PARTIAL_DIR, f"{upload_id}{PARTIAL_SUFFIX}")
+
+def create_partial(path):
+    """Create an empty partial file, failing if it already exists"""
+    with open(path, 'xb'):
+        pass
+
+def write_chunk(path, offset, stream, length):
+    """Copy length bytes from stream into path starting at offset.
+
+    Anything after the chunk is dropped, so a retried chunk replaces whatever
+    an interrupted attempt left behind. Returns the number of bytes written,
+    which is less than length if the client disconnected mid-chunk.
+    """
+    written = 0
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        while written < length:
+            data = stream.read(min(STREAM_BUFFER_SIZE, length - written))
+            if not data:
+                break
+            f.write(data)
+            written += len(data)
+        f.truncate()
+    return written
+
+def remove_partial(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def remove_orphaned_partials(upload_folder, live_ids, max_age):
+    """Delete partial files older than max_age seconds with no live session.
+
+    Returns the number of files removed.
+    """
+    directory = os.path.join(upload_folder, PARTIAL_DIR)
+    if not os.path.isdir(directory):
+        return 0
+
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(directory):
+        if not name.endswith(PARTIAL_SUFFIX) or name[:-len(PARTIAL_SUFFIX)] in live_ids:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
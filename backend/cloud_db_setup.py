@@ -6,15 +6,21 @@ and ensures that the necessary directories exist.
 """
 
 from app import app, db, Admin
+import migrations
 import os
+import logging
+import logging_setup
+
+logger = logging.getLogger('cloud_db_setup')
 
 def setup_cloud_database():
-    print("Setting up cloud database...")
+    logger.info("Setting up cloud database...")
     
     with app.app_context():
         # Create tables if they don't exist
         db.create_all()
-        print("Database tables created or verified.")
+        migrations.upgrade(db.engine)
+        logger.info("Database tables created or verified.")
         
         # Create admin user if it doesn't exist
         admin = Admin.query.filter_by(username='pcc').first()
@@ -22,9 +28,9 @@ def setup_cloud_database():
             admin = Admin(username='pcc', password='pcc@8618', selected_class='')
             db.session.add(admin)
             db.session.commit()
-            print("Admin user created successfully!")
+            logger.info("Admin user created successfully!")
         else:
-            print("Admin user already exists.")
+            logger.info("Admin user already exists.")
         
         # Ensure upload directories exist
         upload_dirs = [
@@ -36,9 +42,10 @@ def setup_cloud_database():
         
         for directory in upload_dirs:
             os.makedirs(directory, exist_ok=True)
-            print(f"Created directory: {directory}")
+            logger.info("Created directory: %s", directory)
         
-    print("Cloud database setup complete!")
+    logger.info("Cloud database setup complete!")
 
 if __name__ == "__main__":
+    logging_setup.configure('text')
     setup_cloud_database() 
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+File Serving
+
+Shared download path for stored files. Responses carry Last-Modified, an
+ETag and Cache-Control, and honour Range/If-Range, so interrupted downloads
+can resume and repeat downloads revalidate cheaply.
+
+With FILE_OFFLOAD set, the transfer is handed to the front proxy instead of
+streaming every byte through a gunicorn worker:
+
+    FILE_OFFLOAD=x-accel-redirect   nginx; files under UPLOAD_FOLDER are served
+                                    from the internal location FILE_OFFLOAD_PREFIX
+    FILE_OFFLOAD=x-sendfile         Apache mod_xsendfile / lighttpd
+"""
+
+import os
+import urllib.parse
+from flask import current_app, request
+from werkzeug.utils import send_file
+
+OFFLOAD_MODES = ('', 'x-accel-redirect', 'x-sendfile')
+
+def _cache_control(response, max_age):
+    # Files are only served to authenticated users, so shared caches must not keep them
+    if max_age:
+        response.headers['Cache-Control'] = f'private, max-age={max_age}'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers.pop('Expires', None)
+    return response
+
+def _accel_redirect(path, download_name, mimetype, max_age):
+    """Return an X-Accel-Redirect response for path, or None if nginx cannot reach it"""
+    upload_root = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    full_path = os.path.abspath(path)
+    if os.path.commonpath([upload_root, full_path]) != upload_root:
+        return None
+
+    relative = os.path.relpath(full_path, upload_root).replace(os.sep, '/')
+    prefix = current_app.config['FILE_OFFLOAD_PREFIX'].rstrip('/')
+
+    response = current_app.response_class(mimetype=mimetype or 'application/octet-stream')
+    response.headers['X-Accel-Redirect'] = f"{prefix}/{urllib.parse.quote(relative)}"
+    response.headers['Content-Disposition'] = (
+        f"attachment; filename*=UTF-8''{urllib.parse.quote(download_name)}"
+    )
+    return _cache_control(response, max_age)
+
+def serve_file(path, download_name, mimetype=None, max_age=None):
+    """Send a stored file as an attachment.
+
+    Raises FileNotFoundError if path does not exist, like flask.send_file.
+    max_age defaults to FILE_CACHE_MAX_AGE; 0 means clients must revalidate.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+
+    if max_age is None:
+        max_age = current_app.config['FILE_CACHE_MAX_AGE']
+
+    offload = current_app.config['FILE_OFFLOAD']
+    if offload not in OFFLOAD_MODES:
+        raise ValueError(f"Unknown FILE_OFFLOAD mode: {offload}")
+
+    if offload == 'x-accel-redirect':
+        response = _accel_redirect(path, download_name, mimetype, max_age)
+        if response is not None:
+            return response
+
+    # Werkzeug answers Range/If-Range and conditional requests from the file's
+    # size and mtime; with use_x_sendfile it sends headers only
+    response = send_file(
+        os.path.abspath(path),
+        request.environ,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True,
+        etag=True,
+        max_age=max_age,
+        use_x_sendfile=offload == 'x-sendfile',
+        response_class=current_app.response_class
+    )
+    # Werkzeug only advertises ranges on a range request; say so up front so clients know they can resume
+    response.headers.setdefault('Accept-Ranges', 'bytes')
+    return _cache_control(response, max_age)
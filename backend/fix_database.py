@@ -1,6 +1,11 @@
 from app import app, db, Admin, Student
+import migrations
 import os
 import shutil
+import logging
+import logging_setup
+
+logger = logging.getLogger('fix_database')
 
 def fix_database():
     with app.app_context():
@@ -8,24 +13,25 @@ def fix_database():
             # Check if database file exists and remove it
             db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'padashetty.db')
             if os.path.exists(db_path):
-                print(f"Removing existing database file: {db_path}")
+                logger.info("Removing existing database file: %s", db_path)
                 os.remove(db_path)
-                print("Database file removed.")
+                logger.info("Database file removed.")
             
             # Create all tables
-            print("Creating database tables...")
+            logger.info("Creating database tables...")
             db.create_all()
-            print("Tables created successfully.")
+            migrations.upgrade(db.engine)
+            logger.info("Tables created successfully.")
             
             # Check if admin already exists (shouldn't happen after db reset, but just in case)
             admin = Admin.query.filter_by(username='pcc').first()
             if admin:
-                print("Admin user already exists, removing...")
+                logger.info("Admin user already exists, removing...")
                 db.session.delete(admin)
                 db.session.commit()
             
             # Create admin user
-            print("Creating admin user...")
+            logger.info("Creating admin user...")
             admin = Admin(
                 username='pcc',
                 password='pcc@8618',
@@ -33,7 +39,7 @@ def fix_database():
             )
             db.session.add(admin)
             db.session.commit()
-            print("Admin user created successfully!")
+            logger.info("Admin user created successfully!")
             
             # Ensure upload directories exist
             uploads_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), app.config['UPLOAD_FOLDER'])
@@ -45,10 +51,10 @@ def fix_database():
             os.makedirs(os.path.join(uploads_dir, 'admission_forms'), exist_ok=True)
             os.makedirs(os.path.join(uploads_dir, 'notes'), exist_ok=True)
             os.makedirs(os.path.join(uploads_dir, 'test_results'), exist_ok=True)
-            print("Upload directories created.")
+            logger.info("Upload directories created.")
             
             # Create a sample student for testing
-            print("Creating sample student...")
+            logger.info("Creating sample student...")
             sample_student = Student(
                 admission_number="PCC7th00001",
                 username="sample_student",
@@ -62,14 +68,15 @@ def fix_database():
             )
             db.session.add(sample_student)
             db.session.commit()
-            print("Sample student created successfully!")
+            logger.info("Sample student created successfully!")
             
-            print("Database reset and initialization completed successfully!")
+            logger.info("Database reset and initialization completed successfully!")
             return True
             
         except Exception as e:
-            print(f"Error during database reset: {e}")
+            logger.error("Error during database reset: %s", e)
             return False
 
 if __name__ == '__main__':
+    logging_setup.configure('text')
     fix_database()
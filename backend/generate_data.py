@@ -0,0 +1,239 @@
+"""
+Synthetic data generator for scale testing.
+
+Fills the database named by DATABASE_URL with a realistic coaching class:
+students spread over 7th-12th with PCC{class}{n:05d} admission numbers,
+daily attendance (Monday to Saturday) over one or more years, tests per
+subject through the year, and a result for every student in every test.
+Each student gets a fixed ability and attendance rate, so marks and
+attendance vary between students the way real ones do rather than uniformly.
+
+The same --seed always produces the same data. Rows are generated lazily and
+written with DBAPI executemany in large batches, bypassing the ORM, so ten
+million attendance rows take minutes:
+
+    DATABASE_URL=sqlite:////tmp/big.db python generate_data.py --reset --students 32000 --years 1
+
+Usage:
+    python generate_data.py [--students N] [--years Y] [--tests-per-subject N]
+                            [--end-date YYYY-MM-DD] [--seed N] [--reset]
+"""
+
+import sys
+import time
+import random
+import logging
+import argparse
+import datetime
+from itertools import islice
+from app import app, db, Student, Attendance, Test, TestResult, bump_table_versions, create_tables_and_admin
+import migrations
+import logging_setup
+
+logger = logging.getLogger('generate_data')
+
+CLASSES = ['7th', '8th', '9th', '10th', '11th', '12th']
+# Enrolment thins out in the board-exam years
+CLASS_WEIGHTS = [1.2, 1.2, 1.1, 1.1, 0.9, 0.9]
+SUBJECTS = {
+    '7th': ['Mathematics', 'Science', 'English', 'Social Studies'],
+    '8th': ['Mathematics', 'Science', 'English', 'Social Studies'],
+    '9th': ['Mathematics', 'Science', 'English', 'Social Studies'],
+    '10th': ['Mathematics', 'Science', 'English', 'Social Studies'],
+    '11th': ['Mathematics', 'Physics', 'Chemistry', 'Biology'],
+    '12th': ['Mathematics', 'Physics', 'Chemistry', 'Biology'],
+}
+MAX_MARKS = [25, 50, 100]
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Akash', 'Ananya', 'Arjun', 'Bhavana', 'Chetan', 'Deepa', 'Divya', 'Ganesh',
+    'Harsha', 'Isha', 'Karthik', 'Kavya', 'Lakshmi', 'Manoj', 'Meera', 'Naveen', 'Nikhil', 'Pooja',
+    'Prajwal', 'Priya', 'Rahul', 'Rakesh', 'Sahana', 'Sanjay', 'Shreya', 'Sneha', 'Suresh', 'Varun',
+]
+LAST_NAMES = [
+    'Patil', 'Kulkarni', 'Desai', 'Joshi', 'Hegde', 'Naik', 'Rao', 'Shetty', 'Gowda', 'Reddy',
+    'Biradar', 'Hiremath', 'Pujari', 'Kamble', 'Angadi', 'Jadhav', 'Kumar', 'Sharma',
+]
+SCHOOLS = [
+    'Government High School', 'Sharada Vidya Mandir', 'Kendriya Vidyalaya', "St. Mary's Convent",
+    'Vivekananda Public School', 'Basaveshwar English Medium School', 'Little Flower School',
+]
+
+BATCH_SIZE = 100000
+
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def bulk_insert(table, columns, rows):
+    """executemany rows (tuples in column order) straight through the DBAPI cursor; returns the row count"""
+    placeholder = '?' if db.engine.dialect.paramstyle == 'qmark' else '%s'
+    sql = (f"INSERT INTO {table.name} ({', '.join(columns)}) "
+           f"VALUES ({', '.join([placeholder] * len(columns))})")
+    cursor = db.session.connection().connection.cursor()
+    count = 0
+    try:
+        for batch in batched(rows, BATCH_SIZE):
+            cursor.executemany(sql, batch)
+            count += len(batch)
+    finally:
+        cursor.close()
+    db.session.commit()
+    return count
+
+def school_days(start, end):
+    """Every Monday to Saturday from start to end inclusive"""
+    day = start
+    while day <= end:
+        if day.weekday() < 6:
+            yield day
+        day += datetime.timedelta(days=1)
+
+def clamp(value, low, high):
+    return max(low, min(high, value))
+
+def make_students(rng, count, admission_date):
+    """Return (rows, profiles): Student rows and each student's (class, ability, attendance rate)"""
+    class_counters = dict.fromkeys(CLASSES, 0)
+    rows = []
+    profiles = []
+    for student_id in range(1, count + 1):
+        class_level = rng.choices(CLASSES, CLASS_WEIGHTS)[0]
+        class_counters[class_level] += 1
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        # The app derives usernames from the name; the id keeps generated ones unique
+        username = f"{name.lower().replace(' ', '_')}_{student_id}"
+        rows.append((
+            student_id,
+            f"PCC{class_level}{class_counters[class_level]:05d}",
+            username,
+            f"{username}123",
+            name,
+            f"{username}@example.com",
+            f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}",
+            rng.choice(SCHOOLS),
+            class_level,
+            admission_date.isoformat(),
+        ))
+        ability = clamp(rng.gauss(0.62, 0.15), 0.15, 0.98)
+        attendance_rate = rng.betavariate(9, 1.6)
+        profiles.append((class_level, ability, attendance_rate))
+    return rows, profiles
+
+def make_tests(rng, start, end, tests_per_subject):
+    """Test rows spread evenly over the period, per class and subject"""
+    span = (end - start).days
+    years = max(1, round(span / 365))
+    per_subject = tests_per_subject * years
+    rows = []
+    for class_level in CLASSES:
+        for subject in SUBJECTS[class_level]:
+            for n in range(1, per_subject + 1):
+                date = start + datetime.timedelta(days=span * n // (per_subject + 1))
+                rows.append((
+                    len(rows) + 1, f"Unit Test {n}", subject, class_level,
+                    date.isoformat(), rng.choice(MAX_MARKS), 0
+                ))
+    return rows
+
+def result_rows(rng, tests, profiles):
+    students_by_class = {class_level: [] for class_level in CLASSES}
+    for student_id, (class_level, ability, _) in enumerate(profiles, start=1):
+        students_by_class[class_level].append((student_id, ability))
+
+    for test_id, _, _, class_level, _, max_marks, _ in tests:
+        difficulty = rng.gauss(0, 0.06)
+        for student_id, ability in students_by_class[class_level]:
+            score = clamp(rng.gauss(ability - difficulty, 0.08), 0.0, 1.0)
+            # Marks are awarded in half marks
+            yield test_id, student_id, round(score * max_marks * 2) / 2, False
+
+def attendance_rows(rng, days, profiles):
+    # Student by student, in the order of the (student_id, date) unique index, so
+    # index pages fill sequentially instead of being revisited for every day
+    dates = [day.isoformat() for day in days]
+    random_value = rng.random
+    for student_id, (_, _, rate) in enumerate(profiles, start=1):
+        for date in dates:
+            yield student_id, date, random_value() < rate
+
+def reset_sequences(tables):
+    """Move Postgres id sequences past the explicit ids inserted here"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in tables:
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), COALESCE(MAX(id), 1)) FROM {table.name}"
+        ))
+    db.session.commit()
+
+def generate(students, years, tests_per_subject, end_date, seed, reset=False):
+    rng = random.Random(seed)
+    start_date = end_date - datetime.timedelta(days=round(365 * years) - 1)
+    days = list(school_days(start_date, end_date))
+
+    with app.app_context():
+        if reset:
+            db.drop_all()
+        create_tables_and_admin()
+        if db.session.query(Student.id).first() is not None:
+            logger.error("The database already has students; run with --reset to replace them")
+            return False
+
+        if db.engine.dialect.name == 'sqlite':
+            # A generator run can simply be repeated, so skip fsync during the load, and
+            # give the index B-trees a large page cache (256 MB) while they grow
+            db.session.execute(db.text("PRAGMA synchronous = OFF"))
+            db.session.execute(db.text("PRAGMA cache_size = -262144"))
+
+        started = time.perf_counter()
+        logger.info("Generating %s students, %s school days from %s to %s (seed %s)",
+                    students, len(days), start_date, end_date, seed)
+
+        student_rows, profiles = make_students(rng, students, start_date)
+        count = bulk_insert(Student.__table__, [
+            'id', 'admission_number', 'username', 'password', 'name', 'email', 'phone',
+            'school_name', 'class_level', 'admission_date'
+        ], student_rows)
+        logger.info("Inserted %s students", count)
+
+        tests = make_tests(rng, start_date, end_date, tests_per_subject)
+        count = bulk_insert(Test.__table__, [
+            'id', 'name', 'subject', 'class_level', 'date', 'max_marks', 'results_version'
+        ], tests)
+        logger.info("Inserted %s tests", count)
+
+        count = bulk_insert(TestResult.__table__, [
+            'test_id', 'student_id', 'marks_obtained', 'shared_to_whatsapp'
+        ], result_rows(rng, tests, profiles))
+        logger.info("Inserted %s test results", count)
+
+        count = bulk_insert(Attendance.__table__, ['student_id', 'date', 'present'],
+                            attendance_rows(rng, days, profiles))
+        logger.info("Inserted %s attendance rows", count)
+
+        migrations.rebuild_attendance_summaries(db.session.connection())
+        reset_sequences([Student.__table__, Test.__table__, TestResult.__table__, Attendance.__table__])
+        bump_table_versions('student', 'attendance', 'test', 'test_result')
+        db.session.commit()
+        logger.info("Done in %.1fs", time.perf_counter() - started)
+    return True
+
+if __name__ == '__main__':
+    logging_setup.configure('text')
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic dataset')
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--years', type=float, default=1.0, help='Years of daily attendance')
+    parser.add_argument('--tests-per-subject', type=int, default=10, help='Tests per subject per year')
+    parser.add_argument('--end-date', type=datetime.date.fromisoformat, default=datetime.date(2026, 3, 31),
+                        help='Last day of generated data (fixed by default so runs are reproducible)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reset', action='store_true', help='Drop all existing data first')
+    args = parser.parse_args()
+
+    ok = generate(args.students, args.years, args.tests_per_subject, args.end_date, args.seed, args.reset)
+    sys.exit(0 if ok else 1)
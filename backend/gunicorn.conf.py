@@ -0,0 +1,24 @@
+"""
+Gunicorn settings, read automatically when gunicorn starts in this directory.
+
+Sets up prometheus_client multiprocess mode so /metrics aggregates every
+worker (see metrics.py).
+"""
+
+import os
+import shutil
+import tempfile
+
+# Must be in the environment before prometheus_client is imported, here or in a worker
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'pcc_prometheus'))
+
+from prometheus_client import multiprocess
+
+def on_starting(server):
+    # Files left by a previous run would be counted as live workers
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
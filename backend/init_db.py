@@ -1,10 +1,16 @@
 from app import app, db, Admin
+import migrations
 import os
+import logging
+import logging_setup
+
+logger = logging.getLogger('init_db')
 
 def init_database():
     with app.app_context():
         # Create all tables without dropping existing ones
         db.create_all()
+        migrations.upgrade(db.engine)
         
         # Check if admin exists
         admin = Admin.query.filter_by(username='pcc').first()
@@ -12,15 +18,15 @@ def init_database():
             admin = Admin(username='pcc', password='pcc@8618', selected_class='')
             db.session.add(admin)
             db.session.commit()
-            print("Admin user created successfully!")
+            logger.info("Admin user created successfully!")
         else:
             # Update admin if it exists but doesn't have selected_class
             if not hasattr(admin, 'selected_class') or admin.selected_class is None:
                 admin.selected_class = ''
                 db.session.commit()
-                print("Updated admin user with selected_class field")
+                logger.info("Updated admin user with selected_class field")
             else:
-                print("Admin user already exists.")
+                logger.info("Admin user already exists.")
         
         # Ensure upload directories exist
         upload_dirs = [
@@ -32,8 +38,9 @@ def init_database():
         
         for directory in upload_dirs:
             os.makedirs(directory, exist_ok=True)
-            print(f"Verified directory: {directory}")
+            logger.info("Verified directory: %s", directory)
 
 if __name__ == '__main__':
+    logging_setup.configure('text')
     init_database()
-    print("Database initialization completed successfully!")
+    logger.info("Database initialization completed successfully!")
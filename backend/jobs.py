@@ -0,0 +1,287 @@
+"""
+Background Job Worker
+
+Runs queued jobs from the job table in a pool of worker processes, so slow
+work such as PDF generation never ties up a web worker.
+The supervising process also reaps abandoned partial uploads, unreferenced
+upload blobs and superseded cached PDFs, and periodically checkpoints the SQLite WAL.
+
+Each running job records the pid of the worker that claimed it. When the
+supervisor finds a worker dead it puts that worker's jobs straight back on the
+queue; jobs claimed elsewhere (e.g. by run-once) are requeued once they have
+been running for JOB_STALE_SECONDS.
+
+Worker processes record PDF render times in their own prometheus_client
+multiprocess directory (JOB_METRICS_DIR), which the supervisor serves on
+JOB_METRICS_PORT (see metrics.py). It is separate from gunicorn's, which
+gunicorn clears whenever it starts.
+
+Usage:
+    python jobs.py worker [--processes N] [--poll-interval SECONDS]
+    python jobs.py run-once    # Drain the queue in this process and exit
+
+Run it from the backend directory alongside gunicorn (see Procfile).
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import datetime
+import logging
+import tempfile
+import multiprocessing
+
+JOB_METRICS_DIR = os.getenv('JOB_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'pcc_prometheus_jobs'))
+JOB_METRICS_PORT = int(os.getenv('JOB_METRICS_PORT', '9101'))
+
+if __name__ == '__main__':
+    # Must be in the environment before prometheus_client is imported (by app)
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = JOB_METRICS_DIR
+    os.makedirs(JOB_METRICS_DIR, exist_ok=True)
+
+from prometheus_client import multiprocess
+import metrics
+import db_profile
+from app import (app, db, Job, ResultsChanged, build_test_results_pdf, build_report_cards, reap_stale_uploads,
+                 collect_unreferenced_blobs, collect_unreferenced_pdfs)
+
+logger = logging.getLogger('jobs')
+
+# Jobs left 'running' longer than this are assumed to belong to a dead worker
+STALE_JOB_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '900'))
+
+# How often the supervisor looks for stale jobs
+STALE_JOB_CHECK_INTERVAL = int(os.getenv('JOB_STALE_CHECK_INTERVAL', '60'))
+
+# How often the supervisor clears out abandoned partial uploads, unreferenced blobs and cached PDFs
+UPLOAD_REAP_INTERVAL = int(os.getenv('UPLOAD_REAP_INTERVAL', '3600'))
+
+# How often the supervisor checkpoints the SQLite WAL and runs PRAGMA optimize
+DB_MAINTENANCE_INTERVAL = int(os.getenv('DB_MAINTENANCE_INTERVAL', '600'))
+
+def run_test_results_pdf(job):
+    build_test_results_pdf(job.target_id)
+    return f'/api/admin/test-results-pdf/{job.target_id}'
+
+def run_report_cards(job):
+    def on_progress(done, total):
+        Job.query.filter_by(id=job.id).update({'progress': done, 'total': total})
+        db.session.commit()
+
+    job.result_path = build_report_cards(job.target_id, on_progress)
+    return f'/api/admin/jobs/{job.id}/download'
+
+# Job kind -> handler(job) returning the job's result URL
+JOB_HANDLERS = {
+    'test_results_pdf': run_test_results_pdf,
+    'report_cards': run_report_cards,
+}
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running and return it, or None"""
+    while True:
+        job_id = db.session.query(Job.id).filter_by(status='queued').order_by(Job.id).limit(1).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+
+        claimed = Job.query.filter_by(id=job_id, status='queued').update({
+            'status': 'running',
+            'started_at': datetime.datetime.utcnow(),
+            'worker_pid': os.getpid()
+        })
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+        # Another worker claimed it first; try the next one
+
+def run_job(job):
+    """Run a claimed job and record its outcome"""
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        result_url = handler(job)
+        job.status = 'done'
+        job.result_url = result_url
+        logger.info("Job %s (%s) finished", job.id, job.kind)
+    except ResultsChanged as e:
+        # Render again from the new results; the job keeps its id, so pollers just see it queued
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        job.status = 'queued'
+        job.started_at = None
+        job.worker_pid = None
+        db.session.commit()
+        logger.info("Job %s (%s) requeued: %s", job.id, job.kind, e)
+        return
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        job.status = 'failed'
+        job.error = str(e)
+        logger.exception("Job %s (%s) failed: %s", job.id, job.kind, e)
+
+    job.finished_at = datetime.datetime.utcnow()
+    db.session.commit()
+
+def requeue_stale_jobs(live_pids=()):
+    """Return jobs orphaned by a crashed worker to the queue.
+
+    Jobs claimed by one of live_pids are still being worked on, however long they take.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=STALE_JOB_SECONDS)
+    query = Job.query.filter(Job.status == 'running', Job.started_at < cutoff)
+    if live_pids:
+        query = query.filter(db.or_(Job.worker_pid.is_(None), Job.worker_pid.notin_(live_pids)))
+    requeued = query.update({'status': 'queued', 'started_at': None, 'worker_pid': None}, synchronize_session=False)
+    db.session.commit()
+    if requeued:
+        logger.info("Requeued %s stale job(s)", requeued)
+
+def requeue_worker_jobs(pid):
+    """Return the jobs a dead worker process was running to the queue"""
+    requeued = Job.query.filter_by(status='running', worker_pid=pid).update(
+        {'status': 'queued', 'started_at': None, 'worker_pid': None}, synchronize_session=False
+    )
+    db.session.commit()
+    if requeued:
+        logger.info("Requeued %s job(s) left by worker %s", requeued, pid)
+    return requeued
+
+def drain_queue():
+    """Run jobs until the queue is empty. Returns the number of jobs run."""
+    count = 0
+    while True:
+        job = claim_next_job()
+        if job is None:
+            return count
+        run_job(job)
+        count += 1
+
+def worker_loop(poll_interval):
+    with app.app_context():
+        # Never share the parent's pooled connections across a fork
+        db.engine.dispose()
+        while True:
+            try:
+                if not drain_queue():
+                    time.sleep(poll_interval)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("Job worker error: %s", e)
+                time.sleep(poll_interval)
+
+def reap_uploads():
+    with app.app_context():
+        try:
+            reaped = reap_stale_uploads()
+            if reaped:
+                logger.info("Removed %s stale upload(s)", reaped)
+            collected = collect_unreferenced_blobs()
+            if collected:
+                logger.info("Removed %s unreferenced blob(s)", collected)
+            collected = collect_unreferenced_pdfs()
+            if collected:
+                logger.info("Removed %s superseded cached PDF(s)", collected)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Upload reaper error: %s", e)
+        finally:
+            db.engine.dispose()
+
+def maintain_database():
+    with app.app_context():
+        try:
+            checkpoint = db_profile.maintain(db.engine)
+            if checkpoint is not None:
+                busy, wal_frames, checkpointed = checkpoint
+                logger.info("WAL checkpoint: %s of %s frame(s) copied%s",
+                            checkpointed, wal_frames, ' (readers still active)' if busy else '')
+        except Exception as e:
+            logger.exception("Database maintenance error: %s", e)
+        finally:
+            db.engine.dispose()
+
+def requeue_orphaned_jobs(dead_pids, live_pids):
+    with app.app_context():
+        try:
+            for pid in dead_pids:
+                requeue_worker_jobs(pid)
+            requeue_stale_jobs(live_pids)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Job requeue error: %s", e)
+        finally:
+            db.engine.dispose()
+
+def start_workers(processes, poll_interval):
+    with app.app_context():
+        requeue_stale_jobs()
+        db.engine.dispose()
+
+    # Files left by a previous run would be counted as live workers
+    shutil.rmtree(JOB_METRICS_DIR, ignore_errors=True)
+    os.makedirs(JOB_METRICS_DIR, exist_ok=True)
+    metrics.start_exporter(JOB_METRICS_PORT)
+    logger.info("Serving job metrics on port %s", JOB_METRICS_PORT)
+
+    workers = []
+    for _ in range(processes):
+        # Not daemonic: jobs such as report cards start their own process pools
+        process = multiprocessing.Process(target=worker_loop, args=(poll_interval,))
+        process.start()
+        workers.append(process)
+    logger.info("Started %s job worker process(es)", processes)
+
+    next_reap = 0
+    next_maintenance = time.monotonic() + DB_MAINTENANCE_INTERVAL
+    next_stale_check = time.monotonic() + STALE_JOB_CHECK_INTERVAL
+    try:
+        # Replace any worker that dies so the pool keeps its size
+        while True:
+            if time.monotonic() >= next_reap:
+                reap_uploads()
+                next_reap = time.monotonic() + UPLOAD_REAP_INTERVAL
+            if time.monotonic() >= next_maintenance:
+                maintain_database()
+                next_maintenance = time.monotonic() + DB_MAINTENANCE_INTERVAL
+            dead = [index for index, process in enumerate(workers) if not process.is_alive()]
+            for index in dead:
+                process = workers[index]
+                logger.warning("Job worker %s exited with %s, restarting", process.pid, process.exitcode)
+                multiprocess.mark_process_dead(process.pid)
+            if dead or time.monotonic() >= next_stale_check:
+                # Before any replacement starts, so a reused pid cannot claim a job first
+                live_pids = [process.pid for index, process in enumerate(workers) if index not in dead]
+                requeue_orphaned_jobs([workers[index].pid for index in dead], live_pids)
+                next_stale_check = time.monotonic() + STALE_JOB_CHECK_INTERVAL
+            for index in dead:
+                workers[index] = multiprocessing.Process(target=worker_loop, args=(poll_interval,))
+                workers[index].start()
+            time.sleep(5)
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+            process.join()
+            multiprocess.mark_process_dead(process.pid)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Background job worker')
+    parser.add_argument('command', choices=['worker', 'run-once'])
+    parser.add_argument('--processes', type=int, default=int(os.getenv('JOB_WORKERS', '2')))
+    parser.add_argument('--poll-interval', type=float, default=float(os.getenv('JOB_POLL_INTERVAL', '1.0')))
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        start_workers(args.processes, args.poll_interval)
+    else:
+        with app.app_context():
+            requeue_stale_jobs()
+            ran = drain_queue()
+        reap_uploads()
+        maintain_database()
+        logger.info("Ran %s job(s)", ran)
+        sys.exit(0)
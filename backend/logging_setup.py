@@ -0,0 +1,177 @@
+"""
+Logging Setup
+
+All log records go through a QueueHandler into an in-memory queue; a
+QueueListener thread formats them and writes to stdout. The thread that logs
+(a request handler, a job) never waits on stdout.
+
+Records are emitted as one JSON object per line (LOG_FORMAT=json, the default
+for the web app) or as plain text (LOG_FORMAT=text, the default for the
+maintenance scripts). Records logged during a request carry its request_id,
+method and route; init_app also writes one access line per request with the
+status and duration_ms.
+
+Levels:
+    LOG_LEVEL=INFO                              root level
+    LOG_LEVELS=jobs=DEBUG,sqlalchemy.engine=INFO  per-module overrides
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import datetime
+import logging.handlers
+import multiprocessing.util
+from flask import g, has_request_context, request
+
+# Attributes every LogRecord has; anything else was passed through extra= and is emitted as a field
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(_extras(record))
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def _extras(record):
+    return {key: value for key, value in vars(record).items()
+            if key not in _STANDARD_ATTRIBUTES and not key.startswith('_')}
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        extras = ' '.join(f"{key}={value}" for key, value in _extras(record).items())
+        if not extras:
+            return line
+        # Keep the fields on the message line, ahead of any traceback
+        first, sep, rest = line.partition('\n')
+        return f"{first} {extras}{sep}{rest}"
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request's id, method and route.
+
+    Attached to the QueueHandler, so it runs in the thread that logged the
+    record, where the request context is still available. It must not move to
+    the listener's handler, which runs in the background thread.
+    """
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.route = request.url_rule.rule if request.url_rule is not None else request.path
+        return True
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Resolve the message and traceback now, in the calling thread, but keep
+        # the traceback separate so the formatter can emit it as its own field
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+_listener = None
+_handler = None
+
+def _parse_levels(spec):
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def _start_listener(formatter):
+    global _listener
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    _handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_handler.queue, stream_handler, respect_handler_level=False)
+    _listener.start()
+
+def _restart_after_fork():
+    # The listener thread does not survive fork(); give the child its own queue and thread
+    if _listener is not None:
+        _start_listener(_listener.handlers[0].formatter)
+
+class _FlushOnChildExit:
+    # multiprocessing children leave through os._exit, which skips atexit, and
+    # clear the finalizers inherited from the parent; register a fresh one in
+    # each child so queued records are flushed (lowest priority runs last)
+    def after_fork(self):
+        multiprocessing.util.Finalize(None, stop, exitpriority=-100)
+
+_flush_on_child_exit = _FlushOnChildExit()
+multiprocessing.util.register_after_fork(_flush_on_child_exit, _FlushOnChildExit.after_fork)
+
+def stop():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def configure(default_format='json'):
+    """Route the root logger through the queue. Safe to call again to reconfigure."""
+    global _handler
+    stop()
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+
+    log_format = os.getenv('LOG_FORMAT', default_format)
+    formatter = JsonFormatter() if log_format == 'json' else TextFormatter()
+
+    _handler = _QueueHandler(queue.SimpleQueue())
+    _handler.addFilter(RequestContextFilter())
+    _start_listener(formatter)
+
+    root.addHandler(_handler)
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    for name, level in _parse_levels(os.getenv('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level)
+
+atexit.register(stop)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+def init_app(app):
+    """Give every request an id (X-Request-ID, passed through from the proxy if set) and an access log line"""
+    access_log = logging.getLogger('access')
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.log_request_start = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+        start = g.get('log_request_start')
+        if start is not None:
+            access_log.info('request', extra={
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 2)
+            })
+        return response
@@ -0,0 +1,105 @@
+"""
+Prometheus Metrics
+
+Per-route request latency, status codes, SQL statements and time, PDF render
+time and bytes served, exposed as Prometheus text on /metrics.
+
+Under gunicorn every worker is a separate process, so metrics are kept in
+prometheus_client's multiprocess mode: gunicorn.conf.py points
+PROMETHEUS_MULTIPROC_DIR at a shared directory before any worker starts and
+marks workers dead as they exit, and /metrics aggregates the files of all
+workers. Without PROMETHEUS_MULTIPROC_DIR (the Flask dev server) metrics live
+in the process that serves them.
+
+PDFs are mostly rendered by the job worker (jobs.py), which may run on another
+host. Its processes share a multiprocess directory of their own, and the
+supervisor exports them with start_exporter() on JOB_METRICS_PORT.
+
+Recording a request costs a few label lookups and counter updates; nothing
+is rendered until /metrics is scraped.
+"""
+
+import os
+import time
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+    start_http_server
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUEST_LATENCY = Histogram(
+    'pcc_http_request_duration_seconds', 'Request latency by route',
+    ['method', 'route'], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    'pcc_http_requests_total', 'Requests by route and status code',
+    ['method', 'route', 'status']
+)
+SQL_STATEMENTS = Histogram(
+    'pcc_sql_statements_per_request', 'SQL statements executed per request',
+    ['route'], buckets=STATEMENT_BUCKETS
+)
+SQL_SECONDS = Counter(
+    'pcc_sql_seconds_total', 'Time spent executing SQL statements',
+    ['route']
+)
+BYTES_SERVED = Counter(
+    'pcc_http_response_bytes_total', 'Response body bytes with a known length',
+    ['route']
+)
+PDF_RENDER_SECONDS = Histogram(
+    'pcc_pdf_render_seconds', 'PDF render time by kind',
+    ['kind'], buckets=LATENCY_BUCKETS
+)
+
+def observe_pdf_render(kind, seconds):
+    PDF_RENDER_SECONDS.labels(kind).observe(seconds)
+
+def _route():
+    # The rule template, not the URL, keeps label cardinality bounded
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+def _registry():
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+def generate():
+    """Return (body, content type) for the current metrics"""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+def start_exporter(port):
+    """Serve the metrics on their own port from a background thread, for processes without /metrics"""
+    start_http_server(port, registry=_registry())
+
+def init_app(app):
+    """Record every request; SQL figures come from query_counter.init_app's per-request counter"""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+
+        route = _route()
+        REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - start)
+        REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+
+        counter = g.get('query_counter')
+        if counter is not None:
+            SQL_STATEMENTS.labels(route).observe(counter.count)
+            SQL_SECONDS.labels(route).inc(counter.elapsed)
+
+        if response.content_length:
+            BYTES_SERVED.labels(route).inc(response.content_length)
+        return response
@@ -1,34 +1,22 @@
 from app import app, db, Admin
-import sqlite3
-import os
+import migrations
+import logging
+import logging_setup
+
+logger = logging.getLogger('migrate_db')
 
 def migrate_database():
     with app.app_context():
         try:
             # First, ensure all tables are created
-            print("Creating database tables if they don't exist...")
+            logger.info("Creating database tables if they don't exist...")
             db.create_all()
-            print("Tables created or already exist.")
-            
-            # Connect to the database
-            db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'padashetty.db')
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            # Check if selected_class column exists in admin table
-            cursor.execute("PRAGMA table_info(admin)")
-            columns = cursor.fetchall()
-            column_names = [column[1] for column in columns]
-            
-            if 'selected_class' not in column_names:
-                print("Adding 'selected_class' column to admin table...")
-                cursor.execute("ALTER TABLE admin ADD COLUMN selected_class TEXT")
-                conn.commit()
-                print("Column added successfully!")
-            else:
-                print("Column 'selected_class' already exists.")
+            logger.info("Tables created or already exist.")
             
-            conn.close()
+            # Apply pending schema migrations (columns, indexes, unique keys)
+            applied = migrations.upgrade(db.engine)
+            if not applied:
+                logger.info("Schema is already up to date.")
             
             # Create or update admin user
             admin = Admin.query.filter_by(username='pcc').first()
@@ -37,20 +25,21 @@ def migrate_database():
                 admin = Admin(username='pcc', password='pcc@8618', selected_class='')
                 db.session.add(admin)
                 db.session.commit()
-                print("Admin user created successfully!")
+                logger.info("Admin user created successfully!")
             elif admin.selected_class is None:
                 # Update existing admin with selected_class
                 admin.selected_class = ''  # Default empty string
                 db.session.commit()
-                print("Updated admin user with default selected_class value.")
+                logger.info("Updated admin user with default selected_class value.")
             
-            print("Database migration completed successfully!")
+            logger.info("Database migration completed successfully!")
             
         except Exception as e:
-            print(f"Error during migration: {e}")
+            logger.error("Error during migration: %s", e)
             return False
         
         return True
 
 if __name__ == '__main__':
+    logging_setup.configure('text')
     migrate_database()
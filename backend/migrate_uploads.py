@@ -0,0 +1,89 @@
+"""
+One-shot conversion of existing uploads to the content-addressed blob store.
+
+Moves every note and admission form still stored under uploads/notes or
+uploads/admission_forms into uploads/blobs and points the database rows at
+the blob, so identical files end up stored once.
+
+Usage:
+    python migrate_uploads.py [--dry-run]
+
+Safe to run more than once: rows already pointing at a blob are skipped.
+"""
+
+import os
+import sys
+import shutil
+import logging
+from app import app, db, Note, Student, bump_table_versions
+import blob_store
+import logging_setup
+
+logger = logging.getLogger('migrate_uploads')
+
+def link_into_store(folder, path, digest):
+    destination = blob_store.blob_path(folder, digest, blob_store.file_extension(path))
+    if not os.path.exists(destination):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        try:
+            os.link(path, destination)
+        except OSError:
+            # No hard links on this filesystem; fall back to a copy placed atomically
+            temp_path = f"{destination}.tmp"
+            shutil.copyfile(path, temp_path)
+            os.replace(temp_path, destination)
+    return destination
+
+def migrate_uploads(dry_run=False):
+    folder = app.config['UPLOAD_FOLDER']
+    
+    with app.app_context():
+        # (model, path column) pairs whose files move into the store
+        references = [(Note, Note.file_path), (Student, Student.admission_form_path)]
+        
+        # Hash each distinct legacy file once, however many rows share it
+        digests = {}
+        missing = set()
+        for model, column in references:
+            for (path,) in db.session.query(column).filter(column.isnot(None)).distinct():
+                if path in digests or path in missing or blob_store.is_blob(folder, path):
+                    continue
+                if not os.path.isfile(path):
+                    missing.add(path)
+                    logger.warning("Missing file, left unchanged: %s", path)
+                    continue
+                digests[path] = blob_store.hash_file(path)
+        
+        if not digests:
+            logger.info("No legacy uploads to convert.")
+            return True
+        
+        unique = set(digests.values())
+        legacy_bytes = sum(os.path.getsize(path) for path in digests)
+        logger.info("%s file(s), %s distinct, %s bytes", len(digests), len(unique), legacy_bytes)
+        if dry_run:
+            return True
+        
+        # Link each file into the store, repoint its rows, and only then remove
+        # the legacy copies, so an interrupted run never leaves a row without a file
+        new_paths = {}
+        for path, digest in digests.items():
+            new_paths[path] = link_into_store(folder, path, digest)
+        
+        for model, column in references:
+            for old_path, new_path in new_paths.items():
+                model.query.filter(column == old_path).update({column: new_path}, synchronize_session=False)
+        bump_table_versions('note', 'student')
+        db.session.commit()
+        
+        for path in new_paths:
+            os.remove(path)
+        
+        stored_bytes = sum(os.path.getsize(path) for path in set(new_paths.values()))
+        logger.info("Converted %s file(s); %s bytes freed by deduplication.", len(new_paths), legacy_bytes - stored_bytes)
+        return True
+
+if __name__ == '__main__':
+    logging_setup.configure('text')
+    dry_run = '--dry-run' in sys.argv[1:]
+    sys.exit(0 if migrate_uploads(dry_run) else 1)
@@ -0,0 +1,330 @@
+"""
+Schema Migration Runner
+
+Applies ordered, idempotent schema migrations and records them in the
+schema_version table. Every migration has an up and a down step, so the
+schema can be moved to any version in either direction.
+
+Usage:
+    python migrations.py upgrade [version]    # Apply pending migrations
+    python migrations.py downgrade <version>  # Revert migrations above version
+    python migrations.py status               # List applied and pending migrations
+
+The web app runs upgrade() at startup through create_tables_and_admin().
+"""
+
+import sys
+import logging
+import datetime
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger('migrations')
+
+VERSION_TABLE = 'schema_version'
+
+# Migration steps. Each one receives an open connection inside a transaction
+# and must be safe to run against a schema that already has the change.
+
+def _add_admin_selected_class(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('admin')]
+    if 'selected_class' not in columns:
+        conn.execute(text("ALTER TABLE admin ADD COLUMN selected_class VARCHAR(10)"))
+    conn.execute(text("UPDATE admin SET selected_class = '' WHERE selected_class IS NULL"))
+
+def _drop_admin_selected_class(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('admin')]
+    if 'selected_class' in columns:
+        conn.execute(text("ALTER TABLE admin DROP COLUMN selected_class"))
+
+HOT_PATH_INDEXES = [
+    ('ix_attendance_student_id', 'attendance', 'student_id'),
+    ('ix_attendance_date', 'attendance', 'date'),
+    ('ix_test_result_test_id', 'test_result', 'test_id'),
+    ('ix_test_result_student_id', 'test_result', 'student_id'),
+    ('ix_student_class_level', 'student', 'class_level'),
+    ('ix_test_class_level', 'test', 'class_level'),
+]
+
+def _create_hot_path_indexes(conn):
+    for name, table, column in HOT_PATH_INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})"))
+
+def _drop_hot_path_indexes(conn):
+    for name, _, _ in HOT_PATH_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+UNIQUE_KEYS = [
+    ('uq_attendance_student_date', 'attendance', ('student_id', 'date')),
+    ('uq_test_result_test_student', 'test_result', ('test_id', 'student_id')),
+]
+
+def _create_unique_keys(conn):
+    for name, table, columns in UNIQUE_KEYS:
+        column_list = ', '.join(columns)
+        # Keep the most recent row of any duplicates so the unique index can be built
+        conn.execute(text(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT MAX(id) FROM {table} GROUP BY {column_list})"
+        ))
+        conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({column_list})"))
+
+def _drop_unique_keys(conn):
+    for name, _, _ in UNIQUE_KEYS:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+def _create_table_version(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS table_version ("
+        "table_name VARCHAR(50) PRIMARY KEY, "
+        "version INTEGER NOT NULL)"
+    ))
+
+def _drop_table_version(conn):
+    conn.execute(text("DROP TABLE IF EXISTS table_version"))
+
+def _create_job_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS job ("
+        "id INTEGER PRIMARY KEY, "
+        "kind VARCHAR(50) NOT NULL, "
+        "target_id INTEGER NOT NULL, "
+        "dedupe_key VARCHAR(100) NOT NULL, "
+        "status VARCHAR(20) NOT NULL, "
+        "result_url VARCHAR(255), "
+        "error TEXT, "
+        "created_at TIMESTAMP NOT NULL, "
+        "started_at TIMESTAMP, "
+        "finished_at TIMESTAMP)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_job_status ON job (status)"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_job_active_dedupe_key ON job (dedupe_key) "
+        "WHERE status IN ('queued', 'running')"
+    ))
+
+def _drop_job_table(conn):
+    conn.execute(text("DROP TABLE IF EXISTS job"))
+
+def _add_test_results_pdf_path(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('test')]
+    if 'results_pdf_path' not in columns:
+        conn.execute(text("ALTER TABLE test ADD COLUMN results_pdf_path VARCHAR(255)"))
+
+def _drop_test_results_pdf_path(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('test')]
+    if 'results_pdf_path' in columns:
+        conn.execute(text("ALTER TABLE test DROP COLUMN results_pdf_path"))
+
+JOB_PROGRESS_COLUMNS = [
+    ('result_path', 'VARCHAR(255)'),
+    ('progress', 'INTEGER NOT NULL DEFAULT 0'),
+    ('total', 'INTEGER'),
+]
+
+def _add_job_progress(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('job')]
+    for name, definition in JOB_PROGRESS_COLUMNS:
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE job ADD COLUMN {name} {definition}"))
+
+def _drop_job_progress(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('job')]
+    for name, _ in JOB_PROGRESS_COLUMNS:
+        if name in columns:
+            conn.execute(text(f"ALTER TABLE job DROP COLUMN {name}"))
+
+def _create_upload_session_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS upload_session ("
+        "id VARCHAR(32) PRIMARY KEY, "
+        "kind VARCHAR(20) NOT NULL, "
+        "filename VARCHAR(255) NOT NULL, "
+        "size INTEGER NOT NULL, "
+        "received INTEGER NOT NULL, "
+        "title VARCHAR(100), "
+        "subject VARCHAR(50), "
+        "student_id INTEGER REFERENCES student (id), "
+        "created_at TIMESTAMP NOT NULL, "
+        "updated_at TIMESTAMP NOT NULL)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_upload_session_updated_at ON upload_session (updated_at)"))
+
+def _drop_upload_session_table(conn):
+    conn.execute(text("DROP TABLE IF EXISTS upload_session"))
+
+def _month_expression(conn, column):
+    """SQL for the YYYY-MM of a date column in this connection's dialect"""
+    if conn.dialect.name == 'sqlite':
+        return f"strftime('%Y-%m', {column})"
+    return f"to_char({column}, 'YYYY-MM')"
+
+def _create_attendance_summary(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS attendance_summary ("
+        "student_id INTEGER NOT NULL REFERENCES student (id), "
+        "month VARCHAR(7) NOT NULL, "
+        "class_level VARCHAR(10) NOT NULL, "
+        "present INTEGER NOT NULL, "
+        "total INTEGER NOT NULL, "
+        "PRIMARY KEY (student_id, month))"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_attendance_summary_class_level ON attendance_summary (class_level)"
+    ))
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS class_attendance_summary ("
+        "class_level VARCHAR(10) NOT NULL, "
+        "month VARCHAR(7) NOT NULL, "
+        "present INTEGER NOT NULL, "
+        "total INTEGER NOT NULL, "
+        "PRIMARY KEY (class_level, month))"
+    ))
+
+    # Fill both summaries from the raw rows; from here on mark_attendance keeps them current
+    rebuild_attendance_summaries(conn)
+
+def rebuild_attendance_summaries(conn):
+    """Recompute attendance_summary and class_attendance_summary from the attendance table.
+
+    Also used by scripts that bulk-load attendance without going through mark_attendance.
+    """
+    month = _month_expression(conn, 'attendance.date')
+    conn.execute(text("DELETE FROM attendance_summary"))
+    conn.execute(text("DELETE FROM class_attendance_summary"))
+    conn.execute(text(
+        "INSERT INTO attendance_summary (student_id, month, class_level, present, total) "
+        f"SELECT attendance.student_id, {month}, student.class_level, "
+        "SUM(CASE WHEN attendance.present THEN 1 ELSE 0 END), COUNT(*) "
+        "FROM attendance JOIN student ON student.id = attendance.student_id "
+        f"GROUP BY attendance.student_id, {month}, student.class_level"
+    ))
+    conn.execute(text(
+        "INSERT INTO class_attendance_summary (class_level, month, present, total) "
+        "SELECT class_level, month, SUM(present), SUM(total) FROM attendance_summary "
+        "GROUP BY class_level, month"
+    ))
+
+def _drop_attendance_summary(conn):
+    conn.execute(text("DROP TABLE IF EXISTS attendance_summary"))
+    conn.execute(text("DROP TABLE IF EXISTS class_attendance_summary"))
+
+def _add_test_results_version(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('test')]
+    if 'results_version' not in columns:
+        conn.execute(text("ALTER TABLE test ADD COLUMN results_version INTEGER NOT NULL DEFAULT 0"))
+
+def _drop_test_results_version(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('test')]
+    if 'results_version' in columns:
+        conn.execute(text("ALTER TABLE test DROP COLUMN results_version"))
+
+def _add_job_worker_pid(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('job')]
+    if 'worker_pid' not in columns:
+        conn.execute(text("ALTER TABLE job ADD COLUMN worker_pid INTEGER"))
+
+def _drop_job_worker_pid(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('job')]
+    if 'worker_pid' in columns:
+        conn.execute(text("ALTER TABLE job DROP COLUMN worker_pid"))
+
+# (version, description, up, down) in the order they must be applied
+MIGRATIONS = [
+    (1, 'Add admin.selected_class', _add_admin_selected_class, _drop_admin_selected_class),
+    (2, 'Add hot-path indexes', _create_hot_path_indexes, _drop_hot_path_indexes),
+    (3, 'Add unique keys for attendance and test results', _create_unique_keys, _drop_unique_keys),
+    (4, 'Add table_version change counters', _create_table_version, _drop_table_version),
+    (5, 'Add job table for background work', _create_job_table, _drop_job_table),
+    (6, 'Add test.results_pdf_path', _add_test_results_pdf_path, _drop_test_results_pdf_path),
+    (7, 'Add job progress and result file', _add_job_progress, _drop_job_progress),
+    (8, 'Add upload_session table for resumable uploads', _create_upload_session_table, _drop_upload_session_table),
+    (9, 'Add monthly attendance summaries', _create_attendance_summary, _drop_attendance_summary),
+    (10, 'Add test.results_version', _add_test_results_version, _drop_test_results_version),
+    (11, 'Add job.worker_pid', _add_job_worker_pid, _drop_job_worker_pid),
+]
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+            "version INTEGER PRIMARY KEY, "
+            "description VARCHAR(200) NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL)"
+        ))
+
+def applied_versions(engine):
+    """Return the set of migration versions already applied"""
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text(f"SELECT version FROM {VERSION_TABLE}"))}
+
+def upgrade(engine, target=None):
+    """Apply every pending migration up to and including target (default: latest)"""
+    done = applied_versions(engine)
+    applied = []
+
+    for version, description, up, _ in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version in done:
+            continue
+
+        with engine.begin() as conn:
+            up(conn)
+            conn.execute(
+                text(f"INSERT INTO {VERSION_TABLE} (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {'v': version, 'd': description, 't': datetime.datetime.utcnow()}
+            )
+        applied.append(version)
+        logger.info("Applied migration %s: %s", version, description)
+
+    return applied
+
+def downgrade(engine, target):
+    """Revert every applied migration with a version above target"""
+    done = applied_versions(engine)
+    reverted = []
+
+    for version, description, _, down in reversed(MIGRATIONS):
+        if version <= target or version not in done:
+            continue
+
+        with engine.begin() as conn:
+            down(conn)
+            conn.execute(text(f"DELETE FROM {VERSION_TABLE} WHERE version = :v"), {'v': version})
+        reverted.append(version)
+        logger.info("Reverted migration %s: %s", version, description)
+
+    return reverted
+
+def status(engine):
+    """Print each known migration and whether it has been applied"""
+    done = applied_versions(engine)
+    for version, description, _, _ in MIGRATIONS:
+        state = 'applied' if version in done else 'pending'
+        logger.info("%4d  %-8s %s", version, state, description)
+
+if __name__ == '__main__':
+    from app import app, db
+    import logging_setup
+    logging_setup.configure('text')
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'upgrade'
+
+    with app.app_context():
+        if command == 'upgrade':
+            # Create any missing tables first so migrations always have a baseline to work from
+            db.create_all()
+            target = int(sys.argv[2]) if len(sys.argv) > 2 else None
+            upgrade(db.engine, target)
+        elif command == 'downgrade':
+            if len(sys.argv) < 3:
+                logger.error("Usage: python migrations.py downgrade <version>")
+                sys.exit(1)
+            downgrade(db.engine, int(sys.argv[2]))
+        elif command == 'status':
+            status(db.engine)
+        else:
+            logger.error("Unknown command: %s", command)
+            logger.error("Usage: python migrations.py [upgrade [version] | downgrade <version> | status]")
+            sys.exit(1)
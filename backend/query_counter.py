@@ -0,0 +1,92 @@
+"""
+SQL Statement Counter
+
+Counts the SQL statements executed on the current thread, and the time spent
+in them, while a QueryCounter is active. init_app() gives every request its
+own counter (flask.g.query_counter), and with SQL_COUNT_HEADER enabled reports
+it in the X-SQL-Count and X-SQL-Time-Ms response headers.
+
+Tests use it directly to pin the number of queries an endpoint may issue:
+
+    with QueryCounter() as counter:
+        client.get('/api/student/tests', headers=headers)
+    assert counter.count <= 4
+"""
+
+import threading
+import time
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+def _active_counters():
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+    return counters
+
+class QueryCounter:
+    """Counts statements executed on this thread between start() and stop()"""
+
+    def __init__(self, record=False):
+        self.count = 0
+        self.elapsed = 0.0  # Seconds spent executing statements
+        self.statements = [] if record else None
+
+    def start(self):
+        _active_counters().append(self)
+        return self
+
+    def stop(self):
+        counters = _active_counters()
+        if self in counters:
+            counters.remove(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+# Listening on the Engine class covers every engine, including ones created after import
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _active_counters():
+        context._query_counter_start = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counters = _active_counters()
+    start = getattr(context, '_query_counter_start', None)
+    if not counters or start is None:
+        return
+
+    elapsed = time.perf_counter() - start
+    for counter in counters:
+        counter.count += 1
+        counter.elapsed += elapsed
+        if counter.statements is not None:
+            counter.statements.append(statement)
+
+def init_app(app):
+    """Count the statements of every request in g.query_counter"""
+
+    @app.before_request
+    def start_query_counter():
+        g.query_counter = QueryCounter().start()
+
+    @app.after_request
+    def add_query_count_headers(response):
+        counter = g.get('query_counter')
+        if counter is not None and app.config.get('SQL_COUNT_HEADER'):
+            response.headers['X-SQL-Count'] = str(counter.count)
+            response.headers['X-SQL-Time-Ms'] = f"{counter.elapsed * 1000:.2f}"
+        return response
+
+    @app.teardown_request
+    def stop_query_counter(exc):
+        counter = g.pop('query_counter', None)
+        if counter is not None:
+            counter.stop()
@@ -0,0 +1,93 @@
+"""
+PDF Report Rendering
+
+Renders test result PDFs with ReportLab. Stylesheets and table styles are
+built once per process and every render goes to an in-memory buffer, so a
+render costs only the layout of its own content.
+
+The inputs are plain dicts (see app.test_pdf_fields), which keeps this module
+independent of the database and lets renders run in worker processes.
+"""
+
+import io
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+# Built once per process and shared by every render
+STYLES = getSampleStyleSheet()
+TITLE_STYLE = STYLES['Title']
+NORMAL_STYLE = STYLES['Normal']
+
+RESULTS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+RESULTS_TABLE_HEADER = ['Student Name', 'Admission Number', 'Phone', 'Marks Obtained', 'Percentage']
+
+DOCUMENT_OPTIONS = {'pagesize': letter}
+
+def _build(content):
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, **DOCUMENT_OPTIONS).build(content)
+    return buffer.getvalue()
+
+def render_test_report(test, rows, whatsapp_link=None):
+    """Render the class results sheet for a test and return the PDF bytes.
+
+    test is a dict with name, subject, class_level, date and max_marks;
+    rows are (student name, admission number, phone, marks obtained).
+    """
+    content = [
+        Paragraph(f"Padashetty Coaching Class - {test['name']} Results", TITLE_STYLE),
+        Paragraph(f"<b>Subject:</b> {test['subject']}", NORMAL_STYLE),
+        Paragraph(f"<b>Class:</b> {test['class_level']}", NORMAL_STYLE),
+        Paragraph(f"<b>Date:</b> {test['date']}", NORMAL_STYLE),
+        Paragraph(f"<b>Maximum Marks:</b> {test['max_marks']}", NORMAL_STYLE),
+        Spacer(1, 0.25*inch)
+    ]
+
+    data = [RESULTS_TABLE_HEADER]
+    for name, admission_number, phone, marks_obtained in rows:
+        percentage = (marks_obtained / test['max_marks']) * 100
+        data.append([name, admission_number, phone, str(marks_obtained), f"{percentage:.2f}%"])
+
+    table = Table(data)
+    table.setStyle(RESULTS_TABLE_STYLE)
+    content.append(table)
+
+    if whatsapp_link:
+        content.append(Spacer(1, 0.5*inch))
+        content.append(Paragraph("<b>Join our WhatsApp group for more updates:</b>", NORMAL_STYLE))
+        content.append(Paragraph(whatsapp_link, NORMAL_STYLE))
+
+    return _build(content)
+
+def render_student_result(result):
+    """Render one student's result and return the PDF bytes.
+
+    result is a dict with test (as for render_test_report), student_name and
+    marks_obtained.
+    """
+    test = result['test']
+    percentage = (result['marks_obtained'] / test['max_marks']) * 100
+
+    return _build([
+        Paragraph(f"Test Result: {test['name']}", TITLE_STYLE),
+        Paragraph(f"<b>Student:</b> {result['student_name']}", NORMAL_STYLE),
+        Paragraph(f"<b>Subject:</b> {test['subject']}", NORMAL_STYLE),
+        Paragraph(f"<b>Class:</b> {test['class_level']}", NORMAL_STYLE),
+        Paragraph(f"<b>Date:</b> {test['date']}", NORMAL_STYLE),
+        Spacer(1, 0.25*inch),
+        Paragraph(f"<b>Maximum Marks:</b> {test['max_marks']}", NORMAL_STYLE),
+        Paragraph(f"<b>Marks Obtained:</b> {result['marks_obtained']}", NORMAL_STYLE),
+        Paragraph(f"<b>Percentage:</b> {percentage:.2f}%", NORMAL_STYLE)
+    ])
@@ -1,7 +1,12 @@
 from app import app, db, Admin
+import migrations
 import os
 import shutil
 import sys
+import logging
+import logging_setup
+
+logger = logging.getLogger('reset_db')
 
 def reset_database():
     with app.app_context():
@@ -10,32 +15,33 @@ def reset_database():
             if len(sys.argv) <= 1 or sys.argv[1] != "--force":
                 confirm = input("WARNING: This will delete all data in the database! Continue? (y/n): ")
                 if confirm.lower() != 'y':
-                    print("Database reset cancelled.")
+                    logger.info("Database reset cancelled.")
                     return False
             
             # Check if database file exists and remove it
             db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'padashetty.db')
             if os.path.exists(db_path):
-                print(f"Removing existing database file: {db_path}")
+                logger.info("Removing existing database file: %s", db_path)
                 os.remove(db_path)
-                print("Database file removed.")
+                logger.info("Database file removed.")
             
             # Backup uploaded files
             backup_dir = 'uploads_backup'
             if os.path.exists(app.config['UPLOAD_FOLDER']):
-                print(f"Backing up existing uploads to {backup_dir}...")
+                logger.info("Backing up existing uploads to %s...", backup_dir)
                 if os.path.exists(backup_dir):
                     shutil.rmtree(backup_dir)
                 shutil.copytree(app.config['UPLOAD_FOLDER'], backup_dir)
-                print("Uploads backed up successfully.")
+                logger.info("Uploads backed up successfully.")
             
             # Create all tables
-            print("Creating database tables...")
+            logger.info("Creating database tables...")
             db.create_all()
-            print("Tables created successfully.")
+            migrations.upgrade(db.engine)
+            logger.info("Tables created successfully.")
             
             # Create admin user
-            print("Creating admin user...")
+            logger.info("Creating admin user...")
             admin = Admin(
                 username='pcc',
                 password='pcc@8618',  # Plain text password as in the original code
@@ -43,7 +49,7 @@ def reset_database():
             )
             db.session.add(admin)
             db.session.commit()
-            print("Admin user created successfully!")
+            logger.info("Admin user created successfully!")
             
             # Ensure upload directories exist
             upload_dirs = [
@@ -55,14 +61,15 @@ def reset_database():
             
             for directory in upload_dirs:
                 os.makedirs(directory, exist_ok=True)
-                print(f"Verified directory: {directory}")
+                logger.info("Verified directory: %s", directory)
             
-            print("Database reset and initialization completed successfully!")
+            logger.info("Database reset and initialization completed successfully!")
             return True
             
         except Exception as e:
-            print(f"Error during database reset: {e}")
+            logger.error("Error during database reset: %s", e)
             return False
 
 if __name__ == '__main__':
+    logging_setup.configure('text')
     reset_database()
@@ -0,0 +1,66 @@
+"""
+Test Result Statistics
+
+Summary statistics, grade histogram, rank and percentile for one test's
+marks, computed with NumPy over the whole column at once: a single sort
+gives the median, and binary searches into it give every student's rank and
+percentile without comparing students pairwise.
+"""
+
+import numpy as np
+
+# (grade, lowest percentage for the grade), highest first
+GRADE_BANDS = [
+    ('A+', 90.0),
+    ('A', 75.0),
+    ('B', 60.0),
+    ('C', 50.0),
+    ('D', 35.0),
+    ('F', 0.0),
+]
+
+def _round(value):
+    return round(float(value), 2)
+
+def compute_result_stats(marks, max_marks):
+    """Return (summary, ranks, percentiles) for a sequence of marks.
+
+    summary holds count, mean, median, std_dev (population), min, max and the
+    grade histogram. ranks[i] is the competition rank of marks[i] (ties share
+    the best rank, 1 = top) and percentiles[i] the percentage of students who
+    scored at or below it.
+    """
+    marks = np.asarray(marks, dtype=float)
+    count = int(marks.size)
+    histogram = [{'grade': grade, 'min_percentage': low, 'count': 0} for grade, low in GRADE_BANDS]
+
+    if count == 0:
+        summary = {'count': 0, 'mean': None, 'median': None, 'std_dev': None,
+                   'min': None, 'max': None, 'histogram': histogram}
+        return summary, np.zeros(0, dtype=int), np.zeros(0)
+
+    ordered = np.sort(marks)
+    at_or_below = np.searchsorted(ordered, marks, side='right')
+    ranks = count - at_or_below + 1
+    percentiles = at_or_below * 100.0 / count
+
+    # Band edges ascending; digitize maps each percentage to its band from the bottom
+    percentages = marks * 100.0 / max_marks if max_marks else np.zeros(count)
+    edges = np.array([low for _, low in reversed(GRADE_BANDS)][1:])
+    band_counts = np.bincount(np.digitize(percentages, edges), minlength=len(GRADE_BANDS))
+    for entry, band_count in zip(histogram, band_counts[::-1]):
+        entry['count'] = int(band_count)
+
+    middle = count // 2
+    median = ordered[middle] if count % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+    summary = {
+        'count': count,
+        'mean': _round(marks.mean()),
+        'median': _round(median),
+        'std_dev': _round(marks.std()),
+        'min': _round(ordered[0]),
+        'max': _round(ordered[-1]),
+        'histogram': histogram,
+    }
+    return summary, ranks, percentiles
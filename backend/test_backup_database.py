@@ -0,0 +1,118 @@
+"""
+Test script for online database backups.
+Copies a database of a few MB while another connection commits a small write
+every few milliseconds, once in WAL mode and once with a rollback journal,
+and checks that each copy finishes promptly and passes quick_check. A copy in
+page steps restarts on every commit, so without the fallback it never ends.
+Also checks that a restore moves the change counters past the live ones.
+"""
+
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+
+# Every test script shares one throwaway database; it must be chosen before app is imported
+TEST_DIR = os.environ.setdefault('PCC_TEST_DIR', tempfile.mkdtemp(prefix='pcc_test_'))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+import backup_database
+
+ROWS = 8000  # About 4 MB, so a stepped copy takes many steps
+WRITE_INTERVAL = 0.005
+TIMEOUT = 60
+
+def make_database(path, journal_mode):
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    conn.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, payload BLOB)")
+    conn.executemany("INSERT INTO item (payload) VALUES (?)", ((os.urandom(500),) for _ in range(ROWS)))
+    conn.commit()
+    conn.close()
+
+def write_until(path, stop):
+    conn = sqlite3.connect(path, timeout=30)
+    writes = 0
+    while not stop.is_set():
+        conn.execute("INSERT INTO item (payload) VALUES (?)", (b'x',))
+        conn.commit()
+        writes += 1
+        time.sleep(WRITE_INTERVAL)
+    conn.close()
+    return writes
+
+def backup_during_writes(journal_mode):
+    source_path = os.path.join(TEST_DIR, f'backup_source_{journal_mode}.db')
+    copy_path = os.path.join(TEST_DIR, f'backup_copy_{journal_mode}.db')
+    for path in (source_path, copy_path):
+        if os.path.exists(path):
+            os.remove(path)
+    make_database(source_path, journal_mode)
+
+    stop = threading.Event()
+    writer = threading.Thread(target=write_until, args=(source_path, stop))
+    finished = threading.Event()
+    errors = []
+
+    def copy():
+        try:
+            backup_database.copy_database(source_path, copy_path)
+        except Exception as e:
+            errors.append(e)
+        finished.set()
+
+    writer.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    threading.Thread(target=copy, daemon=True).start()
+    completed = finished.wait(TIMEOUT)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    writer.join()
+
+    assert completed, f"{journal_mode} backup still running after {TIMEOUT}s of concurrent writes"
+    assert not errors, errors
+    assert backup_database.quick_check(copy_path)
+    conn = sqlite3.connect(copy_path)
+    copied = conn.execute("SELECT COUNT(*) FROM item").fetchone()[0]
+    conn.close()
+    assert copied >= ROWS
+    print(f"{journal_mode:6s} backup finished in {elapsed:.2f}s with {copied} rows")
+
+def make_versioned_database(path, table_versions, results_versions):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE table_version (table_name VARCHAR(50) PRIMARY KEY, version INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY, results_version INTEGER NOT NULL)")
+    conn.executemany("INSERT INTO table_version VALUES (?, ?)", table_versions.items())
+    conn.executemany("INSERT INTO test VALUES (?, ?)", results_versions.items())
+    conn.commit()
+    conn.close()
+
+def test_restore_advances_versions():
+    # The live database moved on since the snapshot; restoring must not reuse its numbers
+    live_path = os.path.join(TEST_DIR, 'restore_live.db')
+    restore_path = os.path.join(TEST_DIR, 'restore_snapshot.db')
+    make_versioned_database(live_path, {'student': 40, 'note': 3}, {1: 12, 2: 5})
+    make_versioned_database(restore_path, {'student': 30, 'test': 8}, {1: 9, 3: 2})
+
+    backup_database.advance_versions(live_path, restore_path)
+
+    conn = sqlite3.connect(restore_path)
+    versions = dict(conn.execute("SELECT table_name, version FROM table_version"))
+    results_versions = dict(conn.execute("SELECT id, results_version FROM test"))
+    conn.close()
+    assert versions['student'] > 40 and versions['test'] > 8 and versions['note'] > 3, versions
+    assert all(version > 12 for version in results_versions.values()), results_versions
+    print("Restored change counters move past the live ones")
+
+def test_backup_during_writes():
+    for journal_mode in ('WAL', 'DELETE'):
+        backup_during_writes(journal_mode)
+    print("Backups finish while writes continue")
+
+if __name__ == '__main__':
+    test_backup_during_writes()
+    test_restore_advances_versions()
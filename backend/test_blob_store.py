@@ -0,0 +1,134 @@
+"""
+Test script for shared upload blobs.
+Uploads the same file as two notes and checks they share one blob, that
+deleting one note keeps the file, and that once nothing references it the
+blob is removed, straight away or by the collector after its grace period.
+A blob that is still referenced is never collected, however old.
+"""
+
+import os
+import tempfile
+
+# Every test script shares one throwaway database; it must be chosen before app is imported
+TEST_DIR = os.environ.setdefault('PCC_TEST_DIR', tempfile.mkdtemp(prefix='pcc_test_'))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+import io
+import time
+import datetime
+import app as backend
+import blob_store
+from app import app, db, Note, Student
+
+CONTENT = b'%PDF-1.4 shared chapter notes'
+
+def reset_database():
+    with app.app_context():
+        db.drop_all()
+    backend.principal_cache.clear()
+    backend.create_tables_and_admin()
+
+def make_client(upload_folder, grace):
+    os.makedirs(blob_store.blob_root(upload_folder))
+    app.config.update(UPLOAD_FOLDER=upload_folder, BLOB_GRACE_SECONDS=grace)
+    client = app.test_client()
+    token = client.post('/api/admin/login', json={'username': 'pcc', 'password': 'pcc@8618'}).get_json()['token']
+    return client, {'Authorization': f'Bearer {token}'}
+
+def upload_note(client, headers, title):
+    response = client.post('/api/admin/notes', headers=headers, content_type='multipart/form-data', data={
+        'title': title, 'subject': 'Maths', 'note_file': (io.BytesIO(CONTENT), f'{title}.pdf')
+    })
+    assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        note = Note.query.filter_by(title=title).one()
+        return note.id, note.file_path
+
+def delete_note(client, headers, note_id):
+    assert client.delete(f'/api/admin/notes/{note_id}', headers=headers).status_code == 200
+
+def collect(grace):
+    with app.app_context():
+        return backend.collect_unreferenced_blobs(grace)
+
+def age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+def test_shared_blob_released_with_last_reference():
+    reset_database()
+    saved_config = dict(app.config)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        upload_folder = os.path.join(temp_dir, 'uploads')
+        client, headers = make_client(upload_folder, grace=0)
+        try:
+            first_id, first_path = upload_note(client, headers, 'first')
+            second_id, second_path = upload_note(client, headers, 'second')
+            assert first_path == second_path
+            assert list(blob_store.iter_blobs(upload_folder)) == [first_path]
+
+            delete_note(client, headers, first_id)
+            assert os.path.exists(first_path)
+
+            delete_note(client, headers, second_id)
+            assert not os.path.exists(first_path)
+        finally:
+            app.config.update(saved_config)
+    print("A blob shared by two notes lasts until both are deleted")
+
+def test_collection_after_grace():
+    reset_database()
+    saved_config = dict(app.config)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        upload_folder = os.path.join(temp_dir, 'uploads')
+        client, headers = make_client(upload_folder, grace=600)
+        try:
+            note_id, path = upload_note(client, headers, 'recent')
+            # Just written, so within the grace period: left for the collector
+            delete_note(client, headers, note_id)
+            assert os.path.exists(path)
+            assert collect(600) == 0 and os.path.exists(path)
+
+            age(path, 601)
+            assert collect(600) == 1
+            assert not os.path.exists(path)
+        finally:
+            app.config.update(saved_config)
+    print("An unreferenced blob is collected once its grace period is over")
+
+def test_referenced_blob_never_collected():
+    reset_database()
+    saved_config = dict(app.config)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        upload_folder = os.path.join(temp_dir, 'uploads')
+        client, headers = make_client(upload_folder, grace=0)
+        try:
+            note_id, path = upload_note(client, headers, 'kept')
+            # The same file is also a student's admission form
+            with app.app_context():
+                db.session.add(Student(
+                    admission_number='PCC10th00001', username='student_1', password='student_1123', name='Student 1',
+                    class_level='10th', admission_date=datetime.date(2026, 1, 1), admission_form_path=path
+                ))
+                db.session.commit()
+
+            age(path, 365 * 24 * 3600)
+            assert collect(0) == 0 and os.path.exists(path)
+
+            # Dropping the note leaves the student's reference
+            delete_note(client, headers, note_id)
+            assert collect(0) == 0 and os.path.exists(path)
+
+            with app.app_context():
+                Student.query.filter_by(admission_form_path=path).update({'admission_form_path': None})
+                db.session.commit()
+            assert collect(0) == 1
+            assert not os.path.exists(path)
+        finally:
+            app.config.update(saved_config)
+    print("A referenced blob is never collected")
+
+if __name__ == '__main__':
+    test_shared_blob_released_with_last_reference()
+    test_collection_after_grace()
+    test_referenced_blob_never_collected()
@@ -0,0 +1,155 @@
+"""
+Test script for resumable (chunked) uploads.
+Drives the upload endpoints through the Flask test client against a throwaway
+upload folder: chunks resent, sent out of order or cut off, resuming from
+the offset the server reports, rejected offsets and sizes, and the assembled
+file's hash and place in the blob store.
+"""
+
+import io
+import os
+import tempfile
+
+# Every test script shares one throwaway database; it must be chosen before app is imported
+TEST_DIR = os.environ.setdefault('PCC_TEST_DIR', tempfile.mkdtemp(prefix='pcc_test_'))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+import hashlib
+import app as backend
+import blob_store
+import chunked_upload
+from app import app, db, Note
+
+CHUNK_SIZE = 16
+CONTENT = bytes(range(256)) * 2 + b'tail'  # Ends with a short chunk
+
+def reset_database():
+    with app.app_context():
+        db.drop_all()
+    backend.principal_cache.clear()
+    backend.create_tables_and_admin()
+
+def make_client(upload_folder):
+    os.makedirs(os.path.join(upload_folder, chunked_upload.PARTIAL_DIR))
+    app.config.update(UPLOAD_FOLDER=upload_folder, UPLOAD_CHUNK_SIZE=CHUNK_SIZE)
+    client = app.test_client()
+    token = client.post('/api/admin/login', json={'username': 'pcc', 'password': 'pcc@8618'}).get_json()['token']
+    return client, {'Authorization': f'Bearer {token}'}
+
+def start(client, headers, size=len(CONTENT)):
+    response = client.post('/api/admin/uploads', headers=headers, json={
+        'kind': 'note', 'filename': 'chapter 1.pdf', 'size': size, 'title': 'Chapter 1', 'subject': 'Maths'
+    })
+    assert response.status_code == 201, response.get_json()
+    upload = response.get_json()
+    assert upload['offset'] == 0 and upload['chunk_size'] == CHUNK_SIZE
+    return upload['upload_url']
+
+def put(client, headers, url, offset, data=None):
+    if data is None:
+        data = CONTENT[offset:offset + CHUNK_SIZE]
+    return client.put(url, headers=headers, query_string={'offset': offset}, data=data)
+
+def test_resume_and_assemble():
+    reset_database()
+    saved_config = dict(app.config)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        upload_folder = os.path.join(temp_dir, 'uploads')
+        client, headers = make_client(upload_folder)
+        try:
+            url = start(client, headers)
+            for offset in (0, CHUNK_SIZE, 2 * CHUNK_SIZE):
+                response = put(client, headers, url, offset)
+                assert response.status_code == 200, response.get_json()
+            assert response.get_json()['offset'] == 3 * CHUNK_SIZE
+
+            # A chunk whose connection drops partway is not counted
+            response = client.put(url, headers=headers, query_string={'offset': 3 * CHUNK_SIZE},
+                                  input_stream=io.BytesIO(CONTENT[3 * CHUNK_SIZE:3 * CHUNK_SIZE + 5]),
+                                  environ_overrides={'CONTENT_LENGTH': str(CHUNK_SIZE)})
+            assert response.status_code == 400
+            assert client.get(url, headers=headers).get_json()['offset'] == 3 * CHUNK_SIZE
+
+            # A chunk past what has been received would leave a gap
+            response = put(client, headers, url, 5 * CHUNK_SIZE)
+            assert response.status_code == 409
+            assert response.get_json()['offset'] == 3 * CHUNK_SIZE
+
+            # A resent chunk replaces the data from its offset on; the client carries on from there
+            response = put(client, headers, url, CHUNK_SIZE)
+            assert response.status_code == 200
+            assert response.get_json()['offset'] == 2 * CHUNK_SIZE
+
+            # After a dropped connection the client asks where to resume
+            response = client.get(url, headers=headers)
+            offset = response.get_json()['offset']
+            assert offset == 2 * CHUNK_SIZE
+            while offset < len(CONTENT):
+                response = put(client, headers, url, offset)
+                assert response.status_code == 200, response.get_json()
+                offset = response.get_json()['offset']
+            assert offset == len(CONTENT)
+
+            digest = hashlib.sha256(CONTENT).hexdigest()
+            response = client.post(f'{url}/complete', headers=headers, json={'sha256': digest})
+            assert response.status_code == 201, response.get_json()
+
+            # The parts were assembled in order and moved into the blob store
+            expected_path = blob_store.blob_path(upload_folder, digest, '.pdf')
+            with open(expected_path, 'rb') as f:
+                assert f.read() == CONTENT
+            with app.app_context():
+                note = Note.query.one()
+                assert note.file_path == expected_path
+            assert os.listdir(os.path.join(upload_folder, chunked_upload.PARTIAL_DIR)) == []
+            assert client.get(url, headers=headers).status_code == 404
+        finally:
+            app.config.update(saved_config)
+    print("Chunks resent and resumed assemble into the uploaded file")
+
+def test_rejected_chunks():
+    reset_database()
+    saved_config = dict(app.config)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        upload_folder = os.path.join(temp_dir, 'uploads')
+        client, headers = make_client(upload_folder)
+        try:
+            url = start(client, headers)
+            assert put(client, headers, url, 0).status_code == 200
+
+            # Missing or negative offsets, oversized chunks and chunks past the declared size
+            assert client.put(url, headers=headers, data=CONTENT[:CHUNK_SIZE]).status_code == 400
+            assert put(client, headers, url, -1).status_code == 400
+            assert put(client, headers, url, CHUNK_SIZE, CONTENT[:CHUNK_SIZE + 1]).status_code == 413
+            short_url = start(client, headers, size=CHUNK_SIZE + 4)
+            assert put(client, headers, short_url, 0).status_code == 200
+            response = put(client, headers, short_url, CHUNK_SIZE)
+            assert response.status_code == 400
+            assert response.get_json()['offset'] == CHUNK_SIZE
+
+            # Completing early, or with the wrong checksum, keeps the upload open
+            response = client.post(f'{url}/complete', headers=headers,
+                                   json={'sha256': hashlib.sha256(CONTENT).hexdigest()})
+            assert response.status_code == 409
+            assert response.get_json()['offset'] == CHUNK_SIZE
+
+            assert put(client, headers, short_url, CHUNK_SIZE, b'more').status_code == 200
+            response = client.post(f'{short_url}/complete', headers=headers,
+                                   json={'sha256': hashlib.sha256(b'wrong').hexdigest()})
+            assert response.status_code == 400
+            assert client.get(short_url, headers=headers).get_json()['offset'] == CHUNK_SIZE + 4
+
+            # Cancelling removes the partial file
+            assert client.delete(short_url, headers=headers).status_code == 200
+            assert client.get(short_url, headers=headers).status_code == 404
+            upload_id = short_url.rsplit('/', 1)[1]
+            assert not os.path.exists(chunked_upload.partial_path(upload_folder, upload_id))
+            with app.app_context():
+                assert Note.query.count() == 0
+        finally:
+            app.config.update(saved_config)
+    print("Bad offsets, sizes and checksums are rejected")
+
+if __name__ == '__main__':
+    test_resume_and_assemble()
+    test_rejected_chunks()
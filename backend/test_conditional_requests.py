@@ -0,0 +1,100 @@
+"""
+Test script for conditional GETs on the list and student endpoints.
+Checks that repeating a GET with the ETag it returned gives 304 without
+running the handler, and that a write to a table the endpoint depends on
+changes the ETag, so the next GET gives 200 with fresh data.
+"""
+
+import os
+import tempfile
+
+# Every test script shares one throwaway database; it must be chosen before app is imported
+TEST_DIR = os.environ.setdefault('PCC_TEST_DIR', tempfile.mkdtemp(prefix='pcc_test_'))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+import datetime
+import app as backend
+from app import app, db, Student
+from query_counter import QueryCounter
+
+app.config['UPLOAD_FOLDER'] = os.path.join(TEST_DIR, 'uploads')
+
+def seed():
+    with app.app_context():
+        db.drop_all()
+    backend.principal_cache.clear()
+    backend.create_tables_and_admin()
+    with app.app_context():
+        db.session.add_all([
+            Student(
+                admission_number=f"PCC10th{n:05d}", username=f"student_{n}", password=f"student_{n}123",
+                name=f"Student {n}", class_level='10th', admission_date=datetime.date(2026, 1, 1)
+            ) for n in (1, 2)
+        ])
+        db.session.commit()
+
+def login(client, path, username, password):
+    token = client.post(path, json={'username': username, 'password': password}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+def revalidate(client, path, headers):
+    """GET path, then repeat it with the ETag it returned; returns (first response, ETag)"""
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    with QueryCounter() as counter:
+        repeat = client.get(path, headers=dict(headers, **{'If-None-Match': etag}))
+    assert repeat.status_code == 304
+    assert repeat.headers['ETag'] == etag
+    assert repeat.data == b''
+    # Only token_required's version lookup; the handler did not run
+    assert counter.count == 1, counter.count
+    return response, etag
+
+def test_admin_list_revalidation():
+    seed()
+    client = app.test_client()
+    admin = login(client, '/api/admin/login', 'pcc', 'pcc@8618')
+    response, etag = revalidate(client, '/api/admin/students', admin)
+    assert len(response.get_json()) == 2
+
+    # Deleting a student bumps the student table's version
+    with app.app_context():
+        student_id = Student.query.filter_by(username='student_2').one().id
+    assert client.delete(f'/api/admin/students/{student_id}', headers=admin).status_code == 200
+
+    response = client.get('/api/admin/students', headers=dict(admin, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.get_json()) == 1
+    revalidate(client, '/api/admin/students', admin)
+    print("Admin list gives 304 until a student is deleted")
+
+def test_student_revalidation():
+    seed()
+    client = app.test_client()
+    admin = login(client, '/api/admin/login', 'pcc', 'pcc@8618')
+    student = login(client, '/api/student/login', 'student_1', 'student_1123')
+    response, etag = revalidate(client, '/api/student/attendance', student)
+    assert response.get_json() == []
+
+    with app.app_context():
+        student_id = Student.query.filter_by(username='student_1').one().id
+    response = client.post('/api/admin/attendance', headers=admin, json={
+        'date': '2026-01-05', 'attendance': [{'student_id': student_id, 'present': True}]
+    })
+    assert response.status_code == 200, response.get_json()
+
+    response = client.get('/api/student/attendance', headers=dict(student, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json() == [{'date': '2026-01-05', 'present': True}]
+    revalidate(client, '/api/student/attendance', student)
+    print("Student attendance gives 304 until attendance is marked")
+
+if __name__ == '__main__':
+    test_admin_list_revalidation()
+    test_student_revalidation()
@@ -0,0 +1,97 @@
+"""
+Test script for the shared file-serving layer.
+Exercises Range/If-Range, conditional requests and proxy offload through the
+Flask test client against a throwaway upload folder.
+"""
+
+import os
+import tempfile
+from flask import Flask
+from file_serving import serve_file
+
+CONTENT = b'0123456789abcdefghijklmnopqrstuvwxyz'
+
+def make_client(upload_folder, offload=''):
+    app = Flask(__name__)
+    app.config.update(
+        UPLOAD_FOLDER=upload_folder,
+        FILE_OFFLOAD=offload,
+        FILE_OFFLOAD_PREFIX='/protected-uploads/',
+        FILE_CACHE_MAX_AGE=0
+    )
+
+    @app.route('/file')
+    def download():
+        return serve_file(os.path.join(upload_folder, 'notes', 'sample note.pdf'),
+                          'sample note.pdf', mimetype='application/pdf')
+
+    return app.test_client()
+
+def make_upload_folder(temp_dir):
+    upload_folder = os.path.join(temp_dir, 'uploads')
+    os.makedirs(os.path.join(upload_folder, 'notes'))
+    with open(os.path.join(upload_folder, 'notes', 'sample note.pdf'), 'wb') as f:
+        f.write(CONTENT)
+    return upload_folder
+
+def test_file_serving():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        client = make_client(make_upload_folder(temp_dir))
+
+        # Full download carries the validators and caching headers
+        response = client.get('/file')
+        assert response.status_code == 200
+        assert response.data == CONTENT
+        assert response.headers['Accept-Ranges'] == 'bytes'
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+        assert 'attachment' in response.headers['Content-Disposition']
+        etag = response.headers['ETag']
+        last_modified = response.headers['Last-Modified']
+        response.close()
+
+        # Resume from an offset
+        response = client.get('/file', headers={'Range': 'bytes=10-19'})
+        assert response.status_code == 206
+        assert response.data == CONTENT[10:20]
+        assert response.headers['Content-Range'] == f'bytes 10-19/{len(CONTENT)}'
+        response.close()
+
+        # If-Range only honours the range while the file is unchanged
+        response = client.get('/file', headers={'Range': 'bytes=10-', 'If-Range': etag})
+        assert response.status_code == 206
+        assert response.data == CONTENT[10:]
+        response.close()
+
+        response = client.get('/file', headers={'Range': 'bytes=10-', 'If-Range': '"stale"'})
+        assert response.status_code == 200
+        assert response.data == CONTENT
+        response.close()
+
+        # Revalidation
+        response = client.get('/file', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        response = client.get('/file', headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 304
+
+    print("Range, If-Range and conditional downloads work")
+
+def test_proxy_offload():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        upload_folder = make_upload_folder(temp_dir)
+
+        response = make_client(upload_folder, 'x-accel-redirect').get('/file')
+        assert response.status_code == 200
+        assert response.headers['X-Accel-Redirect'] == '/protected-uploads/notes/sample%20note.pdf'
+        assert response.headers['Content-Type'] == 'application/pdf'
+        assert response.data == b''
+
+        response = make_client(upload_folder, 'x-sendfile').get('/file')
+        assert response.status_code == 200
+        assert response.headers['X-Sendfile'] == os.path.join(upload_folder, 'notes', 'sample note.pdf')
+        assert response.data == b''
+
+    print("X-Accel-Redirect and X-Sendfile offload work")
+
+if __name__ == '__main__':
+    test_file_serving()
+    test_proxy_offload()
@@ -0,0 +1,95 @@
+"""
+Test script for recovering jobs from dead workers.
+A worker process claims a job and dies without finishing it; the supervisor's
+requeue must put that job back on the queue at once, while a long job held by
+a live worker stays running and an old job with no known worker is requeued.
+"""
+
+import os
+import tempfile
+
+# Every test script shares one throwaway database; it must be chosen before app is imported
+TEST_DIR = os.environ.setdefault('PCC_TEST_DIR', tempfile.mkdtemp(prefix='pcc_test_'))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+import datetime
+import multiprocessing
+import app as backend
+import jobs
+from app import app, db, Job
+
+def reset_database():
+    with app.app_context():
+        db.drop_all()
+    backend.principal_cache.clear()
+    backend.create_tables_and_admin()
+
+def claim_and_die():
+    with app.app_context():
+        db.engine.dispose()
+        jobs.claim_next_job()
+    # Killed mid-job: nothing gets to mark it done or failed
+    os._exit(1)
+
+def job_state(job_id):
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        return job.status, job.worker_pid
+
+def test_dead_worker_jobs_requeued():
+    reset_database()
+    with app.app_context():
+        crashed_id = backend.enqueue_job('test_results_pdf', 1).id
+        long_id = backend.enqueue_job('report_cards', 2).id
+        db.engine.dispose()
+
+    worker = multiprocessing.get_context('fork').Process(target=claim_and_die)
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 1
+    assert job_state(crashed_id) == ('running', worker.pid)
+
+    # A long job claimed by a live worker (this process) an hour ago
+    live_pid = os.getpid()
+    with app.app_context():
+        Job.query.filter_by(id=long_id).update({
+            'status': 'running',
+            'worker_pid': live_pid,
+            'started_at': datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        })
+        db.session.commit()
+
+        # The crashed job is too recent for the age cutoff, and the long one is still being worked on
+        jobs.requeue_stale_jobs([live_pid])
+    assert job_state(crashed_id) == ('running', worker.pid)
+    assert job_state(long_id) == ('running', live_pid)
+
+    # What the supervisor does once it sees the worker is no longer alive
+    jobs.requeue_orphaned_jobs([worker.pid], [live_pid])
+    assert job_state(crashed_id) == ('queued', None)
+    assert job_state(long_id) == ('running', live_pid)
+
+    # The requeued job is claimed again as normal
+    with app.app_context():
+        job = jobs.claim_next_job()
+        assert job.id == crashed_id and job.worker_pid == live_pid
+    print("A dead worker's job is requeued as soon as the worker is gone")
+
+def test_stale_jobs_requeued():
+    reset_database()
+    with app.app_context():
+        job_id = backend.enqueue_job('test_results_pdf', 1).id
+        # Claimed by a process the supervisor does not know, e.g. run-once, long ago
+        Job.query.filter_by(id=job_id).update({
+            'status': 'running',
+            'worker_pid': None,
+            'started_at': datetime.datetime.utcnow() - datetime.timedelta(seconds=jobs.STALE_JOB_SECONDS + 60)
+        })
+        db.session.commit()
+        jobs.requeue_stale_jobs([os.getpid()])
+    assert job_state(job_id) == ('queued', None)
+    print("A job running past the stale cutoff with no live worker is requeued")
+
+if __name__ == '__main__':
+    test_dead_worker_jobs_requeued()
+    test_stale_jobs_requeued()
@@ -0,0 +1,106 @@
+"""
+Test script for keyset pagination of the list endpoints.
+Walks the student list page by page under several sorts and checks every row
+comes back exactly once, including after the row a cursor points at has
+been deleted between two pages.
+"""
+
+import os
+import tempfile
+
+# Every test script shares one throwaway database; it must be chosen before app is imported
+TEST_DIR = os.environ.setdefault('PCC_TEST_DIR', tempfile.mkdtemp(prefix='pcc_test_'))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+import datetime
+import app as backend
+from app import app, db
+
+app.config['UPLOAD_FOLDER'] = os.path.join(TEST_DIR, 'uploads')
+
+STUDENTS = 9
+PAGE = 2
+
+def seed():
+    with app.app_context():
+        db.drop_all()
+    backend.principal_cache.clear()
+    backend.create_tables_and_admin()
+    with app.app_context():
+        # Repeated names and dates so the id has to break ties
+        db.session.add_all([
+            backend.Student(
+                admission_number=f"PCC10th{n:05d}", username=f"student_{n}", password=f"student_{n}123",
+                name=f"Student {n % 4}", class_level='10th', admission_date=datetime.date(2026, 1, 1 + n % 3)
+            ) for n in range(1, STUDENTS + 1)
+        ])
+        db.session.commit()
+
+def login(client):
+    token = client.post('/api/admin/login', json={'username': 'pcc', 'password': 'pcc@8618'}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+def walk(client, headers, sort, fields='id', delete_anchor=False):
+    """Return the ids of every page in order, optionally deleting each page's last row before the next"""
+    ids = []
+    after = None
+    while True:
+        query = {'sort': sort, 'limit': PAGE, 'fields': fields}
+        if after:
+            query['after'] = after
+        response = client.get('/api/admin/students', query_string=query, headers=headers)
+        assert response.status_code == 200, response.get_json()
+        page = [row['id'] for row in response.get_json()]
+        ids.extend(page)
+        after = response.headers.get('X-Next-After')
+        if after is None:
+            return ids
+        assert len(page) == PAGE
+        if delete_anchor:
+            assert client.delete(f'/api/admin/students/{page[-1]}', headers=headers).status_code == 200
+
+def expected_order(sort):
+    descending = sort.startswith('-')
+    column = getattr(backend.Student, sort.lstrip('-'))
+    with app.app_context():
+        rows = db.session.query(column, backend.Student.id).all()
+    return [row_id for _, row_id in sorted(rows, reverse=descending)]
+
+def test_pages_cover_every_row():
+    seed()
+    client = app.test_client()
+    headers = login(client)
+    for sort in ('id', '-id', 'name', '-name', 'admission_date', '-admission_date'):
+        # The sort column need not be one of the requested fields
+        assert walk(client, headers, sort) == expected_order(sort), sort
+    print("Every sort pages through each row exactly once")
+
+def test_deleted_anchor_row():
+    seed()
+    client = app.test_client()
+    headers = login(client)
+    order = expected_order('name')
+    ids = walk(client, headers, 'name', delete_anchor=True)
+    assert ids == order, (ids, order)
+
+    # The old id-only cursor cannot resume from a deleted row, so it says so rather than end the list
+    first = client.get('/api/admin/students', query_string={'sort': 'name', 'limit': PAGE}, headers=headers)
+    anchor = int(first.headers['X-Next-After-Id'])
+    assert client.delete(f'/api/admin/students/{anchor}', headers=headers).status_code == 200
+    response = client.get('/api/admin/students', query_string={'sort': 'name', 'limit': PAGE, 'after_id': anchor},
+                          headers=headers)
+    assert response.status_code == 400
+
+    # A cursor from one sort is refused under another
+    cursor = first.headers['X-Next-After']
+    response = client.get('/api/admin/students', query_string={'sort': '-name', 'limit': PAGE, 'after': cursor},
+                          headers=headers)
+    assert response.status_code == 400
+    response = client.get('/api/admin/students', query_string={'sort': 'name', 'after': 'not a cursor'},
+                          headers=headers)
+    assert response.status_code == 400
+    print("Paging continues past a deleted cursor row")
+
+if __name__ == '__main__':
+    test_pages_cover_every_row()
+    test_deleted_anchor_row()
@@ -0,0 +1,136 @@
+"""
+Test script for per-endpoint SQL query bounds.
+Seeds a throwaway SQLite database at two data volumes and checks that each
+endpoint issues the same, fixed number of statements at both, so N+1 query
+patterns cannot creep back in.
+"""
+
+import os
+import tempfile
+
+# Every test script shares one throwaway database; it must be chosen before app is imported
+TEST_DIR = os.environ.setdefault('PCC_TEST_DIR', tempfile.mkdtemp(prefix='pcc_test_'))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+
+import datetime
+import app as backend
+from app import app, db
+from query_counter import QueryCounter
+
+# Keep generated files out of the working tree
+app.config['UPLOAD_FOLDER'] = os.path.join(TEST_DIR, 'uploads')
+
+# Most statements each request may issue, whatever the data volume
+QUERY_BOUNDS = {
+    '/api/student/tests': 4,
+    '/api/student/dashboard': 5,
+    '/api/student/attendance': 2,
+    '/api/student/attendance/summary': 2,
+    '/api/admin/students': 3,
+    '/api/admin/class-students': 3,
+    '/api/admin/tests/{test_id}/stats': 4,
+    '/api/admin/attendance/summary': 2,
+    '/api/notes': 3,
+    'POST /api/admin/tests/{test_id}/results': 8,
+    'POST /api/admin/attendance': 10,
+    'build_test_results_pdf': 3,
+}
+
+def reset_database():
+    with app.app_context():
+        db.drop_all()
+    backend.principal_cache.clear()
+    backend.test_stats_cache.clear()
+    backend.create_tables_and_admin()
+
+def seed(students, tests):
+    """Create one class with students, tests with a result for everyone, notes and attendance"""
+    reset_database()
+    today = datetime.date(2026, 1, 1)
+    with app.app_context():
+        db.session.add_all([
+            backend.Student(
+                admission_number=f"PCC10th{n:05d}", username=f"student_{n}", password=f"student_{n}123",
+                name=f"Student {n}", class_level='10th', admission_date=today
+            ) for n in range(1, students + 1)
+        ])
+        db.session.add_all([
+            backend.Test(name=f"Test {n}", subject='Maths', class_level='10th', date=today, max_marks=50)
+            for n in range(1, tests + 1)
+        ])
+        db.session.add_all([
+            backend.Note(title=f"Note {n}", subject='Maths', file_path=f"uploads/notes/{n}.pdf", upload_date=today)
+            for n in range(1, tests + 1)
+        ])
+        db.session.flush()
+        db.session.add_all([
+            backend.TestResult(test_id=test_id, student_id=student_id, marks_obtained=float((student_id * 7 + test_id) % 51))
+            for test_id in range(1, tests + 1) for student_id in range(1, students + 1)
+        ])
+        db.session.commit()
+
+def login(client, path, username, password):
+    token = client.post(path, json={'username': username, 'password': password}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+def measure(students, tests):
+    """Return {endpoint: statements issued} at one data volume"""
+    seed(students, tests)
+    client = app.test_client()
+    admin = login(client, '/api/admin/login', 'pcc', 'pcc@8618')
+    student = login(client, '/api/student/login', 'student_1', 'student_1123')
+    client.post('/api/admin/select-class', json={'class_level': '10th'}, headers=admin)
+    
+    attendance = [{'student_id': n, 'present': n % 3 != 0} for n in range(1, students + 1)]
+    client.post('/api/admin/attendance', json={'date': '2026-01-02', 'attendance': attendance}, headers=admin)
+    
+    requests = [
+        ('/api/student/tests', lambda: client.get('/api/student/tests', headers=student)),
+        ('/api/student/dashboard', lambda: client.get('/api/student/dashboard', headers=student)),
+        ('/api/student/attendance', lambda: client.get('/api/student/attendance', headers=student)),
+        ('/api/student/attendance/summary', lambda: client.get('/api/student/attendance/summary', headers=student)),
+        ('/api/admin/students', lambda: client.get('/api/admin/students', headers=admin)),
+        ('/api/admin/class-students', lambda: client.get('/api/admin/class-students', headers=admin)),
+        ('/api/admin/tests/{test_id}/stats', lambda: client.get('/api/admin/tests/1/stats', headers=admin)),
+        ('/api/admin/attendance/summary', lambda: client.get('/api/admin/attendance/summary', headers=admin)),
+        ('/api/notes', lambda: client.get('/api/notes', headers=admin)),
+        ('POST /api/admin/tests/{test_id}/results', lambda: client.post(
+            '/api/admin/tests/1/results',
+            json={'results': [{'student_id': n, 'marks_obtained': 25} for n in range(1, students + 1)]},
+            headers=admin
+        )),
+        ('POST /api/admin/attendance', lambda: client.post(
+            '/api/admin/attendance', json={'date': '2026-01-03', 'attendance': attendance}, headers=admin
+        )),
+    ]
+    
+    counts = {}
+    for name, send in requests:
+        with QueryCounter() as counter:
+            response = send()
+        assert response.status_code < 400, (name, response.status_code, response.get_data(as_text=True))
+        counts[name] = counter.count
+    
+    # Not a route: the class results PDF is built by the job worker
+    with app.app_context():
+        with QueryCounter() as counter:
+            backend.build_test_results_pdf(1)
+        counts['build_test_results_pdf'] = counter.count
+    
+    return counts
+
+def test_query_counts():
+    small = measure(students=3, tests=2)
+    large = measure(students=60, tests=15)
+    
+    for name in small:
+        print(f"{name:45s} {small[name]:3d} {large[name]:3d}")
+        assert large[name] == small[name], f"{name} grows with data: {small[name]} -> {large[name]} statements"
+        bound = QUERY_BOUNDS.get(name)
+        if bound is not None:
+            assert large[name] <= bound, f"{name} issued {large[name]} statements (bound {bound})"
+    
+    print("Query counts are bounded and independent of data volume")
+
+if __name__ == '__main__':
+    test_query_counts()
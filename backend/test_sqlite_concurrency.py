@@ -0,0 +1,106 @@
+"""
+Test script for concurrent writers on SQLite.
+Several writers, like gunicorn workers, mark attendance for a whole class at
+the same moment while a reader lists every student, once with SQLite's default
+settings and once with the tuned DB_PROFILE, and the requests that fail with
+"database is locked" are counted. The default profile gives up after
+pysqlite's 5 s busy timeout; the tuned profile (WAL, 30 s busy_timeout) must
+not lose any request.
+
+The profile is chosen when app is imported, so each profile runs in its own
+process, started with DB_PROFILE and DATABASE_URL in its environment.
+"""
+
+import os
+import sys
+import json
+import datetime
+import tempfile
+import threading
+import subprocess
+
+TEST_DIR = os.environ.setdefault('PCC_TEST_DIR', tempfile.mkdtemp(prefix='pcc_test_'))
+
+WRITERS = 8
+ROUNDS = 3
+READERS = 1
+STUDENTS = 24000  # About 4000 in the class being marked
+CLASS_LEVEL = '10th'
+
+def login(client):
+    token = client.post('/api/admin/login', json={'username': 'pcc', 'password': 'pcc@8618'}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+def run_profile():
+    """Seed the database, run the writers and the reader, and print the outcome as JSON"""
+    import generate_data
+    from app import app, db, Student
+
+    generate_data.generate(STUDENTS, 0.02, 1, datetime.date(2026, 3, 31), seed=1, reset=True)
+    with app.app_context():
+        student_ids = [student_id for (student_id,) in db.session.query(Student.id).filter_by(class_level=CLASS_LEVEL)]
+        db.engine.dispose()
+    attendance = [{'student_id': student_id, 'present': student_id % 4 != 0} for student_id in student_ids]
+
+    counts = {'writes_ok': 0, 'writes_locked': 0, 'reads_ok': 0, 'reads_locked': 0}
+    counts_lock = threading.Lock()
+    writers_done = threading.Event()
+
+    def record(kind, response):
+        key = f"{kind}_ok" if response.status_code < 400 else f"{kind}_locked"
+        with counts_lock:
+            counts[key] += 1
+
+    def write(index):
+        client = app.test_client()
+        headers = login(client)
+        for round_number in range(ROUNDS):
+            day = datetime.date(2026, 4, 1) + datetime.timedelta(days=index * ROUNDS + round_number)
+            record('writes', client.post('/api/admin/attendance', json={
+                'date': day.isoformat(), 'attendance': attendance
+            }, headers=headers))
+
+    def read():
+        client = app.test_client()
+        headers = login(client)
+        while not writers_done.is_set():
+            record('reads', client.get('/api/admin/students', headers=headers))
+
+    readers = [threading.Thread(target=read) for _ in range(READERS)]
+    writers = [threading.Thread(target=write, args=(index,)) for index in range(WRITERS)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    writers_done.set()
+    for thread in readers:
+        thread.join()
+
+    print(json.dumps(counts))
+
+def run(profile):
+    env = dict(os.environ,
+               DB_PROFILE=profile,
+               DATABASE_URL='sqlite:///' + os.path.join(TEST_DIR, f'concurrency_{profile}.db'),
+               LOG_LEVEL='CRITICAL')
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), 'run'], env=env, cwd=TEST_DIR,
+                            check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def test_concurrent_writers():
+    results = {profile: run(profile) for profile in ('default', 'tuned')}
+    for profile, counts in results.items():
+        print(f"{profile:8s} writes: {counts['writes_ok']:3d} succeeded {counts['writes_locked']:3d} failed; "
+              f"reads: {counts['reads_ok']:3d} succeeded {counts['reads_locked']:3d} failed")
+
+    tuned = results['tuned']
+    assert tuned['writes_locked'] == 0, f"{tuned['writes_locked']} writes failed with the tuned profile"
+    assert tuned['writes_ok'] == WRITERS * ROUNDS
+    assert tuned['reads_locked'] == 0, f"{tuned['reads_locked']} reads failed with the tuned profile"
+    print("Concurrent writers all succeed with the tuned profile")
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['run']:
+        run_profile()
+    else:
+        test_concurrent_writers()
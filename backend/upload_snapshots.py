@@ -0,0 +1,185 @@
+"""
+Incremental Upload Snapshots
+
+Each backup gets a copy of the uploads folder plus a manifest.json listing
+every file's path, size, mtime and SHA-256. A file whose size and mtime match
+the previous snapshot's manifest is not read at all: it is hard-linked to the
+previous snapshot's copy, so an unchanged file costs one directory entry.
+Only new or changed files are copied (and hashed while they are copied, so
+the manifest describes the bytes actually stored). A changed file whose
+content is already in the previous snapshot, e.g. a touched or renamed one,
+is linked as well.
+
+Hard links need the snapshots on one filesystem; where os.link fails the file
+is copied instead. Snapshot files are shared between snapshots, so they must
+never be modified in place. A copy missing from the previous snapshot (or of
+the wrong size) is not linked; the live file is copied again instead.
+
+In-progress chunked uploads and the blob store's incoming files are skipped.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import blob_store
+import chunked_upload
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+FILES_DIR = 'uploads'
+
+# Relative folders never included in a snapshot
+SKIPPED_DIRS = {chunked_upload.PARTIAL_DIR, os.path.join(blob_store.BLOB_DIR, blob_store.INCOMING_DIR)}
+
+def walk_files(uploads_dir):
+    """Yield (relative path, os.stat_result) for every regular file under uploads_dir"""
+    for root, dirs, files in os.walk(uploads_dir):
+        relative_root = os.path.relpath(root, uploads_dir)
+        dirs[:] = sorted(d for d in dirs if os.path.normpath(os.path.join(relative_root, d)) not in SKIPPED_DIRS)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if os.path.islink(path) or not os.path.isfile(path):
+                continue
+            relative_path = os.path.normpath(os.path.join(relative_root, name))
+            yield relative_path.replace(os.sep, '/'), os.stat(path)
+
+def load_manifest(snapshot_dir):
+    """Return the snapshot's {relative path: entry} dict, or None when it has no manifest"""
+    path = os.path.join(snapshot_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['files']
+
+def write_manifest(snapshot_dir, files):
+    fd, temp_path = tempfile.mkstemp(dir=snapshot_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f, indent=1, sort_keys=True)
+    os.replace(temp_path, os.path.join(snapshot_dir, MANIFEST_NAME))
+
+def copy_and_hash(source, destination):
+    """Copy source to destination, keeping its mtime, and return the SHA-256 of the bytes copied"""
+    digest = hashlib.sha256()
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        for block in iter(lambda: src.read(blob_store.STREAM_BUFFER_SIZE), b''):
+            digest.update(block)
+            dst.write(block)
+    shutil.copystat(source, destination)
+    return digest.hexdigest()
+
+def link_or_copy(source, destination):
+    """Hard-link source to destination; returns False when it had to be copied"""
+    try:
+        os.link(source, destination)
+        return True
+    except OSError:
+        # Another filesystem, a link count limit, or links not supported
+        shutil.copy2(source, destination)
+        return False
+
+def previous_copy(previous_dir, relative_path, entry):
+    """Path of the previous snapshot's copy of a manifest entry, or None if it is missing or damaged"""
+    path = os.path.join(previous_dir, FILES_DIR, relative_path)
+    if os.path.isfile(path) and os.path.getsize(path) == entry['size']:
+        return path
+    return None
+
+def create_snapshot(uploads_dir, snapshot_dir, previous_dir=None):
+    """Snapshot uploads_dir into snapshot_dir, linking unchanged files to previous_dir.
+
+    Returns counts: files, linked, copied and bytes_copied.
+    """
+    previous = load_manifest(previous_dir) if previous_dir else None
+    previous = previous or {}
+    previous_by_hash = {}
+    for relative_path, entry in previous.items():
+        previous_by_hash.setdefault(entry['sha256'], relative_path)
+
+    files_dir = os.path.join(snapshot_dir, FILES_DIR)
+    os.makedirs(files_dir, exist_ok=True)
+    files = {}
+    stats = {'files': 0, 'linked': 0, 'copied': 0, 'bytes_copied': 0}
+
+    for relative_path, stat in walk_files(uploads_dir):
+        source = os.path.join(uploads_dir, relative_path)
+        destination = os.path.join(files_dir, relative_path)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        stats['files'] += 1
+
+        entry = previous.get(relative_path)
+        unchanged = entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+        # A copy missing from the previous snapshot is taken again from the live file below
+        linked_from = previous_copy(previous_dir, relative_path, entry) if unchanged else None
+        if linked_from is not None:
+            if link_or_copy(linked_from, destination):
+                stats['linked'] += 1
+            else:
+                stats['copied'] += 1
+                stats['bytes_copied'] += entry['size']
+            files[relative_path] = dict(entry)
+            continue
+
+        sha256 = copy_and_hash(source, destination)
+        size = os.path.getsize(destination)
+        same_content = previous_by_hash.get(sha256)
+        linked_from = previous_copy(previous_dir, same_content, previous[same_content]) if same_content else None
+        if linked_from is not None:
+            # Already stored under the same or another name: share that copy instead.
+            # The manifest keeps the live file's mtime, which is what the next run compares
+            linked_path = f"{destination}.link"
+            if link_or_copy(linked_from, linked_path):
+                os.replace(linked_path, destination)
+                stats['linked'] += 1
+            else:
+                os.remove(linked_path)
+                stats['copied'] += 1
+                stats['bytes_copied'] += size
+        else:
+            stats['copied'] += 1
+            stats['bytes_copied'] += size
+        files[relative_path] = {'size': size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+
+    write_manifest(snapshot_dir, files)
+    return stats
+
+def diff_manifests(old, new):
+    """Return (added, removed, changed) relative paths between two manifests"""
+    added = sorted(set(new) - set(old))
+    removed = sorted(set(old) - set(new))
+    changed = sorted(path for path in set(old) & set(new) if old[path]['sha256'] != new[path]['sha256'])
+    return added, removed, changed
+
+def restore_snapshot(snapshot_dir, uploads_dir):
+    """Copy back every file that is missing from uploads_dir or differs from the snapshot.
+
+    Files in uploads_dir that the snapshot does not list are left alone.
+    Returns counts: files, unchanged and restored.
+    """
+    files = load_manifest(snapshot_dir)
+    if files is None:
+        raise FileNotFoundError(f"No {MANIFEST_NAME} in {snapshot_dir}")
+
+    stats = {'files': len(files), 'unchanged': 0, 'restored': 0}
+    for relative_path, entry in sorted(files.items()):
+        target = os.path.join(uploads_dir, relative_path)
+        if (os.path.isfile(target) and os.path.getsize(target) == entry['size']
+                and blob_store.hash_file(target) == entry['sha256']):
+            stats['unchanged'] += 1
+            continue
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Copied (never linked) so later edits to the live file cannot reach the snapshot
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.restore')
+        os.close(fd)
+        try:
+            sha256 = copy_and_hash(os.path.join(snapshot_dir, FILES_DIR, relative_path), temp_path)
+            if sha256 != entry['sha256']:
+                raise ValueError(f"{relative_path} in {snapshot_dir} does not match its manifest hash")
+            os.replace(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        stats['restored'] += 1
+    return stats
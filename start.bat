@@ -20,6 +20,10 @@ echo.
 echo Starting backend server...
 start cmd /k "cls && cd backend && echo Starting Flask server on port 5000... && python app.py"
 
+echo.
+echo Starting background job worker...
+start cmd /k "cls && cd backend && echo Starting job worker... && python jobs.py worker"
+
 echo.
 echo Starting frontend development server...
 start cmd /k "cls && cd frontend && echo Starting Vite development server... && npm run dev"